@@ -0,0 +1,470 @@
+"""
+该模块是策略的离线回测引擎，用数据库中已经保存的每日实时数据表（mysqldata.real_time_data写入的 'YYYY_MM_DD实时数据' 表）
+重放交易策略，不需要连接Okx，也不需要等待真实的休眠时间。具体包括：
+
+- 从实时数据表中读取每一个周期的输入（价格、五个价格的平均值、主流货币标准化均值、bidSz/askSz、24小时交易量），
+  转换为按列存放的numpy数组。
+- 按照strategy_manager_thread中相同的顺序执行：新的一天初始化参数、更新区间计数器、开多/开空信号（可选使用预测器包过滤）、
+  开仓上下限调整、止盈逻辑、止损逻辑以及止损后n_sz和ppn的调整。
+- 使用模拟交易所（SimulatedExchange）成交订单：市价单按当前价格成交，按手续费率扣除手续费，按照Okx的方式计算uplRatio。
+- 输出成交记录、逐周期的资金曲线和耗时统计（回测耗时、每秒周期数、相对真实时间的加速倍数）。
+- 回测结束时的策略状态（StrategyState）和模拟交易所可以作为分支点：复制后传给下一次run_backtest，
+  用不同的参数从同一个状态继续回测，不需要从头重放。
+
+运行方式：python backtest.py --host 主机 --username 用户名 --password 密码 --database 数据库 --start 2024-07-01 [--end 2024-07-31]
+"""
+
+" 内置模块 "
+import argparse
+import copy
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+import pymysql
+
+" 自定义模块 "
+from mysql_stream import read_sql_compact
+from predictor import PredictorBundle, feature_vector, predict_one
+from strategy import go_long_signal_array, go_short_signal_array
+from strategy_params import DEFAULT_PARAMS
+from strategy_state import StrategyState
+import function
+
+# 回测需要的列，键为回测中使用的名字，值为实时数据表中的列名
+TICK_COLUMNS = {
+    'time': '当前时间',
+    'price': '当前价格',
+    'before_price': '上一次价格',
+    'p': '较昨天的涨跌幅',
+    'last_p_p': '较上一次的涨跌幅',
+    'before_five': '上一次五个当前价格的平均值',
+    'current_five': '当前五个当前价格的平均值',
+    'before_mean_p': '上一次主流货币当前价格标准化均值',
+    'current_mean_p': '当前主流货币当前价格标准化均值',
+    'before_bidSz': '上一次bidSz',
+    'current_bidSz': '当前bidSz',
+    'before_askSz': '上一次askSz',
+    'current_askSz': '当前askSz',
+    'before_vol24h': '上一次24小时交易量',
+    'current_vol24h': '当前24小时交易量',
+}
+
+# 交易类型，与实时数据表中的交易类型一致
+TRADE_TYPE_NAMES = {1: '开多', -1: '开空', 2: '止盈平多', -2: '止盈平空', 3: '止损'}
+
+
+class BacktestResult(NamedTuple):
+    """
+    回测结果。
+    """
+    trades: pd.DataFrame  # 成交记录
+    equity: pd.DataFrame  # 逐周期的资金曲线
+    stats: dict  # 收益和耗时统计
+    state: StrategyState = None  # 回测结束时的策略状态
+    exchange: 'SimulatedExchange' = None  # 回测结束时的模拟交易所
+
+
+def ticks_from_frame(df: pd.DataFrame) -> dict:
+    """
+    把实时数据表的DataFrame转换为回测使用的按列存放的numpy数组。
+    :param df: 包含TICK_COLUMNS中所有列的DataFrame
+    :return: 字典，time为秒级时间戳（int64，本地时间），其余为float64数组
+    """
+    df = df.sort_values(TICK_COLUMNS['time'], kind='stable')
+    ticks = {'time': pd.to_datetime(df[TICK_COLUMNS['time']]).to_numpy().astype('datetime64[s]').astype(np.int64)}
+    for key, column in TICK_COLUMNS.items():
+        if key != 'time':
+            ticks[key] = df[column].to_numpy(dtype=np.float64)
+    return ticks
+
+
+def load_ticks(username: str, password: str, host: str, database: str, start_date: str, end_date: str = None,
+               port: int = 3306) -> dict:
+    """
+    从数据库中读取从start_date到end_date（包含）的每日实时数据表，没有数据表的日期会被跳过。
+    :param username: 数据库用户名
+    :param password: 数据库密码
+    :param host: 数据库主机
+    :param database: 数据库名
+    :param start_date: 开始日期，格式为 '%Y-%m-%d'
+    :param end_date: 结束日期，格式为 '%Y-%m-%d'，默认为今天
+    :param port: 数据库端口号，默认为：3306
+    :return: ticks_from_frame返回的字典
+    """
+    day = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.now()
+    columns = ', '.join(f'`{c}`' for c in TICK_COLUMNS.values())
+
+    frames = []
+    with pymysql.connect(host=host, port=port, user=username, password=password, database=database) as client:
+        while day <= end:
+            table = day.strftime('%Y_%m_%d') + '实时数据'
+            try:
+                frames.append(read_sql_compact(client, f"SELECT {columns} FROM `{table}` ORDER BY id"))
+            except pymysql.err.ProgrammingError:
+                pass  # 这一天程序没有运行，没有实时数据表
+            day += timedelta(days=1)
+
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return ticks_from_frame(pd.DataFrame(columns=list(TICK_COLUMNS.values())))
+    return ticks_from_frame(pd.concat(frames, ignore_index=True))
+
+
+class SimulatedExchange:
+    """
+    模拟交易所，只支持一个交易对的全仓单向持仓。pos为持仓张数，多仓为正，空仓为负。
+    """
+
+    def __init__(self, leverage: int, min_sz: float = 0.01, ct_val: float = 0.1, fee_rate: float = 0.0005):
+        """
+        :param leverage: 杠杆倍数
+        :param min_sz: 最小下单量（张）
+        :param ct_val: 每张合约的面值（币）
+        :param fee_rate: 手续费率
+        """
+        self.leverage = leverage
+        self.min_sz = min_sz
+        self.ct_val = ct_val
+        self.fee_rate = fee_rate
+        self.pos = 0.0  # 持仓张数
+        self.avg_px = 0.0  # 开仓均价
+        self.realized = 0.0  # 累计已实现盈亏（已扣除手续费）
+        self.fees = 0.0  # 累计手续费
+        self.position_pnl = 0.0  # 当前仓位从开仓到现在的已实现盈亏，对应Okx历史仓位的realizedPnl
+
+    def order_size(self, n_sz: float) -> float:
+        """
+        与MyOkx.place_agreement_order相同：下单量为minSz的n_sz倍，最少为minSz。
+        """
+        sz = float(self.min_sz * n_sz)
+        if sz % self.min_sz != 0:
+            sz -= sz % self.min_sz
+        if sz == 0 or sz <= self.min_sz:
+            sz = self.min_sz
+        return sz
+
+    def notional(self, price: float) -> float:
+        """
+        :return: 仓位价值（USDT），多仓为正，空仓为负，对应strategy_manager_thread中的current_position_nums
+        """
+        return self.pos * self.ct_val * price
+
+    def upl(self, price: float) -> float:
+        """
+        :return: 未实现盈亏（USDT）
+        """
+        return (price - self.avg_px) * self.pos * self.ct_val
+
+    def upl_ratio(self, price: float) -> float:
+        """
+        :return: 未实现收益率，未实现盈亏 / 开仓保证金
+        """
+        if self.pos == 0:
+            return 0.0
+        margin = self.avg_px * abs(self.pos) * self.ct_val / self.leverage
+        return self.upl(price) / margin
+
+    def place_market(self, side: str, sz: float, price: float) -> float | None:
+        """
+        下市价单，按price成交。
+        :param side: buy或sell
+        :param sz: 下单张数
+        :param price: 成交价格
+        :return: 如果这笔订单让仓位完全平掉，返回被平掉的仓位的realizedPnl，否则返回None
+        """
+        signed = sz if side == 'buy' else -sz
+        fee = abs(sz) * self.ct_val * price * self.fee_rate
+        self.fees += fee
+        self.realized -= fee
+        self.position_pnl -= fee
+
+        closed_pnl = None
+        if self.pos == 0 or (self.pos > 0) == (signed > 0):
+            # 开仓或加仓，更新开仓均价
+            new_pos = self.pos + signed
+            self.avg_px = (self.avg_px * abs(self.pos) + price * abs(signed)) / abs(new_pos)
+            self.pos = new_pos
+        else:
+            # 减仓、平仓或者反手
+            closing = min(abs(signed), abs(self.pos))
+            pnl = (price - self.avg_px) * closing * self.ct_val * (1 if self.pos > 0 else -1)
+            self.realized += pnl
+            self.position_pnl += pnl
+            remaining = abs(signed) - closing
+            self.pos += closing if signed > 0 else -closing
+            if abs(self.pos) < 1e-12:
+                self.pos = 0.0
+                closed_pnl = self.position_pnl
+                self.position_pnl = 0.0
+                self.avg_px = 0.0
+            if remaining > 1e-12:
+                self.pos = remaining if signed > 0 else -remaining
+                self.avg_px = price
+        return closed_pnl
+
+    def close_position(self, price: float) -> float | None:
+        """
+        市价平掉全部仓位。
+        :return: 被平掉的仓位的realizedPnl，没有仓位时返回None
+        """
+        if self.pos == 0:
+            return None
+        return self.place_market('sell' if self.pos > 0 else 'buy', abs(self.pos), price)
+
+    def copy(self) -> 'SimulatedExchange':
+        """
+        :return: 持仓和盈亏都相同的新模拟交易所，用于回测分支
+        """
+        return copy.copy(self)
+
+
+def run_backtest(ticks: dict, params: dict = None, predictor: PredictorBundle = None, state: StrategyState = None,
+                 exchange: 'SimulatedExchange' = None) -> BacktestResult:
+    """
+    按照strategy_manager_thread的逻辑逐周期重放ticks。
+    与实盘一样，第一个周期和每一个新的一天都会调用function.init_arguments初始化区间计数器、开仓上下限和开仓计数器；
+    n_sz、loss、profit从用户配置的初始值开始。
+    传入state时从这个状态继续回测（第一个周期不再初始化），传入的state和exchange都不会被修改。
+    :param ticks: ticks_from_frame或load_ticks返回的字典
+    :param params: 策略参数，没有提供的参数使用DEFAULT_PARAMS中的默认值
+    :param predictor: 预测器包，不为None时使用模型过滤开仓信号，为None时不过滤
+    :param state: 分支点的策略状态，通常是上一次回测结果中的state
+    :param exchange: 分支点的模拟交易所，通常是上一次回测结果中的exchange
+    :return: BacktestResult
+    """
+    cfg = {**DEFAULT_PARAMS, **(params or {})}
+    leverage = cfg['leverage']
+    place_uplimit, place_downlimit = cfg['place_uplimit'], cfg['place_downlimit']
+    interval_limits = [cfg[k] for k in ('l_s1', 'l_s2', 'l_s3', 'l_s4', 'l_e1', 'l_e2', 'l_e3', 'l_e4',
+                                        's_s1', 's_s2', 's_s3', 's_s4', 's_e1', 's_e2', 's_e3', 's_e4')]
+    l_c_limit, s_c_limit = cfg['l_c_limit'], cfg['s_c_limit']
+    limit_uplRatio = cfg['limit_uplRatio']
+    lower_take_profit = float(cfg['lower_take_profit'])
+
+    if exchange is None:
+        exchange = SimulatedExchange(leverage, cfg['min_sz'], cfg['ct_val'], cfg['fee_rate'])
+    else:
+        exchange = exchange.copy()
+
+    branch = state is not None
+    if not branch:
+        state = StrategyState(place_uplimit, place_downlimit, cfg['sz'], cfg['place_position_nums'])
+    (long_place_downlimit, long_place_uplimit, short_place_downlimit, short_place_uplimit, l_c, s_c,
+     u_p_1, u_p_2, u_p_3, u_p_4, d_p_1, d_p_2, d_p_3, d_p_4, n_sz, loss, profit, ppn) = state.snapshot()[:18]
+
+    times = ticks['time']
+    n = len(times)
+    columns = [ticks[k] for k in TICK_COLUMNS if k != 'time']
+    days = (times // 86400).tolist()  # 本地时间的日期编号，用来判断新的一天
+    rows = zip(*(c.tolist() for c in columns))
+
+    # 开仓信号中与开仓上下限、开仓计数器无关的条件一次性用数组计算，循环中只需要检查会变化的上下限和计数器
+    long_ready = go_long_signal_array(-np.inf, np.inf, ticks['p'], ticks['last_p_p'],
+                                      ticks['before_five'], ticks['current_five'],
+                                      ticks['before_mean_p'], ticks['current_mean_p'], 0, 0,
+                                      ticks['before_bidSz'], ticks['current_bidSz'],
+                                      ticks['before_vol24h'], ticks['current_vol24h']).tolist()
+    short_ready = go_short_signal_array(-np.inf, np.inf, ticks['p'], ticks['last_p_p'],
+                                        ticks['before_five'], ticks['current_five'],
+                                        ticks['before_mean_p'], ticks['current_mean_p'], 0, 0,
+                                        ticks['before_askSz'], ticks['current_askSz'],
+                                        ticks['before_vol24h'], ticks['current_vol24h']).tolist()
+
+    trades = []
+    equity = np.empty(n, dtype=np.float64)
+    position = np.empty(n, dtype=np.float64)
+    predict_seconds = 0.0
+    predictions = 0
+    yesterday = state.day if branch else None  # 从分支点继续时，与分支点在同一天的第一个周期不是新的一天
+
+    start = time.perf_counter()
+    for i, (current_price, before_price, p, last_p_p, before_five, current_five, before_mean_p, current_mean_p,
+            before_bidSz, current_bidSz, before_askSz, current_askSz, before_vol24h, current_vol24h) in enumerate(rows):
+        trade_type = 0
+        closed_pnl = None
+
+        " 新的一天更新逻辑 "
+        if days[i] != yesterday:
+            yesterday = days[i]
+            (u_p_1, d_p_1, u_p_2, d_p_2, u_p_3, d_p_3, u_p_4, d_p_4,
+             long_place_uplimit, long_place_downlimit, short_place_uplimit, short_place_downlimit,
+             l_c, s_c) = function.init_arguments(place_uplimit=place_uplimit, place_downlimit=place_downlimit)
+
+        " 交易前准备 "
+        current_position_nums = exchange.notional(current_price)
+        today_pos = exchange.pos  # 实盘中止盈逻辑使用的是本周期开始时获取的仓位信息
+
+        u_p_1, d_p_1, u_p_2, d_p_2, u_p_3, d_p_3, u_p_4, d_p_4 = function.update_u_p_and_d_p(
+            u_p_1, d_p_1, u_p_2, d_p_2, u_p_3, d_p_3, u_p_4, d_p_4, p, *interval_limits)
+
+        " 开仓逻辑 "
+        # 与go_long_signal、go_short_signal的结果相同
+        long_signal = (long_ready[i] and long_place_downlimit < p < long_place_uplimit and l_c <= l_c_limit)
+        short_signal = (not long_signal and short_ready[i] and -short_place_downlimit > p > -short_place_uplimit
+                        and s_c <= s_c_limit)
+        if (long_signal or short_signal) and predictor is not None:
+            t = time.perf_counter()
+            x = feature_vector(current_price, before_price, current_five, before_five, current_mean_p, before_mean_p,
+                               current_bidSz, before_bidSz, current_askSz, before_askSz,
+                               current_vol24h, before_vol24h)
+            allowed = predict_one(predictor, x)
+            predict_seconds += time.perf_counter() - t
+            predictions += 1
+            long_signal, short_signal = long_signal and allowed, short_signal and allowed
+
+        if long_signal:
+            if current_position_nums <= 0 or abs(current_position_nums) < ppn - 10:
+                size = exchange.order_size(n_sz)
+                closed_pnl = exchange.place_market('buy', size, current_price)
+                trades.append((times[i], 1, 'buy', current_price, size, closed_pnl))
+                l_c += 1
+                if l_c >= 3:
+                    long_place_downlimit, long_place_uplimit = (
+                        function.update_long_place_downlimit_and_long_place_uplimit_for_the_l_c(
+                            long_place_downlimit=long_place_downlimit, long_place_uplimit=long_place_uplimit,
+                            place_downlimit=place_downlimit, place_uplimit=place_uplimit, l_c=l_c))
+                short_place_downlimit, short_place_uplimit = (
+                    function.update_short_place_uplimit_and_short_place_downlimit(
+                        short_place_downlimit=short_place_downlimit, short_place_uplimit=short_place_uplimit,
+                        before_price=before_price, current_price=current_price,
+                        place_downlimit=place_downlimit, place_uplimit=place_uplimit))
+                trade_type = 1
+
+        elif short_signal:
+            if current_position_nums >= 0 or abs(current_position_nums) < ppn - 10:
+                size = exchange.order_size(n_sz)
+                closed_pnl = exchange.place_market('sell', size, current_price)
+                trades.append((times[i], -1, 'sell', current_price, size, closed_pnl))
+                s_c += 1
+                if s_c >= 3:
+                    short_place_downlimit, short_place_uplimit = (
+                        function.update_short_place_downlimit_and_short_place_uplimit_for_the_s_c(
+                            short_place_downlimit=short_place_downlimit, short_place_uplimit=short_place_uplimit,
+                            place_downlimit=place_downlimit, place_uplimit=place_uplimit, s_c=s_c))
+                long_place_downlimit, long_place_uplimit = function.update_long_place_uplimit_and_long_place_downlimit(
+                    long_place_downlimit=long_place_downlimit, long_place_uplimit=long_place_uplimit,
+                    before_price=before_price, current_price=current_price,
+                    place_downlimit=place_downlimit, place_uplimit=place_uplimit)
+                trade_type = -1
+
+        " 获利逻辑 "
+        if (p > lower_take_profit or p < -lower_take_profit) and today_pos != 0:
+            take = 0
+            if p > 0.25 or p < -0.25:
+                take = 2 if today_pos > 0 else -2
+            elif today_pos > 0 and (u_p_1 > 50 or u_p_2 > 25 or u_p_3 > 13 or u_p_4 > 6):
+                take = 2
+            elif today_pos < 0 and (d_p_1 > 50 or d_p_2 > 25 or d_p_3 > 13 or d_p_4 > 6):
+                take = -2
+
+            if take:
+                trade_type = take
+                size = abs(exchange.pos)
+                side = 'sell' if exchange.pos > 0 else 'buy'
+                pnl = exchange.close_position(current_price)
+                if pnl is not None:
+                    closed_pnl = pnl
+                    trades.append((times[i], take, side, current_price, size, pnl))
+                    (u_p_1, d_p_1, u_p_2, d_p_2, u_p_3, d_p_3, u_p_4, d_p_4,
+                     long_place_uplimit, long_place_downlimit, short_place_uplimit, short_place_downlimit,
+                     l_c, s_c) = function.init_arguments(place_uplimit=place_uplimit, place_downlimit=place_downlimit)
+                    ppn = cfg['place_position_nums']
+                    n_sz = cfg['sz']
+                    loss = 0.0
+
+        " 止损逻辑 "
+        upl_ratio = exchange.upl_ratio(current_price)
+        if exchange.pos != 0 and upl_ratio < 0 and upl_ratio < limit_uplRatio:
+            trade_type = 3
+            size = abs(exchange.pos)
+            side = 'sell' if exchange.pos > 0 else 'buy'
+            closed_pnl = exchange.close_position(current_price)
+            trades.append((times[i], 3, side, current_price, size, closed_pnl))
+
+            loss = loss + abs(closed_pnl)
+            profit = loss * 1.3
+            x = (profit / 0.6) * leverage
+            n_sz = round((x / current_price) * leverage)
+            ppn = n_sz * current_price / leverage - 50
+
+        # 统计盈亏情况，与function.statistics_profit相同，累加刚刚平掉的仓位的realizedPnl
+        if trade_type in (3, 2, -2) and closed_pnl is not None:
+            profit = profit + closed_pnl
+
+        equity[i] = exchange.realized + exchange.upl(current_price)
+        position[i] = exchange.pos
+    elapsed = time.perf_counter() - start
+
+    # 回测结束时的策略状态，上一周期的行情取最后一个周期的行情
+    final = StrategyState.__new__(StrategyState)
+    final.restore(state.snapshot())
+    (final.long_place_downlimit, final.long_place_uplimit, final.short_place_downlimit, final.short_place_uplimit,
+     final.l_c, final.s_c, final.u_p_1, final.u_p_2, final.u_p_3, final.u_p_4, final.d_p_1, final.d_p_2, final.d_p_3,
+     final.d_p_4, final.n_sz, final.loss, final.profit, final.ppn) = (
+        long_place_downlimit, long_place_uplimit, short_place_downlimit, short_place_uplimit, l_c, s_c,
+        u_p_1, u_p_2, u_p_3, u_p_4, d_p_1, d_p_2, d_p_3, d_p_4, n_sz, loss, profit, ppn)
+    if n:
+        final.day = days[-1]
+        (final.before_price, final.last_p_p, final.before_five, final.current_five, final.before_mean_p,
+         final.before_bidSz, final.before_askSz, final.before_vol24h) = (
+            current_price, last_p_p, current_five, current_five, current_mean_p,
+            current_bidSz, current_askSz, current_vol24h)
+
+    trades = pd.DataFrame(trades, columns=['time', 'trade_type', 'side', 'price', 'size', 'realized_pnl'])
+    trades['time'] = pd.to_datetime(trades['time'].astype(np.int64), unit='s')
+    trades['trade_name'] = trades['trade_type'].map(TRADE_TYPE_NAMES)
+    equity_df = pd.DataFrame({'time': pd.to_datetime(times, unit='s'), 'equity': equity, 'position': position})
+
+    closes = trades['realized_pnl'].dropna()
+    drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity if n else np.array([0.0])
+    replayed = float(times[-1] - times[0]) if n else 0.0
+    stats = {
+        'ticks': n,
+        'days': len(set(days)),
+        'trades': len(trades),
+        'opens': int(trades['trade_type'].isin([1, -1]).sum()),
+        'take_profits': int(trades['trade_type'].isin([2, -2]).sum()),
+        'stop_losses': int((trades['trade_type'] == 3).sum()),
+        'closed_positions': len(closes),
+        'win_rate': float((closes > 0).mean()) if len(closes) else None,
+        'total_pnl': float(equity[-1]) if n else 0.0,
+        'realized_pnl': exchange.realized,
+        'fees': exchange.fees,
+        'max_drawdown': float(drawdown.max()),
+        'strategy_profit': profit,  # 与实时数据表中的累计盈亏情况含义相同
+        'replay_seconds': round(elapsed, 4),
+        'ticks_per_second': int(n / elapsed) if elapsed > 0 else None,
+        'replayed_seconds': replayed,
+        'speedup': round(replayed / elapsed) if elapsed > 0 else None,
+        'predictions': predictions,
+        'predict_seconds': round(predict_seconds, 4),
+    }
+    return BacktestResult(trades, equity_df, stats, final, exchange)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='使用数据库中的实时数据表回测交易策略')
+    parser.add_argument('--host', required=True)
+    parser.add_argument('--port', type=int, default=3306)
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--start', required=True, help='开始日期，格式为 %%Y-%%m-%%d')
+    parser.add_argument('--end', default=None, help='结束日期，格式为 %%Y-%%m-%%d，默认为今天')
+    parser.add_argument('--trades', default=None, help='保存成交记录的csv文件')
+    args = parser.parse_args()
+
+    load_start = time.perf_counter()
+    ticks = load_ticks(args.username, args.password, args.host, args.database, args.start, args.end, args.port)
+    print(f'读取{len(ticks["time"])}个周期的数据，耗时{time.perf_counter() - load_start:.2f}秒')
+
+    result = run_backtest(ticks)
+    for key, value in result.stats.items():
+        print(f'{key}: {value}')
+    if args.trades:
+        result.trades.to_csv(args.trades, index=False)
@@ -0,0 +1,396 @@
+"""
+该模块用来对程序中计算量较大的部分进行性能测试，使用随机生成的模拟数据，不需要连接数据库和Okx。具体包括：
+
+- 生成模拟的开仓记录和平仓记录。
+- 测试数据预处理（as-of连接打标签、特征计算、标准化）在数百万行数据上的耗时。
+- 生成模拟的实时数据，测试回测引擎重放的速度。
+- 检查开仓信号的数组版本与逐个计算的结果完全一致，并比较两者的耗时。
+- 在本地模拟Okx服务器上测试获取行情和下单的请求耗时，不需要网络。
+- 比较策略状态的快照/恢复、二进制序列化与原来的参数元组+JSON参数文件的耗时。
+- 比较每个周期都重写参数文件与检查点写入器（只在参数变化时在后台原子写入）在策略线程中的耗时。
+- 测试分阶段计时器（tick_timing）在启用和没有启用时每次计时的额外开销。
+- 在本地模拟Okx服务器上测试多交易对策略引擎每个周期的耗时和请求数随交易对数量的变化。
+
+运行方式：python benchmark.py [记录条数]
+"""
+
+" 内置模块 "
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+
+" 自定义模块 "
+from fake_okx_server import DEFAULT_INSTRUMENTS, FakeOkxExchange, FakeOkxServer
+from histogram import LatencyHistogram
+import global_vars
+import myokx
+from predict_model import data_preprocessing
+from backtest import run_backtest
+from checkpoint import CheckpointWriter
+from multi_strategy import multi_strategy_manager_thread
+from sim_clock import VirtualClock
+from sim_io import OfflineIO
+from strategy_state import StrategyState
+from tick_timing import TickTimer
+import function
+from strategy import go_long_signal, go_short_signal, go_long_signal_array, go_short_signal_array
+
+
+def make_synthetic_trades(n_entries: int, seed: int = 0) -> tuple:
+    """
+    生成模拟的开仓记录和平仓记录，列名与实时数据表一致。
+    平均每3条开仓记录之后有一条平仓记录，用来模拟多次开仓后一次平仓的情况。
+    :param n_entries: 开仓记录的条数
+    :param seed: 随机数种子
+    :return: 开仓记录和平仓记录两个DataFrame
+    """
+    rng = np.random.default_rng(seed)
+
+    # 每一个周期间隔2到100秒
+    seconds = np.cumsum(rng.integers(2, 100, size=n_entries * 2))
+    times = pd.Timestamp('2024-01-01') + pd.to_timedelta(seconds, unit='s')
+    is_exit = rng.random(n_entries * 2) < 0.25
+
+    entry_times = times[~is_exit][:n_entries]
+    exit_times = times[is_exit]
+
+    price = 3000 + np.cumsum(rng.normal(0, 1, size=len(entry_times) + 1)).astype(np.float32)
+    five = price + rng.normal(0, 0.5, size=len(price)).astype(np.float32)
+    majors = rng.normal(0, 0.01, size=len(price)).astype(np.float32)
+    bid = rng.uniform(1, 500, size=len(price)).astype(np.float32)
+    ask = rng.uniform(1, 500, size=len(price)).astype(np.float32)
+    vol = 1e6 + np.cumsum(rng.uniform(0, 100, size=len(price))).astype(np.float32)
+
+    data = pd.DataFrame({
+        '当前时间': entry_times,
+        '当前价格': price[1:], '上一次价格': price[:-1],
+        '上一次五个当前价格的平均值': five[:-1], '当前五个当前价格的平均值': five[1:],
+        '上一次主流货币当前价格标准化均值': majors[:-1], '当前主流货币当前价格标准化均值': majors[1:],
+        '上一次bidSz': bid[:-1], '当前bidSz': bid[1:],
+        '上一次askSz': ask[:-1], '当前askSz': ask[1:],
+        '上一次24小时交易量': vol[:-1], '当前24小时交易量': vol[1:],
+        '交易类型': rng.choice(np.array([-1, 1], dtype=np.int8), size=len(entry_times)),
+    })
+    target = pd.DataFrame({
+        '当前时间': exit_times,
+        '交易类型': rng.choice(np.array([-2, 2, 3], dtype=np.int8), size=len(exit_times)),
+    })
+    return data, target
+
+
+def bench_data_preprocessing(n_entries: int = 2_000_000) -> dict:
+    """
+    测试数据预处理在n_entries条开仓记录上的耗时和内存占用。
+    :param n_entries: 开仓记录的条数
+    :return: 测试结果字典
+    """
+    data, target = make_synthetic_trades(n_entries)
+
+    start = time.perf_counter()
+    attr_df, all_df = data_preprocessing(data, target)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'entries': len(data),
+        'exits': len(target),
+        'labeled': len(all_df),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': int(len(data) / elapsed),
+        'attr_df_mb': round(float(attr_df.memory_usage(deep=True).sum()) / 2 ** 20, 1),
+        'all_df_mb': round(float(all_df.memory_usage(deep=True).sum()) / 2 ** 20, 1),
+    }
+
+
+def make_synthetic_ticks(n_ticks: int, seed: int = 0) -> dict:
+    """
+    生成模拟的实时数据，格式与backtest.ticks_from_frame返回的字典一致。
+    每一个周期间隔10到20秒，价格为随机游走，较昨天的涨跌幅相对每一天第一个周期的价格计算。
+    :param n_ticks: 周期数
+    :param seed: 随机数种子
+    :return: 按列存放的numpy数组字典
+    """
+    rng = np.random.default_rng(seed)
+    times = int(pd.Timestamp('2024-01-01').timestamp()) + np.cumsum(rng.integers(10, 21, size=n_ticks))
+    price = 3000 * np.exp(np.cumsum(rng.normal(0, 0.0008, size=n_ticks + 1)))
+    day = times // 86400
+    day_open = pd.Series(price[1:]).groupby(day).transform('first').to_numpy()
+
+    five = pd.Series(price).rolling(5, min_periods=1).mean().to_numpy()
+    majors = np.cumsum(rng.normal(0, 0.01, size=n_ticks + 1))
+    bid = rng.uniform(1, 500, size=n_ticks + 1)
+    ask = rng.uniform(1, 500, size=n_ticks + 1)
+    vol = 1e6 + np.cumsum(rng.normal(5, 100, size=n_ticks + 1))
+    return {
+        'time': times,
+        'price': price[1:], 'before_price': price[:-1],
+        'p': price[1:] / day_open - 1 + rng.normal(0, 0.01, size=n_ticks),
+        'last_p_p': price[1:] / price[:-1] - 1,
+        'before_five': five[:-1], 'current_five': five[1:],
+        'before_mean_p': majors[:-1], 'current_mean_p': majors[1:],
+        'before_bidSz': bid[:-1], 'current_bidSz': bid[1:],
+        'before_askSz': ask[:-1], 'current_askSz': ask[1:],
+        'before_vol24h': vol[:-1], 'current_vol24h': vol[1:],
+    }
+
+
+def bench_backtest(n_ticks: int = 500_000) -> dict:
+    """
+    测试回测引擎重放n_ticks个周期的耗时。
+    :param n_ticks: 周期数
+    :return: 回测的统计结果
+    """
+    return run_backtest(make_synthetic_ticks(n_ticks)).stats
+
+
+def bench_signal_arrays(n_ticks: int = 1_000_000, seed: int = 0) -> dict:
+    """
+    在模拟的实时数据上分别逐个计算和用数组计算开多/开空信号，检查两者的结果完全一致（不一致时抛出AssertionError）。
+    开仓上下限和开仓计数器每个周期随机变化，并混入NaN和相等的值，覆盖边界情况。
+    :param n_ticks: 周期数
+    :param seed: 随机数种子
+    :return: 两种方式的耗时和加速倍数
+    """
+    rng = np.random.default_rng(seed)
+    t = {key: value.copy() for key, value in make_synthetic_ticks(n_ticks, seed).items()}
+    t['p'] = rng.normal(0, 0.01, size=n_ticks)
+    t['p'][rng.random(n_ticks) < 0.001] = np.nan
+    equal = rng.random(n_ticks) < 0.05
+    t['current_bidSz'][equal] = t['before_bidSz'][equal]
+    t['current_askSz'][equal] = t['before_askSz'][equal]
+    t['current_five'][equal] = t['before_five'][equal]
+    downlimit = rng.uniform(0.001, 0.003, size=n_ticks)
+    uplimit = rng.uniform(0.004, 0.02, size=n_ticks)
+    counter = rng.integers(0, 7, size=n_ticks)
+    limit = 4
+
+    long_args = (downlimit, uplimit, t['p'], t['last_p_p'], t['before_five'], t['current_five'],
+                 t['before_mean_p'], t['current_mean_p'], counter, limit,
+                 t['before_bidSz'], t['current_bidSz'], t['before_vol24h'], t['current_vol24h'])
+    short_args = (downlimit, uplimit, t['p'], t['last_p_p'], t['before_five'], t['current_five'],
+                  t['before_mean_p'], t['current_mean_p'], counter, limit,
+                  t['before_askSz'], t['current_askSz'], t['before_vol24h'], t['current_vol24h'])
+
+    start = time.perf_counter()
+    long_scalar = [go_long_signal(*(a if np.isscalar(a) else a[i] for a in long_args)) for i in range(n_ticks)]
+    short_scalar = [go_short_signal(*(a if np.isscalar(a) else a[i] for a in short_args)) for i in range(n_ticks)]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    long_mask = go_long_signal_array(*long_args)
+    short_mask = go_short_signal_array(*short_args)
+    array_seconds = time.perf_counter() - start
+
+    if not np.array_equal(long_mask, long_scalar) or not np.array_equal(short_mask, short_scalar):
+        raise AssertionError('开仓信号的数组版本与逐个计算的结果不一致')
+    return {
+        'ticks': n_ticks,
+        'long_signals': int(long_mask.sum()),
+        'short_signals': int(short_mask.sum()),
+        'scalar_seconds': round(scalar_seconds, 3),
+        'array_seconds': round(array_seconds, 4),
+        'speedup': round(scalar_seconds / array_seconds),
+    }
+
+
+def bench_fake_okx(n_requests: int = 2000, latency: float = 0.0) -> dict:
+    """
+    在本地模拟Okx服务器上测试一个交易周期中的主要请求（获取行情、获取持仓、下单）的耗时。
+    :param n_requests: 每种请求的次数
+    :param latency: 模拟服务器给每个请求增加的延迟（秒）
+    :return: 每种请求耗时的统计（秒）
+    """
+    histograms = {'ticker': LatencyHistogram(), 'positions': LatencyHistogram(), 'order': LatencyHistogram()}
+    domain = myokx.OKX_DOMAIN
+    limited, cached = global_vars.rate_limiter.enabled, global_vars.request_cache.enabled
+    with FakeOkxServer(latency=latency) as server:
+        myokx.OKX_DOMAIN = server.url
+        # 模拟服务器不限速，只测试请求本身的耗时，也不使用缓存
+        global_vars.rate_limiter.enabled = global_vars.request_cache.enabled = False
+        try:
+            o = myokx.MyOkx('bench', 'bench', 'bench', domain=server.url)
+            for i in range(n_requests):
+                start = time.perf_counter()
+                myokx.get_ticker_last_price('ETH-USDT-SWAP')
+                histograms['ticker'].record(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                o.get_positions()
+                histograms['positions'].record(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                o.trade_api.place_order(instId='ETH-USDT-SWAP', tdMode='cross', side='buy' if i % 2 else 'sell',
+                                        ordType='market', sz='0.01')
+                histograms['order'].record(time.perf_counter() - start)
+        finally:
+            myokx.OKX_DOMAIN = domain
+            global_vars.rate_limiter.enabled, global_vars.request_cache.enabled = limited, cached
+    return {name: h.snapshot() for name, h in histograms.items()}
+
+
+def bench_strategy_state(n: int = 100_000) -> dict:
+    """
+    比较保存和恢复一次策略状态的耗时：StrategyState的快照/恢复和二进制序列化，
+    以及原来的做法（function.init_arguments构造参数元组、function.save_parameter写JSON参数文件）。
+    :param n: 重复次数（写文件的做法只重复n // 100次）
+    :return: 每种做法每次的耗时（微秒）
+    """
+    state = StrategyState(0.0055, 0.0015, 1, 150)
+    state.u_p_1, state.loss, state.profit = 3, 1.25, 0.5
+
+    def per_call(f, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            f()
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    assert StrategyState.from_bytes(state.to_bytes()).diff(state) == {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = directory + '/parameter.txt'
+        return {
+            'snapshot_restore_us': per_call(lambda: state.restore(state.snapshot()), n),
+            'to_from_bytes_us': per_call(lambda: StrategyState.from_bytes(state.to_bytes()), n),
+            'diff_unchanged_us': per_call(lambda: state.diff(state), n),
+            'init_arguments_tuple_us': per_call(lambda: function.init_arguments(0.0055, 0.0015), n),
+            'save_parameter_json_us': per_call(lambda: function.save_parameter(*state.persisted(), path=path),
+                                               max(1, n // 100)),
+        }
+
+
+def bench_checkpoint(n_ticks: int = 20_000, change_every: int = 50) -> dict:
+    """
+    模拟策略线程的n_ticks个周期，每change_every个周期参数变化一次，比较策略线程中保存参数的耗时：
+    原来每个周期都用function.save_parameter重写参数文件，检查点写入器每个周期只提交一次，参数变化时在后台原子写入。
+    :param n_ticks: 周期数
+    :param change_every: 参数每隔多少个周期变化一次
+    :return: 两种做法每个周期的耗时（微秒）以及写入参数文件的次数
+    """
+    state = StrategyState(0.0055, 0.0015, 1, 150)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        for i in range(n_ticks):
+            if i % change_every == 0:
+                state.u_p_1 += 1
+            function.save_parameter(*state.persisted(), path=directory + '/parameter_old.txt')
+        save_parameter_us = (time.perf_counter() - start) / n_ticks * 1e6
+
+        writer = CheckpointWriter(debounce=0.01)
+        writer.load(state, directory + '/parameter.txt')
+        writer.start()
+        start = time.perf_counter()
+        for i in range(n_ticks):
+            if i % change_every == 0:
+                state.u_p_1 += 1
+            writer.commit()
+        commit_us = (time.perf_counter() - start) / n_ticks * 1e6
+        writer.close()
+        assert StrategyState().load(directory + '/parameter.txt')
+
+    return {
+        'save_parameter_us_per_tick': save_parameter_us,
+        'save_parameter_writes': n_ticks,
+        'checkpoint_commit_us_per_tick': commit_us,
+        'checkpoint_writes': writer.writes,
+        'checkpoint_write_p50_us': writer.write_time.percentile(50) * 1e6,
+    }
+
+
+def bench_tick_timer(n: int = 200_000) -> dict:
+    """
+    测试分阶段计时器每次计时（with span和被装饰的函数）的额外开销，包括没有启用和启用两种情况。
+    :param n: 重复次数
+    :return: 每次计时的额外开销（纳秒）
+    """
+    timer = TickTimer()
+
+    def plain(x):
+        return x
+
+    decorated = timer.timed('stage')(plain)
+
+    def per_call_ns(f):
+        start = time.perf_counter()
+        for i in range(n):
+            f(i)
+        return (time.perf_counter() - start) / n * 1e9
+
+    def with_span(x):
+        with timer.span('stage'):
+            return x
+
+    results = {}
+    baseline = per_call_ns(plain)
+    for enabled in (False, True):
+        timer.enabled = enabled
+        timer.begin_tick()
+        name = 'enabled' if enabled else 'disabled'
+        results[f'span_{name}_ns'] = per_call_ns(with_span) - baseline
+        results[f'decorator_{name}_ns'] = per_call_ns(decorated) - baseline
+        timer.end_tick('')
+    start = time.perf_counter()
+    for _ in range(n // 10):
+        timer.begin_tick()
+        timer.end_tick('')
+    results['end_tick_us'] = (time.perf_counter() - start) / (n // 10) * 1e6
+    return results
+
+
+def bench_multi_strategy(instrument_counts: tuple = (1, 10, 50), n_ticks: int = 50, latency: float = 0.0) -> dict:
+    """
+    在本地模拟Okx服务器上运行多交易对策略引擎，比较不同交易对数量下每个周期的耗时和请求数。
+    虚拟时钟不等待，所以耗时只包括请求和计算。
+    :param instrument_counts: 交易对数量
+    :param n_ticks: 每种交易对数量运行的周期数
+    :param latency: 模拟服务器给每个请求增加的延迟（秒）
+    :return: 以交易对数量为键，值为每个周期的平均耗时（秒）、平均请求数和每个交易对的平均耗时
+    """
+    results = {}
+    for n in instrument_counts:
+        instruments = dict(DEFAULT_INSTRUMENTS)
+        for i in range(max(0, n - len(instruments))):
+            instruments[f'C{i}-USDT-SWAP'] = {'lotSz': '0.01', 'minSz': '0.01', 'ctVal': '1', 'price': 10.0 + i}
+        instIds = list(instruments)[:n]
+
+        with FakeOkxServer(exchange=FakeOkxExchange(instruments, volatility=0.003), latency=latency) as server, \
+                tempfile.TemporaryDirectory() as directory:
+            domain = myokx.OKX_DOMAIN
+            limited, cached = global_vars.rate_limiter.enabled, global_vars.request_cache.enabled
+            myokx.OKX_DOMAIN = server.url
+            # 模拟服务器不限速，虚拟时钟下不等待，按墙上时间过期的缓存会让每个周期都得到同样的行情，所以都不使用
+            global_vars.rate_limiter.enabled = global_vars.request_cache.enabled = False
+            global_vars.s_finished_event = False
+            global_vars.m_r_d = []
+            try:
+                start = time.perf_counter()
+                multi_strategy_manager_thread('bench', 'bench', 'bench', 'bench', 'bench', 'bench', 'bench', 'bench',
+                                              instIds, 'bench', 'bench', 'bench', clock=VirtualClock(datetime.now()),
+                                              io=OfflineIO(server.url), parameter_dir=directory, max_ticks=n_ticks)
+                elapsed = time.perf_counter() - start
+            finally:
+                myokx.OKX_DOMAIN = domain
+                global_vars.rate_limiter.enabled, global_vars.request_cache.enabled = limited, cached
+            requests = sum(server.stats()['requests'].values())
+
+        results[n] = {
+            'seconds_per_tick': elapsed / n_ticks,
+            'requests_per_tick': requests / n_ticks,
+            'seconds_per_instrument_tick': elapsed / n_ticks / n,
+            'rows': len(global_vars.m_r_d),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    print('data_preprocessing:', bench_data_preprocessing(n))
+    print('backtest:', bench_backtest(n // 4))
+    print('signal arrays:', bench_signal_arrays(n // 2))
+    print('fake okx:', bench_fake_okx())
+    print('strategy state:', bench_strategy_state())
+    print('checkpoint:', bench_checkpoint())
+    print('tick timer:', bench_tick_timer())
+    print('multi strategy:', bench_multi_strategy())
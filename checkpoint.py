@@ -0,0 +1,245 @@
+"""
+该模块定义了动态参数的检查点写入器（CheckpointWriter），代替策略线程每个周期都用function.save_parameter重写一次参数文件的做法。具体包括：
+
+- 脏字段跟踪：策略线程每个周期结束时调用commit()，只取出需要保存的字段（StrategyState.persisted()）和上一次提交的值比较，
+  没有变化时直接跳过，不做任何序列化和磁盘写入。
+- 防抖的后台写入：参数发生变化时唤醒后台线程，后台线程等待debounce秒合并这段时间内的多次变化后再写入；
+  另外每interval秒检查一次，重试之前写入失败的参数文件。写入在后台线程中进行，不占用策略线程的周期。
+- 原子写入：先写临时文件并fsync，再用os.replace替换参数文件，写到一半程序崩溃也不会破坏已有的参数文件。
+- 保留最近generations个旧版本（parameter.txt.1是上一个版本，parameter.txt.2是再上一个版本……），
+  加载时如果参数文件损坏或者缺失，依次尝试旧版本。
+
+提交次数、跳过次数、写入次数和写入失败次数是global_vars.metrics中的计数器（*_total），启动后台线程时把写入耗时注册到global_vars.metrics。
+一个CheckpointWriter可以管理多个状态（多交易对策略引擎中每个交易对一个参数文件），共用一个后台线程。
+参数文件的格式与function.save_parameter相同。
+"""
+
+" 内置模块 "
+import os
+import shutil
+import threading
+import time
+
+" 自定义模块 "
+from histogram import LatencyHistogram
+from metrics import histogram_lines
+from strategy_state import PERSISTED_FIELDS, StrategyState, persisted_json
+import global_vars
+
+# 检查点写入器的监控指标，所有写入器共用
+CHECKPOINT_COMMITS = global_vars.metrics.counter('checkpoint_commits_total', '策略线程提交参数检查点（commit）的次数')
+CHECKPOINT_SKIPPED = global_vars.metrics.counter('checkpoint_skipped_total', '提交时参数没有变化、跳过序列化的次数（按状态计数）')
+CHECKPOINT_WRITES = global_vars.metrics.counter('checkpoint_writes_total', '写入参数文件的次数')
+CHECKPOINT_ERRORS = global_vars.metrics.counter('checkpoint_errors_total', '写入参数文件失败的次数')
+
+
+def atomic_write(path: str, content: str, generations: int = 0) -> None:
+    """
+    原子地写入一个文件：先写临时文件并fsync，再替换原文件。
+    :param path: 文件路径
+    :param content: 文件内容
+    :param generations: 保留的旧版本数量，旧版本保存为path.1、path.2……，path.1是最近的旧版本
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+
+    if generations > 0 and os.path.exists(path):
+        for i in range(generations - 1, 0, -1):
+            if os.path.exists(f'{path}.{i}'):
+                os.replace(f'{path}.{i}', f'{path}.{i + 1}')
+        previous = f'{path}.1'
+        if os.path.exists(previous):
+            os.remove(previous)
+        try:
+            os.link(path, previous)  # 硬链接，当前的参数文件在替换之前一直存在
+        except OSError:
+            shutil.copy2(path, previous)
+
+    os.replace(tmp, path)
+
+    # 同步目录，保证替换操作本身也写入磁盘
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Entry:
+    """
+    一个被管理的状态及其参数文件。
+    """
+    __slots__ = ('state', 'path', 'committed', 'written', 'dirty_fields')
+
+    def __init__(self, state: StrategyState, path: str):
+        self.state = state
+        self.path = path
+        self.committed = state.persisted()  # 策略线程最近一次提交的值
+        self.written = self.committed  # 最近一次写入磁盘的值
+        self.dirty_fields = set()  # 写入磁盘之后发生过变化的字段
+
+
+class CheckpointWriter:
+    """
+    动态参数的检查点写入器，commit()只在策略线程中调用，写入在后台线程中进行。
+    """
+
+    def __init__(self, interval: float = 30.0, debounce: float = 1.0, generations: int = 3):
+        """
+        :param interval: 后台线程最长每interval秒检查一次有没有需要写入（包括之前写入失败）的参数文件
+        :param debounce: 参数变化后等待debounce秒再写入，合并这段时间内的多次变化
+        :param generations: 每个参数文件保留的旧版本数量
+        """
+        self.interval = interval
+        self.debounce = debounce
+        self.generations = generations
+
+        self._entries: list[_Entry] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.write_time = LatencyHistogram()  # 每次写入一个参数文件的耗时
+        self.commits = 0  # commit()的次数
+        self.skipped = 0  # commit()时参数没有变化、跳过序列化的次数（按状态计数）
+        self.writes = 0  # 写入参数文件的次数
+        self.errors = 0  # 写入失败的次数
+
+    def load(self, state: StrategyState, path: str) -> bool:
+        """
+        从参数文件加载动态参数并开始管理这个状态。参数文件损坏或者缺失时依次尝试旧版本。
+        :param state: 策略的动态状态
+        :param path: 参数文件的路径
+        :return: 没有任何可用的参数文件时返回False，状态不变
+        """
+        loaded = False
+        for candidate in [path] + [f'{path}.{i}' for i in range(1, self.generations + 1)]:
+            try:
+                loaded = state.load(candidate)
+            except (ValueError, KeyError, OSError) as e:
+                global_vars.lq.push(('检查点-参数加载', 'Error', f'参数文件{candidate}损坏:{e}'))
+                continue
+            if loaded:
+                if candidate != path:
+                    global_vars.lq.push(('检查点-参数加载', 'Warning', f'{path}不可用，从旧版本{candidate}恢复参数'))
+                break
+        with self._lock:
+            self._entries.append(_Entry(state, path))
+        return loaded
+
+    def commit(self) -> int:
+        """
+        在策略线程每个周期结束时调用，记录发生变化的参数并唤醒后台线程。
+        :return: 参数发生变化的状态数量
+        """
+        changed = skipped = 0
+        with self._lock:
+            self.commits += 1
+            for entry in self._entries:
+                values = entry.state.persisted()
+                if values == entry.committed:
+                    skipped += 1
+                    continue
+                entry.dirty_fields.update(name for name, a, b in zip(PERSISTED_FIELDS, values, entry.committed)
+                                          if a != b)
+                entry.committed = values
+                changed += 1
+            self.skipped += skipped
+        CHECKPOINT_COMMITS.inc()
+        if skipped:
+            CHECKPOINT_SKIPPED.inc(amount=skipped)
+        if changed:
+            self._wake.set()
+        return changed
+
+    def flush(self) -> int:
+        """
+        立即写入所有发生过变化的参数文件，没有变化的状态跳过序列化。
+        :return: 写入的参数文件数量
+        """
+        with self._lock:
+            pending = [(entry, entry.committed) for entry in self._entries if entry.committed != entry.written]
+
+        written = 0
+        for entry, values in pending:
+            start = time.perf_counter()
+            try:
+                atomic_write(entry.path, persisted_json(values), self.generations)
+            except Exception as e:  # 写入失败时保持脏状态，下一次检查时重试
+                self.errors += 1
+                CHECKPOINT_ERRORS.inc()
+                global_vars.lq.push(('检查点-参数保存', 'Error', f'保存{entry.path}失败:{e}'))
+                continue
+            self.write_time.record(time.perf_counter() - start)
+            with self._lock:
+                entry.written = values
+                fields = sorted(entry.dirty_fields)
+                if values == entry.committed:
+                    entry.dirty_fields.clear()
+            self.writes += 1
+            CHECKPOINT_WRITES.inc()
+            written += 1
+            global_vars.lq.push(('检查点-参数保存', 'Info', f'保存{entry.path}成功，变化的参数：{",".join(fields)}'))
+        return written
+
+    def _run(self) -> None:
+        """
+        后台写入线程：等待参数变化或者interval秒，防抖后写入。
+        """
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            if self._stop.is_set():
+                break
+            if self._wake.is_set():
+                self._stop.wait(self.debounce)  # 合并debounce秒内的多次变化，程序停止时提前结束等待
+                self._wake.clear()
+            self.flush()
+
+    def start(self) -> 'CheckpointWriter':
+        """
+        启动后台写入线程。
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='checkpoint_thread', daemon=True)
+            self._thread.start()
+            global_vars.metrics.register_collector('checkpoint', self.metric_lines)
+        return self
+
+    def close(self) -> None:
+        """
+        停止后台写入线程，并写入所有还没有写入的参数。策略线程退出前调用。
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def snapshot(self) -> dict:
+        """
+        :return: 写入器的统计信息
+        """
+        return {
+            'commits': self.commits,
+            'skipped': self.skipped,
+            'writes': self.writes,
+            'errors': self.errors,
+            'write_time': self.write_time.snapshot(),
+        }
+
+    def metric_lines(self) -> list:
+        """
+        :return: Prometheus文本格式的写入耗时，次数统计是单独注册的计数器
+        """
+        name = f'{global_vars.metrics.namespace}_checkpoint_write_seconds'
+        return [f'# TYPE {name} histogram'] + histogram_lines(name, (), (), self.write_time)
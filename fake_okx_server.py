@@ -0,0 +1,482 @@
+"""
+该模块实现了一个本地运行的模拟Okx服务器，实现了本项目用到的REST接口，使所有测试和性能测试都可以在没有网络的情况下运行。具体包括：
+
+- GET  /api/v5/market/ticker：行情，价格按照固定随机数种子的随机游走变化，每请求一次走一步。
+- GET  /api/v5/market/tickers：所有交易对的行情，每请求一次所有交易对各走一步。
+- GET  /api/v5/public/instruments：合约信息（lotSz、minSz、ctVal）。
+- GET  /api/v5/account/positions：持仓信息。
+- GET  /api/v5/account/positions-history：历史持仓信息，最新的在前。
+- GET  /api/v5/account/balance：账户余额。
+- POST /api/v5/account/set-leverage：设置杠杆倍数。
+- POST /api/v5/trade/order：下单。市价单按最新价格加上固定滑点成交，可以立即成交的限价单按最新价格成交，
+  其余限价单被拒绝；同样的请求顺序总是得到同样的成交结果。
+- GET  /api/v5/market/history-candles：日K线，由交易对和日期决定，每次请求结果相同。
+- POST /api/v5/trade/order-algo：下仓位止损止盈单（ordType=conditional，closeFraction=1）。价格每走一步检查一次是否触发，
+  触发时按最新价格以市价平掉整个仓位；仓位被平掉后撤销这个交易对所有的止损止盈单。
+- POST /api/v5/trade/amend-algos：修改止损止盈单的触发价格。
+- POST /api/v5/trade/cancel-algos：撤销止损止盈单。
+- GET  /api/v5/trade/orders-algo-pending：未完成的止损止盈单。
+
+可以配置每个请求的延迟（固定延迟加上随机抖动）和出错概率（返回HTTP 500），也可以单独配置某个接口的出错概率，
+用来测试重试、超时等逻辑。服务器会统计每个接口的请求次数。
+
+使用方式：
+    python fake_okx_server.py --port 8081 --latency 0.05 --error-rate 0.01
+    然后设置环境变量 OKX_DOMAIN=http://127.0.0.1:8081 再运行程序，myokx会访问这个服务器。
+"""
+
+" 内置模块 "
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+" 第三方模块 "
+import numpy as np
+
+" 自定义模块 "
+from backtest import SimulatedExchange
+
+# 默认的合约信息和初始价格
+DEFAULT_INSTRUMENTS = {
+    'BTC-USDT-SWAP': {'lotSz': '0.01', 'minSz': '0.01', 'ctVal': '0.01', 'price': 60000.0},
+    'ETH-USDT-SWAP': {'lotSz': '0.01', 'minSz': '0.01', 'ctVal': '0.1', 'price': 3000.0},
+    'SOL-USDT-SWAP': {'lotSz': '0.01', 'minSz': '0.01', 'ctVal': '1', 'price': 150.0},
+    'DOGE-USDT-SWAP': {'lotSz': '0.01', 'minSz': '0.01', 'ctVal': '1000', 'price': 0.12},
+}
+
+
+def _ok(data: list) -> dict:
+    return {'code': '0', 'msg': '', 'data': data}
+
+
+def _error(code: str, msg: str, data: list = None) -> dict:
+    return {'code': code, 'msg': msg, 'data': data or []}
+
+
+class FakeOkxExchange:
+    """
+    模拟Okx的撮合和账户状态，线程安全。
+    """
+
+    def __init__(self, instruments: dict = None, seed: int = 0, volatility: float = 0.0005,
+                 slippage_bps: float = 1.0, fee_rate: float = 0.0005, balance: float = 10000.0):
+        """
+        :param instruments: 合约信息，格式与DEFAULT_INSTRUMENTS相同
+        :param seed: 随机数种子
+        :param volatility: 每请求一次行情，价格随机游走的标准差（对数收益率）
+        :param slippage_bps: 市价单的滑点（基点）
+        :param fee_rate: 手续费率
+        :param balance: 初始账户余额（USDT）
+        """
+        self.instruments = {k: dict(v) for k, v in (instruments or DEFAULT_INSTRUMENTS).items()}
+        self.seed = seed
+        self.volatility = volatility
+        self.slippage_bps = slippage_bps
+        self.fee_rate = fee_rate
+        self.balance = balance
+        self._lock = threading.Lock()
+        self._rngs = {inst: np.random.default_rng([seed, i]) for i, inst in enumerate(self.instruments)}
+        self.prices = {inst: info['price'] for inst, info in self.instruments.items()}
+        self.sod = dict(self.prices)
+        self.vol24h = {inst: 1_000_000.0 for inst in self.instruments}
+        self.leverage = {}
+        self.accounts = {}
+        self.history = []
+        self.order_id = 0
+        self.algos = {}  # 未完成的止损止盈单，{algoId: 止损止盈单}
+        self.algo_id = 0
+        self.triggered = 0  # 被触发的止损止盈单数量
+
+    def _account(self, instId: str) -> SimulatedExchange:
+        if instId not in self.accounts:
+            info = self.instruments[instId]
+            self.accounts[instId] = SimulatedExchange(self.leverage.get(instId, 10), float(info['minSz']),
+                                                      float(info['ctVal']), self.fee_rate)
+        return self.accounts[instId]
+
+    def _step(self, instId: str) -> dict:
+        rng = self._rngs[instId]
+        self.prices[instId] *= float(np.exp(rng.normal(0, self.volatility)))
+        self.vol24h[instId] += float(rng.uniform(0, 100))
+        last = self.prices[instId]
+        self._check_algos(instId, last)
+        spread = last * 0.00001
+        return {
+            'instType': 'SWAP', 'instId': instId,
+            'last': f'{last:.6g}', 'lastSz': '1',
+            'askPx': f'{last + spread:.6g}', 'askSz': f'{rng.uniform(1, 500):.2f}',
+            'bidPx': f'{last - spread:.6g}', 'bidSz': f'{rng.uniform(1, 500):.2f}',
+            'open24h': f'{self.sod[instId]:.6g}', 'sodUtc0': f'{self.sod[instId]:.6g}',
+            'sodUtc8': f'{self.sod[instId]:.6g}', 'vol24h': f'{self.vol24h[instId]:.2f}',
+            'ts': str(int(time.time() * 1000)),
+        }
+
+    def _fill(self, instId: str, side: str, sz: float, px: float, tdMode: str = 'cross') -> None:
+        """
+        按价格px成交，仓位被完全平掉时记录一条历史持仓，并撤销这个交易对所有的止损止盈单。
+        """
+        account = self._account(instId)
+        open_px, direction = account.avg_px, 'long' if account.pos > 0 else 'short'
+        closed_pnl = account.place_market(side, sz, px)
+        if closed_pnl is not None:
+            now = str(int(time.time() * 1000))
+            self.history.append({
+                'instType': 'SWAP', 'instId': instId, 'mgnMode': tdMode, 'type': '2',
+                'direction': direction, 'openAvgPx': f'{open_px:.8g}', 'closeAvgPx': f'{px:.8g}',
+                'realizedPnl': f'{closed_pnl:.8g}', 'pnl': f'{closed_pnl:.8g}', 'lever': str(account.leverage),
+                'cTime': now, 'uTime': now,
+            })
+            for algoId in [k for k, algo in self.algos.items() if algo['instId'] == instId]:
+                del self.algos[algoId]
+
+    def _check_algos(self, instId: str, last: float) -> None:
+        """
+        价格走一步后检查这个交易对的止损止盈单是否触发，触发时按最新价格以市价平掉整个仓位。
+        """
+        account = self.accounts.get(instId)
+        if account is None or account.pos == 0:
+            return
+        for algo in [a for a in self.algos.values() if a['instId'] == instId]:
+            long = algo['side'] == 'sell'
+            sl_px = float(algo['slTriggerPx']) if algo['slTriggerPx'] else None
+            tp_px = float(algo['tpTriggerPx']) if algo['tpTriggerPx'] else None
+            if sl_px is not None and (last <= sl_px if long else last >= sl_px) or \
+                    tp_px is not None and (last >= tp_px if long else last <= tp_px):
+                slip = last * self.slippage_bps / 10000
+                self._fill(instId, algo['side'], abs(account.pos), last - slip if long else last + slip,
+                           algo['tdMode'])
+                self.triggered += 1
+                return
+
+    def place_algo_order(self, body: dict) -> dict:
+        with self._lock:
+            instId = body.get('instId', '')
+            if instId not in self.instruments:
+                return _error('1', 'All operations failed',
+                              [{'sCode': '51001', 'sMsg': f'Instrument ID {instId} does not exist'}])
+            if body.get('ordType') != 'conditional' or body.get('closeFraction') != '1' or \
+                    body.get('side') not in ('buy', 'sell'):
+                return _error('1', 'All operations failed',
+                              [{'sCode': '51000', 'sMsg': 'Only position TP/SL conditional orders are supported'}])
+            account = self.accounts.get(instId)
+            if account is None or account.pos == 0 or (account.pos > 0) != (body['side'] == 'sell'):
+                return _error('1', 'All operations failed',
+                              [{'sCode': '51169', 'sMsg': 'No position in the closing direction'}])
+            self.algo_id += 1
+            algoId = str(self.algo_id)
+            self.algos[algoId] = {'algoId': algoId, 'instId': instId, 'instType': 'SWAP', 'ordType': 'conditional',
+                                  'side': body['side'], 'tdMode': body.get('tdMode', 'cross'), 'state': 'live',
+                                  'closeFraction': '1', 'slTriggerPx': body.get('slTriggerPx', ''),
+                                  'tpTriggerPx': body.get('tpTriggerPx', '')}
+            return _ok([{'algoId': algoId, 'algoClOrdId': body.get('algoClOrdId', ''), 'sCode': '0', 'sMsg': ''}])
+
+    def amend_algo_order(self, body: dict) -> dict:
+        with self._lock:
+            algo = self.algos.get(body.get('algoId', ''))
+            if algo is None:
+                return _error('1', 'All operations failed', [{'sCode': '51603', 'sMsg': 'Order does not exist'}])
+            if body.get('newSlTriggerPx'):
+                algo['slTriggerPx'] = body['newSlTriggerPx']
+            if body.get('newTpTriggerPx'):
+                algo['tpTriggerPx'] = body['newTpTriggerPx']
+            return _ok([{'algoId': algo['algoId'], 'sCode': '0', 'sMsg': ''}])
+
+    def cancel_algo_orders(self, body: list) -> dict:
+        with self._lock:
+            data = []
+            for item in body if isinstance(body, list) else [body]:
+                algo = self.algos.pop(item.get('algoId', ''), None)
+                data.append({'algoId': item.get('algoId', ''), 'sCode': '0' if algo else '51603', 'sMsg': ''})
+            return _ok(data)
+
+    def algos_pending(self, instId: str = '') -> dict:
+        with self._lock:
+            return _ok([dict(a) for a in self.algos.values() if not instId or a['instId'] == instId])
+
+    def ticker(self, instId: str) -> dict:
+        with self._lock:
+            if instId not in self.instruments:
+                return _error('51001', f'Instrument ID {instId} does not exist')
+            return _ok([self._step(instId)])
+
+    def tickers(self, instType: str = 'SWAP') -> dict:
+        with self._lock:
+            return _ok([self._step(instId) for instId in self.instruments])
+
+    def instrument(self, instType: str, instId: str) -> dict:
+        if instId not in self.instruments:
+            return _error('51001', f'Instrument ID {instId} does not exist')
+        info = self.instruments[instId]
+        return _ok([{'instType': instType or 'SWAP', 'instId': instId, 'lotSz': info['lotSz'],
+                     'minSz': info['minSz'], 'ctVal': info['ctVal'], 'settleCcy': 'USDT', 'state': 'live'}])
+
+    def set_leverage(self, body: dict) -> dict:
+        with self._lock:
+            instId = body.get('instId', '')
+            lever = int(float(body.get('lever', 10)))
+            self.leverage[instId] = lever
+            if instId in self.accounts:
+                self.accounts[instId].leverage = lever
+            return _ok([{'instId': instId, 'lever': str(lever), 'mgnMode': body.get('mgnMode', 'cross'),
+                         'posSide': body.get('posSide', '')}])
+
+    def positions(self, instId: str = '') -> dict:
+        with self._lock:
+            data = []
+            for inst, account in self.accounts.items():
+                if account.pos == 0 or (instId and inst != instId):
+                    continue
+                price = self.prices[inst]
+                data.append({
+                    'instType': 'SWAP', 'instId': inst, 'mgnMode': 'cross', 'posSide': 'net',
+                    'pos': f'{account.pos:.8g}', 'avgPx': f'{account.avg_px:.8g}',
+                    'markPx': f'{price:.8g}', 'last': f'{price:.8g}', 'lever': str(account.leverage),
+                    'notionalUsd': f'{abs(account.notional(price)):.8g}',
+                    'upl': f'{account.upl(price):.8g}', 'uplRatio': f'{account.upl_ratio(price):.8g}',
+                })
+            return _ok(data)
+
+    def positions_history(self, instId: str = '', limit: int = 100) -> dict:
+        with self._lock:
+            data = [h for h in reversed(self.history) if not instId or h['instId'] == instId]
+            return _ok(data[:limit])
+
+    def balance_info(self) -> dict:
+        with self._lock:
+            equity = self.balance + sum(a.realized + a.upl(self.prices[i]) for i, a in self.accounts.items())
+            return _ok([{'totalEq': f'{equity:.8g}', 'uTime': str(int(time.time() * 1000)),
+                         'details': [{'ccy': 'USDT', 'eq': f'{equity:.8g}', 'availBal': f'{equity:.8g}',
+                                      'uTime': str(int(time.time() * 1000))}]}])
+
+    def place_order(self, body: dict) -> dict:
+        with self._lock:
+            instId = body.get('instId', '')
+            if instId not in self.instruments:
+                return _error('1', 'All operations failed',
+                              [{'sCode': '51001', 'sMsg': f'Instrument ID {instId} does not exist'}])
+            side = body.get('side')
+            try:
+                sz = float(body.get('sz', 0))
+            except ValueError:
+                sz = 0.0
+            lot = float(self.instruments[instId]['lotSz'])
+            if side not in ('buy', 'sell') or sz <= 0 or abs(sz / lot - round(sz / lot)) > 1e-6:
+                return _error('1', 'All operations failed', [{'sCode': '51121', 'sMsg': 'Invalid order size'}])
+
+            last = self.prices[instId]
+            ordType = body.get('ordType', 'market')
+            if ordType == 'market':
+                slip = last * self.slippage_bps / 10000
+                px = last + slip if side == 'buy' else last - slip
+            elif ordType == 'limit':
+                limit_px = float(body.get('px', 0))
+                if (side == 'buy' and limit_px < last) or (side == 'sell' and limit_px > last):
+                    return _error('1', 'All operations failed',
+                                  [{'sCode': '51000', 'sMsg': 'Resting limit orders are not supported'}])
+                px = last
+            else:
+                return _error('1', 'All operations failed',
+                              [{'sCode': '51000', 'sMsg': f'Unsupported ordType {ordType}'}])
+
+            self._fill(instId, side, sz, px, body.get('tdMode', 'cross'))
+            self.order_id += 1
+            return _ok([{'ordId': str(self.order_id), 'clOrdId': body.get('clOrdId', ''), 'tag': '',
+                         'sCode': '0', 'sMsg': 'Order placed', 'fillPx': f'{px:.8g}'}])
+
+    def history_candles(self, instId: str, after: str = '', before: str = '', limit: int = 100) -> dict:
+        """
+        日K线，时间为UTC+8的零点，最新的在前。after表示返回早于这个时间戳（毫秒）的K线，before表示返回晚于这个时间戳的K线。
+        """
+        if instId not in self.instruments:
+            return _error('51001', f'Instrument ID {instId} does not exist')
+        end = datetime.fromtimestamp(int(after) / 1000) if after else datetime.now()
+        start = datetime.fromtimestamp(int(before) / 1000) if before else end - timedelta(days=limit)
+        day = datetime(end.year, end.month, end.day)
+        if day >= end:
+            day -= timedelta(days=1)
+        base = self.instruments[instId]['price']
+        data = []
+        while day > start and len(data) < limit:
+            rng = np.random.default_rng([self.seed, int(day.timestamp()) // 86400, len(instId)])
+            o = base * float(np.exp(rng.normal(0, 0.05)))
+            c = o * float(np.exp(rng.normal(0, 0.02)))
+            h, l = max(o, c) * (1 + float(rng.uniform(0, 0.01))), min(o, c) * (1 - float(rng.uniform(0, 0.01)))
+            vol = float(rng.uniform(1e5, 1e6))
+            data.append([str(int(day.timestamp() * 1000)), f'{o:.6g}', f'{h:.6g}', f'{l:.6g}', f'{c:.6g}',
+                         f'{vol:.2f}', f'{vol * c:.2f}', f'{vol * c:.2f}', '1'])
+            day -= timedelta(days=1)
+        return _ok(data)
+
+
+class FakeOkxServer:
+    """
+    模拟Okx的HTTP服务器，在后台线程中运行。
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, exchange: FakeOkxExchange = None,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 endpoint_error_rates: dict = None, seed: int = 0):
+        """
+        :param host: 监听地址
+        :param port: 监听端口，为0时由系统分配
+        :param exchange: 撮合和账户状态，默认为新的FakeOkxExchange
+        :param latency: 每个请求的固定延迟（秒）
+        :param jitter: 每个请求额外的随机延迟的最大值（秒）
+        :param error_rate: 每个请求返回HTTP 500的概率
+        :param endpoint_error_rates: 单独配置某个接口返回HTTP 500的概率，例如：{'/api/v5/trade/order': 0.1}
+        :param seed: 延迟和出错的随机数种子
+        """
+        self.exchange = exchange or FakeOkxExchange(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.endpoint_error_rates = endpoint_error_rates or {}
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.errors = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        :return: 服务器地址，例如http://127.0.0.1:8081，可以作为OKX_DOMAIN或者MyOkx的domain参数
+        """
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeOkxServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake_okx_server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'FakeOkxServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stats(self) -> dict:
+        """
+        :return: 每个接口的请求次数和注入的错误次数
+        """
+        with self._lock:
+            return {'requests': dict(self.requests), 'errors': dict(self.errors)}
+
+    def _inject(self, path: str) -> bool:
+        """
+        记录请求次数，按照配置等待，返回这个请求是否应该出错。
+        """
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            delay = self.latency + (float(self._rng.uniform(0, self.jitter)) if self.jitter else 0.0)
+            rate = self.endpoint_error_rates.get(path, self.error_rate)
+            fail = rate > 0 and float(self._rng.random()) < rate
+            if fail:
+                self.errors[path] = self.errors.get(path, 0) + 1
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+    def route(self, method: str, path: str, query: dict, body: dict) -> tuple:
+        """
+        :return: (HTTP状态码, 响应的JSON)
+        """
+        ex = self.exchange
+        q = {k: v[0] for k, v in query.items()}
+        if method == 'GET' and path == '/api/v5/market/ticker':
+            return 200, ex.ticker(q.get('instId', ''))
+        if method == 'GET' and path == '/api/v5/market/tickers':
+            return 200, ex.tickers(q.get('instType', 'SWAP'))
+        if method == 'GET' and path == '/api/v5/public/instruments':
+            return 200, ex.instrument(q.get('instType', ''), q.get('instId', ''))
+        if method == 'GET' and path == '/api/v5/account/positions':
+            return 200, ex.positions(q.get('instId', ''))
+        if method == 'GET' and path == '/api/v5/account/positions-history':
+            return 200, ex.positions_history(q.get('instId', ''), int(q.get('limit') or 100))
+        if method == 'GET' and path == '/api/v5/account/balance':
+            return 200, ex.balance_info()
+        if method == 'GET' and path == '/api/v5/market/history-candles':
+            return 200, ex.history_candles(q.get('instId', ''), q.get('after', ''), q.get('before', ''),
+                                           int(q.get('limit') or 100))
+        if method == 'POST' and path == '/api/v5/account/set-leverage':
+            return 200, ex.set_leverage(body)
+        if method == 'POST' and path == '/api/v5/trade/order':
+            return 200, ex.place_order(body)
+        if method == 'POST' and path == '/api/v5/trade/order-algo':
+            return 200, ex.place_algo_order(body)
+        if method == 'POST' and path == '/api/v5/trade/amend-algos':
+            return 200, ex.amend_algo_order(body)
+        if method == 'POST' and path == '/api/v5/trade/cancel-algos':
+            return 200, ex.cancel_algo_orders(body)
+        if method == 'GET' and path == '/api/v5/trade/orders-algo-pending':
+            return 200, ex.algos_pending(q.get('instId', ''))
+        return 404, _error('404', f'{method} {path} is not implemented by the fake server')
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # 响应头和响应体分两次写入，不关闭Nagle算法会和客户端的延迟确认叠加出40毫秒的延迟
+
+            def _handle(self, method: str) -> None:
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                if server._inject(parts.path):
+                    status, payload = 500, _error('50001', 'Service temporarily unavailable')
+                else:
+                    try:
+                        body = json.loads(raw) if raw else {}
+                        status, payload = server.route(method, parts.path, parse_qs(parts.query), body)
+                    except Exception as e:
+                        status, payload = 500, _error('50000', f'Fake server error: {e}')
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地模拟Okx服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='每个请求额外的随机延迟的最大值（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='每个请求返回HTTP 500的概率')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeOkxServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, seed=args.seed).start()
+    print(f'模拟Okx服务器已启动：{fake.url}，设置环境变量 OKX_DOMAIN={fake.url} 后运行程序')
+    try:
+        while True:
+            time.sleep(60)
+            print(fake.stats())
+    except KeyboardInterrupt:
+        fake.stop()
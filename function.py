@@ -33,56 +33,7 @@ import json
 
 " 自定义模块 "
 from myokx import MyOkx
-from global_vars import lq
-
-
-# 根据市场价格变动调整随机休眠时间区间的函数
-def modulate_randomtime(random_start: int, random_end: int, before_price: float, current_price: float) -> (int, int):
-    """
-    根据市场价格变动调整随机休眠时间区间。
-
-    参数：
-    - random_start: 随机休眠时间区间的左区间，表示休眠时间的最小值（秒）。
-    - random_end: 随机休眠时间区间的右区间，表示休眠时间的最大值（秒）。
-    - before_price: 上一次循环的价格，用于与当前价格比较，计算价格变动百分比。
-    - current_price: 当前的价格，用于与上一次循环的价格比较，计算价格变动百分比。
-
-    返回：
-    - 调整后的随机休眠时间区间（random_start, random_end）。
-    """
-    # 避免除以零的情况
-    if before_price == 0:
-        return random_start, random_end
-
-    # 计算价格变动百分比
-    last_p_p = abs((current_price - before_price) / before_price) if before_price != 0 else 0
-
-    # 根据价格变动百分比调整随机休眠时间区间
-    if last_p_p >= 0.01:
-        # 变化太快，减少休眠时间以快速响应市场变化
-        random_start, random_end = 2, 4
-    elif 0.001 < last_p_p < 0.01:
-        # 变化较快，适度减少休眠时间
-        random_start, random_end = max(2, random_start - 35), min(100, random_end - 55)
-    elif 0.0006 < last_p_p < 0.001:
-        # 变化适中，略微减少休眠时间
-        random_start, random_end = max(2, random_start - 20), min(100, random_end - 40)
-    elif 0.0001 < last_p_p < 0.0006:
-        # 变化较慢，略微增加休眠时间
-        random_start, random_end = random_start + 8, random_end + 13
-    elif last_p_p < 0.0001:
-        # 变化很慢，增加休眠时间以减少交易频率
-        random_start, random_end = random_start + 19, random_end + 38
-
-    # 确保随机休眠时间区间的合理性
-    random_start = max(2, min(45, random_start))  # random_start的最小值为2，最大值为45
-    random_end = max(4, min(100, random_end))  # random_end的最小值为4，最大值为100
-
-    # 确保random_start不大于random_end
-    if random_end < random_start:
-        random_start, random_end = random_end, random_start
-
-    return random_start, random_end
+from global_vars import lq, tick_timer
 
 
 # 初始化交易策略中使用的一系列动态参数的函数
@@ -90,7 +41,7 @@ def init_arguments(place_uplimit: float, place_downlimit: float) -> tuple:
     """
     初始化交易策略中使用的一系列动态参数。
 
-    这些参数包括记录不同价格变动区间的次数计数器、随机时间区间的界限、开仓的上下限等。
+    这些参数包括记录不同价格变动区间的次数计数器、开仓的上下限等。
     这些参数对于确定交易策略的行为至关重要，比如决定何时开仓、何时平仓等。
 
     参数：
@@ -103,7 +54,6 @@ def init_arguments(place_uplimit: float, place_downlimit: float) -> tuple:
         u_p_2, d_p_2: 分别记录涨幅和跌幅在特定区间2的次数。
         u_p_3, d_p_3: 分别记录涨幅和跌幅在特定区间3的次数。
         u_p_4, d_p_4: 分别记录涨幅和跌幅在特定区间4的次数。
-        random_start, random_end: 随机时间区间的左右界限。
         long_place_uplimit, long_place_downlimit: 开多仓的涨幅上下限。
         short_place_uplimit, short_place_downlimit: 开空仓的跌幅上下限。
         l_c, s_c: 开多仓和开空仓的次数计数器。
@@ -111,10 +61,6 @@ def init_arguments(place_uplimit: float, place_downlimit: float) -> tuple:
     # 初始化记录不同价格变动区间的次数计数器
     u_p_1 = d_p_1 = u_p_2 = d_p_2 = u_p_3 = d_p_3 = u_p_4 = d_p_4 = 0
 
-    # 初始化随机时间区间的界限
-    random_start = 10  # 随机时间区间的最小值
-    random_end = 20  # 随机时间区间的最大值
-
     # 初始化开仓的上下限
     long_place_uplimit = place_uplimit
     long_place_downlimit = place_downlimit
@@ -126,7 +72,6 @@ def init_arguments(place_uplimit: float, place_downlimit: float) -> tuple:
     s_c = 0  # 开空仓的次数计数器
 
     return (u_p_1, d_p_1, u_p_2, d_p_2, u_p_3, d_p_3, u_p_4, d_p_4,
-            random_start, random_end,
             long_place_uplimit, long_place_downlimit,
             short_place_uplimit, short_place_downlimit,
             l_c, s_c)
@@ -375,7 +320,8 @@ def update_short_place_downlimit_and_short_place_uplimit_for_the_s_c(
 def save_parameter(long_place_downlimit: float, long_place_uplimit: float,
                    short_place_downlimit: float, short_place_uplimit: float,
                    l_c: int, s_c: int, u_p_1: int, u_p_2: int, u_p_3: int, u_p_4: int,
-                   d_p_1: int, d_p_2: int, d_p_3: int, d_p_4: int, n_sz: int, loss: float, profit: float) -> None:
+                   d_p_1: int, d_p_2: int, d_p_3: int, d_p_4: int, n_sz: int, loss: float, profit: float,
+                   path: str = 'parameter.txt') -> None:
     """
     保存当前的动态参数到文件。
 
@@ -394,6 +340,7 @@ def save_parameter(long_place_downlimit: float, long_place_uplimit: float,
     - n_sz: 实际的minSz整数倍。
     - loss: 累计亏损金额(USDT)
     - profit: 累计盈利金额(USDT)
+    - path: 参数文件的路径，默认为parameter.txt
     返回：
     - 无返回值，函数执行后会将参数保存到文件中。
     """
@@ -419,12 +366,12 @@ def save_parameter(long_place_downlimit: float, long_place_uplimit: float,
     }
 
     # 将数据字典转换为JSON字符串并保存到文件
-    with open('parameter.txt', 'w') as f:
+    with open(path, 'w') as f:
         f.write(json.dumps(data, indent=4))  # 使用indent参数美化输出
 
 
 # 从文件中加载动态参数的函数
-def load_parameter() -> tuple | None:
+def load_parameter(path: str = 'parameter.txt') -> tuple | None:
     """
     从文件中加载动态参数。
 
@@ -432,7 +379,7 @@ def load_parameter() -> tuple | None:
     该函数将从文件中读取这些参数，并返回它们，以便在程序启动时初始化策略状态。
 
     参数：
-    - 无
+    - path: 参数文件的路径，默认为parameter.txt
 
     返回：
     - 一个包含加载的参数的元组，包括：
@@ -445,7 +392,7 @@ def load_parameter() -> tuple | None:
     """
     try:
         # 打开文件并加载JSON数据
-        with open('parameter.txt', 'r') as f:
+        with open(path, 'r') as f:
             data = json.load(f)
 
         # 提取参数并返回
@@ -479,6 +426,7 @@ def load_parameter() -> tuple | None:
 
 
 # 执行止盈操作，并在操作后重新初始化相关参数的函数
+@tick_timer.timed('take_profit')
 def take_progit(o: MyOkx, instId: str, leverage: int, place_uplimit: float, place_downlimit: float) -> tuple | None:
     """
     执行止盈操作，并在操作后重新初始化相关参数。
@@ -494,7 +442,7 @@ def take_progit(o: MyOkx, instId: str, leverage: int, place_uplimit: float, plac
     - place_downlimit: 开仓的跌幅下限。
 
     返回：
-    - 如果止盈操作成功，返回更新后的参数集合，包括涨跌幅区间计数器和随机时间区间等；
+    - 如果止盈操作成功，返回更新后的参数集合，包括涨跌幅区间计数器和开仓上下限等；
     - 如果失败，则返回None。
     """
     try:
@@ -508,14 +456,12 @@ def take_progit(o: MyOkx, instId: str, leverage: int, place_uplimit: float, plac
             # 止盈操作成功，重新初始化相关参数
             # 这里假设init_arguments函数用于初始化参数
             (u_p_1, d_p_1, u_p_2, d_p_2, u_p_3, d_p_3, u_p_4, d_p_4,
-             random_start, random_end,
              long_place_uplimit, long_place_downlimit,
              short_place_uplimit, short_place_downlimit,
              l_c, s_c) = init_arguments(place_uplimit, place_downlimit)
 
             # 返回更新后的参数
             return (u_p_1, d_p_1, u_p_2, d_p_2, u_p_3, d_p_3, u_p_4, d_p_4,
-                    random_start, random_end,
                     long_place_uplimit, long_place_downlimit,
                     short_place_uplimit, short_place_downlimit,
                     l_c, s_c)
@@ -529,6 +475,7 @@ def take_progit(o: MyOkx, instId: str, leverage: int, place_uplimit: float, plac
         return None
 
 
+@tick_timer.timed('statistics')
 def statistics_profit(o: MyOkx, trade_type: int, profit: float) -> float:
     """
     这个函数会根据交易类型来统计累计盈利情况
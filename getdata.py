@@ -5,7 +5,7 @@
 - 获取从开始时间到现在的所有K线数据。
 - 将数据保存到MySQL数据库中。
 - 从MySQL数据库中获取数据并转换为DataFrame。
-- 获取特定加密货币的最新价格，并计算其标准化后的平均值。
+- 获取特定加密货币的最新价格，并计算其标准化后的平均值（也可以从已经获取的所有交易对的行情中计算）。
 """
 
 " 内置模块 "
@@ -18,7 +18,24 @@ import pandas as pd
 import pymysql
 
 " 自定义模块 "
-from myokx import get_ticker_last_price
+from myokx import get_ticker_last_price, okx_call
+from rate_limiter import PRIORITY_BACKFILL
+import global_vars
+from mysql_stream import DEFAULT_CHUNKSIZE, read_sql_compact
+from mysqldata import select_columns
+
+
+def _exchange_call(exchange_name: str, endpoint: str, func, *args, **kwargs):
+    """
+    调用ccxt的方法，交易所是Okx时通过okx_call访问，和其他访问Okx的代码共用限流器，其他交易所直接调用。
+    :param exchange_name: 交易所名称
+    :param endpoint: 对应的Okx接口路径
+    :param func: ccxt交易所对象的方法
+    :return: func的返回值
+    """
+    if exchange_name == 'okx':
+        return okx_call(endpoint, func, *args, **kwargs)
+    return func(*args, **kwargs)
 
 
 # 获取指定时间范围内的交易对的K线数据的函数
@@ -50,8 +67,10 @@ def fetch_ohlcv(symbol, start_date, end_date, timeframe, exchange_name='okx'):
     while current_time < end_time:
         # 获取K线数据
         try:
-            ohlcv = exchange.fetch_ohlcv(symbol=symbol, timeframe=timeframe, since=current_time,
-                                         limit=100)  # 每次请求100条数据
+            with global_vars.rate_limiter.priority(PRIORITY_BACKFILL):
+                ohlcv = _exchange_call(exchange_name, '/api/v5/market/history-candles', exchange.fetch_ohlcv,
+                                       symbol=symbol, timeframe=timeframe, since=current_time,
+                                       limit=100)  # 每次请求100条数据
         except Exception as e:
             raise f"获取数据时发生错误,错误原因为: {e}"
 
@@ -105,8 +124,10 @@ def fetch_all_ohlcv(symbol, start_date, timeframe, exchange_name='okx'):
     while current_time > start_time:
         # 获取K线数据
         try:
-            ohlcv = exchange.fetch_ohlcv(symbol=symbol, timeframe=timeframe, since=start_time,
-                                         limit=100)  # 每次请求100条数据
+            with global_vars.rate_limiter.priority(PRIORITY_BACKFILL):
+                ohlcv = _exchange_call(exchange_name, '/api/v5/market/history-candles', exchange.fetch_ohlcv,
+                                       symbol=symbol, timeframe=timeframe, since=start_time,
+                                       limit=100)  # 每次请求100条数据
 
         except Exception as e:
             raise f"获取数据时发生错误,错误原因为: {e}"
@@ -216,7 +237,7 @@ def fetch_all_tickers(exchange_name):
         exchange = exchange_class()
 
         # 获取所有交易对的最新市场数据
-        tickers = exchange.fetch_tickers()
+        tickers = _exchange_call(exchange_name, '/api/v5/market/tickers', exchange.fetch_tickers)
 
         return tickers
     except Exception as e:
@@ -224,9 +245,11 @@ def fetch_all_tickers(exchange_name):
 
 
 # 从MySQL数据库中获取指定表的数据并转换为DataFrame的函数
-def get_df_from_mysql(host='localhost', port=3306, user='', password='', database='', table='ohlcv_data'):
+def get_df_from_mysql(host='localhost', port=3306, user='', password='', database='', table='ohlcv_data',
+                      columns=None, chunksize=DEFAULT_CHUNKSIZE):
     """
     从 MySQL 数据库中获取指定表的数据并转换为 DataFrame。
+    数据使用服务端游标分批读取，并压缩数据类型（float32/int8/category）。
 
     :param host: MySQL 主机地址，默认为 localhost。
     :param port: MySQL 端口，默认为 3306。
@@ -234,6 +257,8 @@ def get_df_from_mysql(host='localhost', port=3306, user='', password='', databas
     :param password: MySQL 密码。
     :param database: 数据库名。
     :param table: 表名。
+    :param columns: 需要获取的列名列表，默认获取所有列。
+    :param chunksize: 每一批读取的行数。
     :return: DataFrame，包含从数据库中获取的数据。
     """
     try:
@@ -247,9 +272,9 @@ def get_df_from_mysql(host='localhost', port=3306, user='', password='', databas
         )
 
         with connection:
-            # 使用 pandas 的 read_sql 方法从数据库读取数据并转换为 DataFrame
-            query = f"SELECT * FROM `{table}`;"
-            df = pd.read_sql(query, connection)
+            # 使用服务端游标分批读取数据并转换为 DataFrame
+            query = f"SELECT {select_columns(columns)} FROM `{table}`"
+            df = read_sql_compact(connection, query, chunksize=chunksize)
 
             return df
 
@@ -294,3 +319,28 @@ def get_btc_sol_eth_doge_last_price_mean_normalized() -> np.array:
     except Exception as e:
         # 如果发生异常，抛出异常信息
         raise Exception(f"获取BTC, SOL, ETH, DOGE币种价格时发生错误, 错误原因为: {e}")
+
+
+# 主流币：比特币（BTC）、Solana（SOL）、以太坊（ETH）和狗狗币（DOGE）的永续合约
+MAJORS = ('BTC-USDT-SWAP', 'SOL-USDT-SWAP', 'ETH-USDT-SWAP', 'DOGE-USDT-SWAP')
+
+
+# 从已经获取的行情中计算主流币标准化后的平均值的函数
+def get_majors_mean_p_from_tickers(tickers: dict) -> float:
+    """
+    与get_btc_sol_eth_doge_last_price_mean_normalized的计算相同，但是使用myokx.get_tickers已经获取的行情，
+    不需要再为四种货币各请求一次。
+
+    参数:
+        tickers: myokx.get_tickers的返回值。
+
+    返回:
+        float: 平均值。
+
+    异常:
+        Exception: 如果行情中缺少某种主流币，函数将抛出异常，并提供错误原因。
+    """
+    try:
+        return float(np.mean([tickers[instId][2] for instId in MAJORS]))
+    except KeyError as e:
+        raise Exception(f"行情中缺少主流币{e}的价格")
@@ -4,17 +4,33 @@
 - 控制线程结束的事件对象。
 - 日志队列和实时数据队列，用于存储日志信息和实时数据。
 - 日志表名和实时数据表名，用于根据不同日期创建对应的表。
-- 模型训练线程给出的评分结果最好的模型对象。
-- 模型训练线程给出的没有进行过标准化的特征数据集。
+- 多交易对策略引擎的实时数据队列和实时数据表名（所有交易对共用一张带instId列的表）。
+- 模型训练线程发布的预测器包（模型对象、标准化参数、特征列名、版本号）。
+- 本地磁盘上的模型仓库，用于保存模型版本以及程序启动时的热启动。
+- 模型预测的监控器，记录预测耗时、否决率和特征漂移。
+- 策略线程的周期调度器，其他线程可以通过它提前唤醒策略线程。
+- 策略线程的分阶段计时器、周期耗时数据队列和周期耗时表名。
+- 进程内的监控指标注册表，由监控指标线程以Prometheus文本格式提供给本地的采集程序。
+- 可以在运行时开关的采样分析器。
+- 所有访问Okx的代码共用的限流器。
+- Okx只读请求的合并和短时缓存。
+- 访问Okx的请求策略（超时、对冲请求和重试）。
 
 """
-import pandas as pd
-
 " 内置模块 "
 import threading
 
 " 自定义模块 "
 from logs import LogQueue
+from model_registry import ModelRegistry
+from predictor import PredictorBundle
+from inference_monitor import InferenceMonitor
+from tick_scheduler import TickScheduler
+from tick_timing import TickTimer
+from metrics import MetricsRegistry
+from rate_limiter import RateLimiter
+from request_cache import RequestCache
+from request_policy import RequestPolicy
 
 # 创建一个事件对象:当这个事件被触发，则会触发所有线程的结束
 s_finished_event: bool = False
@@ -25,17 +41,53 @@ lq: LogQueue = LogQueue()
 # 这个是实时数据队列，存储的是实时数据，当有新的数据时，会通过队列的方式，发送给实时数据管理线程，由实时数据管理线程来处理上传到数据库中。
 r_d = []  # 这个是实时数据队列，
 
+# 多交易对实时数据队列，multi_strategy.multi_strategy_manager_thread产生的每一行的第一个元素是交易对，由实时数据管理线程统一写入数据库
+m_r_d = []
+
 # 日志表名，strategy_manager_thread会根据不同日期创建不同日期的日志表
 log_table_name: str
 
 # 实时数据表名，strategy_manager_thread会根据不同日期创建不同日期的实时数据表名
 data_table_name: str
 
-# 模型训练线程给出的评分结果最好的模型对象,初始化为None
-best_model: object = None
+# 多交易对实时数据表名，multi_strategy_manager_thread会根据不同日期创建，为None时实时数据管理线程不写多交易对实时数据
+multi_data_table_name: str = None
+
+# 模型训练线程发布的预测器包,初始化为None。只能整体替换，不能修改其中的字段，策略线程每个周期只读取一次
+predictor: PredictorBundle = None
+
+# 本地磁盘上的模型仓库，模型训练线程每训练出一个模型就保存一个版本，程序启动时从这里加载最近一次可用的模型
+model_registry: ModelRegistry = ModelRegistry()
+
+# 模型预测的监控器，strategy.predict每预测一次记录一次，特征发生漂移时模型训练线程会提前重新训练模型
+inference_monitor: InferenceMonitor = InferenceMonitor()
+
+# 策略线程的周期调度器，由strategy_manager_thread创建。程序需要停止或者出现需要立即处理的市场事件时，调用它的wake()提前唤醒策略线程
+tick_scheduler: TickScheduler = None
+
+# 策略线程的分阶段计时器，默认不启用。被装饰的函数（predict、take_progit等）绑定在这个实例上，只能修改enabled，不能整体替换
+tick_timer: TickTimer = TickTimer()
+
+# 周期耗时数据队列，启用计时时策略线程每个周期产生一行，由实时数据管理线程写入周期耗时表
+t_r_d = []
+
+# 周期耗时表名，与实时数据表同一天，为None时实时数据管理线程不写周期耗时数据
+timing_table_name: str = None
+
+# 进程内的监控指标注册表（Okx请求次数和耗时、数据库写入耗时、模型训练耗时等），由metrics_thread通过本地HTTP接口输出
+metrics: MetricsRegistry = MetricsRegistry()
+
+# 采样分析器，由main.py创建（sampling_profiler.SamplingProfiler），默认不采样，可以通过监控指标线程的本地HTTP接口在运行时开关
+profiler = None
+
+# 所有访问Okx的代码共用的限流器，按接口分组的令牌桶，下单 > 持仓 > 行情 > 补数据。myokx.okx_call每次请求前取令牌
+rate_limiter: RateLimiter = RateLimiter()
+
+# Okx只读请求的合并和短时缓存（行情250毫秒、持仓1秒等），由myokx.okx_call使用，写操作完成后使受影响的缓存失效
+request_cache: RequestCache = RequestCache()
 
-# 模型训练线程给出的没有进行过标准化的特征数据集
-attr_df: pd.DataFrame
+# 访问Okx的请求策略：连接超时和读取超时、只读请求耗时超过p95时的对冲请求、带抖动的指数退避重试，由myokx.okx_call使用
+request_policy: RequestPolicy = RequestPolicy(registry=metrics)
 
 # 交易对最小交易量
 minSz:float
\ No newline at end of file
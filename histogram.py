@@ -0,0 +1,126 @@
+"""
+该模块定义了一个HDR风格的耗时直方图（LatencyHistogram），用来统计耗时的分布。具体包括：
+
+- 以微秒为单位记录耗时，按照对数-线性的桶来计数，相对误差小于1%，记录一次的开销是常数。
+- 计算任意分位数（p50/p95/p99）、最大值、最小值、平均值。
+- 给出按照指定上界累计的计数，用来输出Prometheus格式的直方图。
+"""
+
+" 内置模块 "
+import threading
+
+# 每一个2的幂次区间被分成SUB_BUCKET_HALF个线性的桶，SUB_BUCKET_COUNT以下的值每个值一个桶
+SUB_BUCKET_COUNT = 128
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT // 2
+SUB_BUCKET_BITS = SUB_BUCKET_COUNT.bit_length() - 1
+
+
+def _bucket_index(value: int) -> int:
+    """
+    计算一个整数值（微秒）所在的桶编号
+    """
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + ((value >> shift) - SUB_BUCKET_HALF)
+
+
+def _bucket_upper(index: int) -> int:
+    """
+    计算一个桶能容纳的最大整数值（微秒）
+    """
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = (index - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF + 1
+    mantissa = (index - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    耗时直方图，线程安全。记录和读取的单位都是秒。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float) -> None:
+        """
+        记录一次耗时。
+        :param seconds: 耗时（秒）
+        """
+        index = _bucket_index(max(0, int(seconds * 1_000_000)))
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if self.max is None or seconds > self.max:
+                self.max = seconds
+            if self.min is None or seconds < self.min:
+                self.min = seconds
+
+    def percentile(self, q: float) -> float | None:
+        """
+        计算分位数。
+        :param q: 分位数，取值0到100，例如99表示p99
+        :return: 分位数对应的耗时（秒，桶的上界），没有记录时返回None
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            items = sorted(self._counts.items())
+            target = max(1, int(round(q / 100 * self.count)))
+            seen = 0
+            for index, count in items:
+                seen += count
+                if seen >= target:
+                    return min(_bucket_upper(index) / 1_000_000, self.max)
+            return self.max
+
+    def cumulative(self, bounds: list) -> list:
+        """
+        计算小于等于每个上界的累计次数，用于输出Prometheus格式的直方图。
+        :param bounds: 从小到大排列的上界列表（秒）
+        :return: 与bounds等长的累计次数列表
+        """
+        with self._lock:
+            items = sorted(self._counts.items())
+        result = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            while i < len(items) and _bucket_upper(items[i][0]) / 1_000_000 <= bound:
+                seen += items[i][1]
+                i += 1
+            result.append(seen)
+        return result
+
+    def snapshot(self) -> dict:
+        """
+        :return: 包含次数、平均值、最小值、p50、p95、p99、最大值的字典（秒）
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+    def reset(self) -> None:
+        """
+        清空所有记录
+        """
+        with self._lock:
+            self._counts = {}
+            self.count = 0
+            self.total = 0.0
+            self.min = None
+            self.max = None
@@ -0,0 +1,184 @@
+"""
+该模块定义了模型预测的监控器（InferenceMonitor），记录strategy.predict每一次预测的情况。具体包括：
+
+- 预测耗时的直方图（p50/p95/p99/最大值）。
+- 预测次数、否决次数（模型预测亏损，拦截了开仓信号）和否决率，以及没有可用模型时直接放行的次数。
+- 实时特征每一列的运行均值和标准差（Welford算法），与训练集的均值和标准差对比。
+- 实时特征相对训练集的分布漂移程度（PSI，群体稳定性指标）。
+
+PSI超过阈值时drift_detected返回True，模型训练线程据此提前开始下一轮训练。
+"""
+
+" 内置模块 "
+import threading
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+
+" 自定义模块 "
+from histogram import LatencyHistogram
+
+# 计算PSI时把训练集的每一列按照分位数分成的区间数
+PSI_BINS = 10
+
+
+def build_reference(attr_df: pd.DataFrame, bins: int = PSI_BINS) -> dict:
+    """
+    根据训练集（没有标准化的特征集）构建漂移检测的参照分布。
+    :param attr_df: 没有标准化的特征集
+    :param bins: 每一列划分的区间数
+    :return: 包含每一列的均值、标准差、区间边界、每个区间占比的字典
+    """
+    values = attr_df.to_numpy(dtype=np.float64)
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    edges = []
+    expected = []
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        column = column[~np.isnan(column)]
+        col_edges = np.unique(np.quantile(column, quantiles)) if len(column) else np.array([])
+        counts = np.bincount(np.searchsorted(col_edges, column, side='right'), minlength=len(col_edges) + 1)
+        edges.append(col_edges)
+        expected.append(counts / max(1, len(column)))
+    return {
+        'features': tuple(attr_df.columns),
+        'mean': np.nanmean(values, axis=0),
+        'std': np.nanstd(values, axis=0, ddof=1),
+        'edges': edges,
+        'expected': expected,
+    }
+
+
+def psi(expected: np.ndarray, actual_counts: np.ndarray, eps: float = 1e-4) -> float:
+    """
+    计算群体稳定性指标PSI = Σ (actual - expected) * ln(actual / expected)。
+    一般认为小于0.1没有漂移，0.1到0.25有轻微漂移，大于0.25漂移明显。
+    """
+    total = actual_counts.sum()
+    if total == 0:
+        return 0.0
+    actual = np.clip(actual_counts / total, eps, None)
+    expected = np.clip(expected, eps, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class InferenceMonitor:
+    """
+    模型预测的监控器，线程安全。
+    """
+
+    def __init__(self, psi_threshold: float = 0.25, min_samples: int = 200):
+        """
+        :param psi_threshold: 任意一列特征的PSI超过这个值时认为发生了漂移
+        :param min_samples: 实时样本数少于这个值时不判断漂移
+        """
+        self.psi_threshold = psi_threshold
+        self.min_samples = min_samples
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+        self.version = None
+        self.reference = None
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self.predictions = 0
+        self.vetoes = 0
+        self.bypassed = 0
+        self._n = 0
+        self._mean = None
+        self._m2 = None
+        self._bin_counts = None
+
+    def observe_predictor(self, version: int | None, reference: dict | None) -> None:
+        """
+        预测器包的版本变新时，切换参照分布并清空实时统计。
+        策略线程可能在新版本发布之后仍然用本周期开始时读到的旧版本调用，版本号不大于当前版本时不切换。
+        :param version: 预测器包的版本号（模型仓库中递增的版本号）
+        :param reference: build_reference返回的参照分布
+        """
+        with self._lock:
+            if version is None or (self.version is not None and version <= self.version):
+                return
+            self.version = version
+            self.reference = reference
+            self._reset_counters()
+            self.latency.reset()
+
+    def record(self, seconds: float, allowed: bool, x: np.ndarray | None) -> None:
+        """
+        记录一次预测。
+        :param seconds: 预测耗时（秒）
+        :param allowed: 预测结果，False表示否决了这次开仓信号
+        :param x: 没有标准化的特征向量，没有可用模型时为None
+        """
+        self.latency.record(seconds)
+        with self._lock:
+            if x is None:
+                self.bypassed += 1
+                return
+            self.predictions += 1
+            if not allowed:
+                self.vetoes += 1
+
+            # Welford算法更新运行均值和方差
+            if self._mean is None:
+                self._mean = np.zeros(len(x))
+                self._m2 = np.zeros(len(x))
+            self._n += 1
+            delta = x - self._mean
+            self._mean += delta / self._n
+            self._m2 += delta * (x - self._mean)
+
+            if self.reference is not None:
+                if self._bin_counts is None:
+                    self._bin_counts = [np.zeros(len(e) + 1, dtype=np.int64) for e in self.reference['edges']]
+                for j, edges in enumerate(self.reference['edges']):
+                    self._bin_counts[j][np.searchsorted(edges, x[j], side='right')] += 1
+
+    def psi(self) -> dict:
+        """
+        :return: 每一列特征的PSI，没有参照分布或者没有样本时返回空字典
+        """
+        with self._lock:
+            if self.reference is None or self._bin_counts is None:
+                return {}
+            return {name: psi(expected, counts) for name, expected, counts in
+                    zip(self.reference['features'], self.reference['expected'], self._bin_counts)}
+
+    def drift_detected(self) -> bool:
+        """
+        :return: True表示样本数足够，并且至少有一列特征的PSI超过阈值
+        """
+        if self._n < self.min_samples:
+            return False
+        return any(value > self.psi_threshold for value in self.psi().values())
+
+    def snapshot(self) -> dict:
+        """
+        :return: 所有监控指标组成的字典
+        """
+        psi_values = self.psi()
+        with self._lock:
+            features = {}
+            if self.reference is not None and self._mean is not None:
+                std = np.sqrt(self._m2 / (self._n - 1)) if self._n > 1 else np.full(len(self._mean), np.nan)
+                for j, name in enumerate(self.reference['features']):
+                    features[name] = {
+                        'live_mean': float(self._mean[j]),
+                        'live_std': float(std[j]),
+                        'train_mean': float(self.reference['mean'][j]),
+                        'train_std': float(self.reference['std'][j]),
+                        'psi': psi_values.get(name),
+                    }
+            return {
+                'version': self.version,
+                'predictions': self.predictions,
+                'vetoes': self.vetoes,
+                'veto_rate': self.vetoes / self.predictions if self.predictions else None,
+                'bypassed': self.bypassed,
+                'latency': self.latency.snapshot(),
+                'features': features,
+                'drift': bool(psi_values) and self._n >= self.min_samples and
+                         any(value > self.psi_threshold for value in psi_values.values()),
+            }
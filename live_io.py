@@ -0,0 +1,43 @@
+"""
+该模块定义了策略线程访问外部世界（Okx行情、Okx账户和交易、MySQL建表、邮件）的实盘I/O层LiveIO，
+直接调用myokx、getdata、mysqldata、logs、mymail中原有的函数。
+实盘的策略线程（strategy_manager_thread、multi_strategy）只依赖这个模块，不导入重放和回测的代码；
+离线测试和重放使用的I/O层在sim_io中，继承自LiveIO。
+"""
+
+" 自定义模块 "
+from getdata import get_btc_sol_eth_doge_last_price_mean_normalized
+from logs import create_log_table
+from mymail import send_email
+from myokx import MyOkx, get_ticker_last_price, get_tickers
+from mysqldata import sava_all_data_to_mysql, create_control_program_switch_table
+
+
+class LiveIO:
+    """
+    实盘使用的I/O层，直接调用原有的函数。
+    """
+
+    def create_okx(self, api_key: str, secret_key: str, passphrase: str) -> MyOkx:
+        return MyOkx(api_key, secret_key, passphrase)
+
+    def get_ticker_last_price(self, instId: str) -> tuple | None:
+        return get_ticker_last_price(instId)
+
+    def get_tickers(self, instType: str = 'SWAP') -> dict | None:
+        return get_tickers(instType)
+
+    def get_majors_mean_p(self) -> float:
+        return get_btc_sol_eth_doge_last_price_mean_normalized()
+
+    def create_control_program_switch_table(self, **kwargs) -> None:
+        create_control_program_switch_table(**kwargs)
+
+    def create_log_table(self, **kwargs) -> bool:
+        return create_log_table(**kwargs)
+
+    def sava_all_data_to_mysql(self, *args, **kwargs) -> None:
+        sava_all_data_to_mysql(*args, **kwargs)
+
+    def send_email(self, **kwargs) -> None:
+        send_email(**kwargs)
@@ -8,6 +8,7 @@ import time
 " 自定义模块 "
 from logs import log_to_mysql
 from mymail import send_email
+from metrics_thread import timed_flush
 import global_vars
 
 
@@ -36,20 +37,22 @@ def logs_manager_thread(mysql_host: str, mysql_username: str, mysql_password: st
             if global_vars.s_finished_event:  # 事件对象被设置，说明s进程结束
                 # 确保r_d的数据被完全写入数据库
                 while not global_vars.lq:
-                    log_to_mysql(mysql_host=mysql_host, mysql_username=mysql_username, mysql_password=mysql_password,
-                                 mysql_database=mysql_database, mysql_log_table=global_vars.log_table_name, max_logs=fq,
-                                 log_queue=global_vars.lq,
-                                 mysql_port=mysql_port)
+                    timed_flush('logs', global_vars.lq.logs, log_to_mysql,
+                                mysql_host=mysql_host, mysql_username=mysql_username, mysql_password=mysql_password,
+                                mysql_database=mysql_database, mysql_log_table=global_vars.log_table_name, max_logs=fq,
+                                log_queue=global_vars.lq,
+                                mysql_port=mysql_port)
                     time.sleep(5)
                 print("日志管理线程停止")
                 break
 
             i = 0  # 重试计数器
             while True:
-                if log_to_mysql(mysql_host=mysql_host, mysql_username=mysql_username, mysql_password=mysql_password,
-                                mysql_database=mysql_database, mysql_log_table=global_vars.log_table_name, max_logs=fq,
-                                log_queue=global_vars.lq,
-                                mysql_port=mysql_port) is False:  # 该函数可以一次可以批量处理fq条日志到数据库中
+                if timed_flush('logs', global_vars.lq.logs, log_to_mysql,
+                               mysql_host=mysql_host, mysql_username=mysql_username, mysql_password=mysql_password,
+                               mysql_database=mysql_database, mysql_log_table=global_vars.log_table_name, max_logs=fq,
+                               log_queue=global_vars.lq,
+                               mysql_port=mysql_port) is False:  # 该函数可以一次可以批量处理fq条日志到数据库中
                     if i < 3:  # 最多重试3次
                         print("批量处理日志信息到mysql数据库失败，10秒后重试")
                         i += 1
@@ -1,8 +1,10 @@
 """
-该模块是程序的运行入口，负责连接MySQL数据库、获取参数、启动和管理各个线程（日志管理线程、实时数据管理线程、策略管理线程、开关线程）。
+该模块是程序的运行入口，负责连接MySQL数据库、获取参数、启动和管理各个线程（日志管理线程、实时数据管理线程、
+策略管理线程或者多交易对策略引擎（--instIds）、开关线程、模型训练线程、监控指标线程、资源监控线程、看门狗线程）。
 """
 
 " 内置模块 "
+import argparse
 from threading import Thread
 
 " 第三方模块 "
@@ -12,14 +14,30 @@ import pymysql
 from logs_manager_thread import logs_manager_thread
 from real_time_data_manager_thread import real_time_data_manager_thread
 from strategy_manager_thread import strategy_manager_thread
+from multi_strategy import multi_strategy_manager_thread
 from switch_thread import switch_thread
 import global_vars
-from model_train_thread import model_train_thread
+from model_train_thread import model_train_thread, warm_start
+from metrics_thread import metrics_thread
+from resource_monitor import resource_monitor_thread
+from sampling_profiler import SamplingProfiler
+from tick_watchdog import watchdog_thread
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='okx自动化交易程序')
+    parser.add_argument('--instIds', nargs='+', default=None,
+                        help='同时交易的多个交易对，例如：--instIds SOL-USDT-SWAP DOGE-USDT-SWAP；'
+                             '指定时用多交易对策略引擎代替单交易对的策略线程，参数表中配置的交易对总是排在第一个')
+    args = parser.parse_args()
 
     global_vars.lq.push(('程序状态', 'Info', '程序开始启动'))
 
+    # 采样分析器默认不采样，需要时通过 POST http://127.0.0.1:9108/profiler/start?seconds=300 开启，结果写入profiles目录
+    global_vars.profiler = SamplingProfiler(output_dir='profiles')
+
+    # 从本地模型仓库加载上一次训练好的模型，策略线程启动后可以直接使用
+    warm_start()
+
     # 连接MySQL数据库
     mydb = pymysql.connect(
         host="101.34.59.205",
@@ -78,7 +96,17 @@ if __name__ == '__main__':
         }
 
 
-        strategy_thread = Thread(target=strategy_manager_thread, kwargs=strategy_args)
+        if args.instIds:
+            # 多交易对策略引擎：所有交易对共用参数表中的策略参数，参数表中的交易对使用参数表中的日数据表
+            instIds = [strategy_args['instId']] + [instId for instId in args.instIds if instId != strategy_args['instId']]
+            multi_args = {key: value for key, value in strategy_args.items() if key != 'instId'}
+            multi_args['instIds'] = instIds
+            strategy_thread = Thread(target=multi_strategy_manager_thread, kwargs=multi_args,
+                                     name='multi_strategy_manager_thread')
+        else:
+            instIds = None
+            strategy_thread = Thread(target=strategy_manager_thread, kwargs=strategy_args,
+                                     name='strategy_manager_thread')
 
         # 创建日志管理线程
         logs_args = {
@@ -92,7 +120,7 @@ if __name__ == '__main__':
             'sender_password': result[13],
             'fq': 100
         }
-        logs_thread = Thread(target=logs_manager_thread, kwargs=logs_args)
+        logs_thread = Thread(target=logs_manager_thread, kwargs=logs_args, name='logs_manager_thread')
 
         # 创建实时数据管理线程
         real_time_args = {
@@ -105,7 +133,8 @@ if __name__ == '__main__':
             'receiver': result[12],
             'sender_password': result[13]
         }
-        real_time_thread = Thread(target=real_time_data_manager_thread, kwargs=real_time_args)
+        real_time_thread = Thread(target=real_time_data_manager_thread, kwargs=real_time_args,
+                                  name='real_time_data_manager_thread')
 
         #创建开关管理线程
         switch_args = {
@@ -117,7 +146,7 @@ if __name__ == '__main__':
             'table': 'switch',
         }
         switch_thread = Thread(target=switch_thread,
-                               kwargs=switch_args)
+                               kwargs=switch_args, name='switch_thread')
 
         # 创建模型训练线程
         model_train_args = {
@@ -129,9 +158,38 @@ if __name__ == '__main__':
                 'password': result[3],
                 'database_name': result[4],
                 'start_date_str': result[38],
-                'port': result[17]
+                'port': result[17],
+                # 训练数据集窗口，默认使用全部数据；可以改为days（最近N天）、trades（最近N条开仓记录）或reservoir
+                'window_policy': 'all',
+                'window_size': 0,
+                # 运行多交易对策略引擎时，从多交易对实时数据表中读取这些交易对的数据
+                'instIds': instIds
+        }
+        model_train_thread = Thread(target=model_train_thread, kwargs=model_train_args, name='model_train_thread')
+
+        # 创建监控指标线程，只监听本机，本地的采集程序从 http://127.0.0.1:9108/metrics 采集
+        metrics_args = {
+            'host': '127.0.0.1',
+            'port': 9108,
+        }
+        metrics_thread = Thread(target=metrics_thread, kwargs=metrics_args, name='metrics_thread')
+
+        # 创建资源监控线程，每分钟采样一次内存、CPU、文件描述符和队列长度，历史记录写入resource_history.jsonl
+        resource_args = {
+            'interval': 60,
+            'history_path': 'resource_history.jsonl',
+        }
+        resource_thread = Thread(target=resource_monitor_thread, kwargs=resource_args, name='resource_monitor_thread')
+
+        # 创建看门狗线程，策略线程超过4倍周期间隔没有完成周期时记录调用栈（stall_dumps目录）并发送邮件
+        watchdog_args = {
+            'sender': result[11],
+            'receiver': result[12],
+            'sender_password': result[13],
+            'multiple': 4.0,
+            'min_stall': 10.0,
         }
-        model_train_thread = Thread(target=model_train_thread, kwargs=model_train_args)
+        watchdog = Thread(target=watchdog_thread, kwargs=watchdog_args, name='watchdog_thread')
 
         mycursor.close()
         mydb.close()
@@ -143,6 +201,10 @@ if __name__ == '__main__':
         real_time_thread.start()
         switch_thread.start()
         model_train_thread.start()
+        metrics_thread.start()
+        resource_thread.start()
+        watchdog.start()
+        global_vars.profiler.start()
 
         global_vars.lq.push(('程序状态', 'Info', '程序成功启动'))
         # 等待线程结束
@@ -151,4 +213,7 @@ if __name__ == '__main__':
         real_time_thread.join()
         switch_thread.join()
         model_train_thread.join()
+        metrics_thread.join()
+        resource_thread.join()
+        watchdog.join()
 
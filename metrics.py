@@ -0,0 +1,286 @@
+"""
+该模块定义了进程内的监控指标注册表（MetricsRegistry），以Prometheus文本格式输出，不需要查询MySQL就可以知道程序是否正常运行。具体包括：
+
+- Counter（只增不减的计数，例如Okx请求次数、写入数据库的行数）、Gauge（当前值，例如日志队列长度，可以在输出时通过回调函数读取）、
+  Histogram（耗时分布，底层是histogram.LatencyHistogram，输出时按照固定的上界累计，得到Prometheus的_bucket/_sum/_count）。
+- 每个指标可以带标签，例如okx_requests_total{endpoint="/api/v5/trade/order",code="0"}。
+- 同名的指标只注册一次，再次注册返回已有的指标，不同模块可以各自声明同一个指标。
+- 可以注册采集函数（register_collector），在输出时读取其他组件已经维护的统计信息（周期调度器、分阶段计时器、参数检查点写入器），
+  不需要这些组件额外计数。
+- render()输出全部指标的Prometheus文本，由metrics_thread中的本地HTTP服务器提供给采集程序。
+
+记录一次Counter或者Histogram的开销是常数（一次加锁），可以在策略线程中使用。
+"""
+
+" 内置模块 "
+import math
+import threading
+
+" 自定义模块 "
+from histogram import LatencyHistogram
+
+# 耗时直方图默认的上界（秒），覆盖从亚毫秒的内存操作到几分钟的模型训练
+DEFAULT_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                  120.0, 300.0, 600.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    """
+    :return: Prometheus格式的标签，例如{endpoint="/api/v5/trade/order",code="0"}，没有标签时返回空字符串
+    """
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def histogram_lines(name: str, labelnames: tuple, labels: tuple, histogram: LatencyHistogram,
+                    bounds: tuple = DEFAULT_BOUNDS) -> list:
+    """
+    把一个耗时直方图转换为Prometheus的_bucket/_sum/_count行。
+    :param name: 指标名称
+    :param labelnames: 标签名称
+    :param labels: 标签值
+    :param histogram: 耗时直方图
+    :param bounds: 从小到大排列的上界（秒）
+    :return: 文本行列表
+    """
+    lines = []
+    for bound, count in zip(bounds, histogram.cumulative(list(bounds))):
+        le = f'le="{_format_value(bound)}"'
+        lines.append(f'{name}_bucket{_format_labels(labelnames, labels, le)} {count}')
+    inf = 'le="+Inf"'
+    lines.append(f'{name}_bucket{_format_labels(labelnames, labels, inf)} {histogram.count}')
+    lines.append(f'{name}_sum{_format_labels(labelnames, labels)} {_format_value(histogram.total)}')
+    lines.append(f'{name}_count{_format_labels(labelnames, labels)} {histogram.count}')
+    return lines
+
+
+class _Metric:
+    """
+    指标的公共部分：名称、说明、标签名称和每组标签值对应的值。
+    """
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        labels = labels if isinstance(labels, tuple) else (labels,)
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name}需要{len(self.labelnames)}个标签值，实际为{len(labels)}个')
+        return labels
+
+    def header(self) -> list:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def lines(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda item: tuple(map(str, item[0])))
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in items]
+
+
+class Counter(_Metric):
+    """
+    只增不减的计数。
+    """
+    kind = 'counter'
+
+    def inc(self, labels=(), amount: float = 1) -> None:
+        """
+        :param labels: 标签值，只有一个标签时可以直接传入标签值
+        :param amount: 增加的数量
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels=()) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """
+    可增可减的当前值。传入callback时在输出时调用callback读取当前值，callback返回一个数值，
+    或者以标签值元组为键的字典（带标签的指标）；返回None时不输出。
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, labels=()) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, labels=(), amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels=()) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def lines(self) -> list:
+        if self.callback is None:
+            return super().lines()
+        value = self.callback()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f'{self.name}{_format_labels(self.labelnames, labels if isinstance(labels, tuple) else (labels,))} '
+                f'{_format_value(v)}' for labels, v in value.items() if v is not None]
+
+
+class Histogram(_Metric):
+    """
+    耗时分布，每组标签值一个LatencyHistogram。传入callback时在输出时调用callback读取已有的耗时直方图，
+    callback返回以标签值元组（或者单个标签值）为键、LatencyHistogram为值的字典。
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), bounds: tuple = DEFAULT_BOUNDS,
+                 callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(bounds)
+        self.callback = callback
+
+    def observe(self, seconds: float, labels=()) -> None:
+        """
+        :param seconds: 耗时（秒）
+        :param labels: 标签值
+        """
+        key = self._key(labels)
+        histogram = self._values.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._values.setdefault(key, LatencyHistogram())
+        histogram.record(seconds)
+
+    def histogram(self, labels=()) -> LatencyHistogram | None:
+        return self._values.get(self._key(labels))
+
+    def lines(self) -> list:
+        if self.callback is None:
+            with self._lock:
+                items = list(self._values.items())
+        else:
+            items = [(labels if isinstance(labels, tuple) else (labels,), histogram)
+                     for labels, histogram in (self.callback() or {}).items()]
+        lines = []
+        for labels, histogram in sorted(items, key=lambda item: tuple(map(str, item[0]))):
+            if histogram is not None:
+                lines.extend(histogram_lines(self.name, self.labelnames, labels, histogram, self.bounds))
+        return lines
+
+
+class MetricsRegistry:
+    """
+    监控指标注册表，线程安全。global_vars.metrics是全局唯一的实例。
+    """
+
+    def __init__(self, namespace: str = 'okx_bot'):
+        """
+        :param namespace: 所有指标名称的前缀
+        """
+        self.namespace = namespace
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: tuple, **kwargs):
+        full_name = f'{self.namespace}_{name}' if self.namespace else name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f'指标{full_name}已经以不同的类型或者标签注册')
+            elif kwargs.get('callback') is not None:
+                metric.callback = kwargs['callback']  # 再次注册时用新的回调函数，例如策略线程重新启动后
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        """
+        注册（或者获取已有的）计数指标。
+        :param name: 指标名称（不含前缀）
+        :param documentation: 指标说明
+        :param labelnames: 标签名称
+        """
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = (), callback=None) -> Gauge:
+        """
+        注册（或者获取已有的）当前值指标。
+        :param callback: 输出时调用的回调函数，返回当前值
+        """
+        return self._register(Gauge, name, documentation, labelnames, callback=callback)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), bounds: tuple = DEFAULT_BOUNDS,
+                  callback=None) -> Histogram:
+        """
+        注册（或者获取已有的）耗时分布指标。
+        :param bounds: 从小到大排列的上界（秒）
+        :param callback: 输出时调用的回调函数，返回已有的耗时直方图
+        """
+        return self._register(Histogram, name, documentation, labelnames, bounds=bounds, callback=callback)
+
+    def register_collector(self, name: str, collector) -> None:
+        """
+        注册一个采集函数，输出时调用，返回Prometheus文本行列表。同名的采集函数会被替换。
+        :param name: 采集函数的名称
+        :param collector: 采集函数
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def unregister_collector(self, name: str) -> None:
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def render(self) -> str:
+        """
+        :return: 全部指标的Prometheus文本格式
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+            collectors = list(self._collectors.items())
+        lines = []
+        for metric in metrics:
+            try:
+                body = metric.lines()
+            except Exception as e:  # 回调函数出错时只影响这一个指标
+                lines.append(f'# {metric.name}读取失败:{_escape(e)}')
+                continue
+            lines.extend(metric.header())
+            lines.extend(body)
+        for name, collector in collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                lines.append(f'# {name}采集失败:{_escape(e)}')
+        return '\n'.join(lines) + '\n'
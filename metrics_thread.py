@@ -0,0 +1,160 @@
+"""
+该模块定义了监控指标线程，在本地启动一个HTTP服务器，以Prometheus文本格式输出global_vars.metrics中的监控指标，
+由本地的采集程序定时采集，不需要查询MySQL就可以知道程序是否正常运行。具体包括：
+
+- 日志队列、实时数据队列、多交易对实时数据队列、周期耗时数据队列的长度（积压的数据）。
+- 日志和实时数据批量写入MySQL的耗时、写入的行数和最近一次写入的速度（行/秒）、写入失败的次数（timed_flush）。
+- Okx REST请求的次数（按接口和返回码）和耗时（由myokx记录）。
+- 模型训练的耗时和次数、当前使用的模型版本（由model_train_thread记录）。
+- 策略线程的周期延迟：每个周期相对截止时间的延迟和处理耗时（周期调度器）、距离上一个周期开始的时间、各个阶段的耗时（分阶段计时器）。
+
+只监听127.0.0.1，GET /metrics返回全部指标。另外提供采样分析器（global_vars.profiler）的运行时开关：
+POST /profiler/start?seconds=N开始采样（seconds可以省略），POST /profiler/stop停止采样，GET /profiler查看状态。
+"""
+
+" 内置模块 "
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+" 自定义模块 "
+from metrics import MetricsRegistry
+import global_vars
+
+
+def timed_flush(queue: str, rows: list, func, *args, **kwargs):
+    """
+    调用一个批量写入MySQL的函数，记录写入的耗时、行数和速度。
+    :param queue: 队列名称，作为指标的标签，例如'logs'、'real_time'
+    :param rows: 被写入的队列（列表），写入的行数 = 调用前的长度 - 调用后的长度
+    :param func: 批量写入函数，返回False表示写入失败
+    :return: func的返回值
+    """
+    registry = global_vars.metrics
+    before = len(rows)
+    start = time.perf_counter()
+    ok = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    written = max(0, before - len(rows))
+    registry.histogram('flush_seconds', '批量写入MySQL的耗时（秒）', ('queue',)).observe(seconds, queue)
+    registry.counter('flush_rows_total', '写入MySQL的行数', ('queue',)).inc(queue, written)
+    if written and seconds > 0:
+        registry.gauge('flush_rows_per_second', '最近一次批量写入MySQL的速度（行/秒）', ('queue',)).set(written / seconds,
+                                                                                                   queue)
+    if ok is False:
+        registry.counter('flush_failures_total', '批量写入MySQL失败的次数', ('queue',)).inc(queue)
+    return ok
+
+
+def _stage_histograms() -> dict:
+    return {stage: histogram for stage, histogram in dict(global_vars.tick_timer.histograms).items() if histogram.count}
+
+
+def _seconds_since_tick() -> float | None:
+    scheduler = global_vars.tick_scheduler
+    if scheduler is None or scheduler.tick_start is None:
+        return None
+    return (scheduler.clock.now() - scheduler.tick_start).total_seconds()
+
+
+def register_runtime_metrics(registry: MetricsRegistry) -> None:
+    """
+    注册在输出时读取的指标：队列长度、周期调度器、分阶段计时器、模型预测监控器。
+    """
+    registry.gauge('queue_depth', '队列中等待写入MySQL的数据条数', ('queue',),
+                   callback=lambda: {'logs': len(global_vars.lq.logs), 'real_time': len(global_vars.r_d),
+                                     'multi_real_time': len(global_vars.m_r_d), 'tick_timing': len(global_vars.t_r_d)})
+    registry.gauge('tick_seconds_since_start', '距离策略线程上一个周期开始的时间（秒），持续增大说明策略线程卡住了',
+                   callback=_seconds_since_tick)
+    registry.gauge('tick_interval_seconds', '策略线程当前的周期间隔（秒）',
+                   callback=lambda: global_vars.tick_scheduler.interval if global_vars.tick_scheduler else None)
+    registry.gauge('ticks_missed', '策略线程错过截止时间的周期数',
+                   callback=lambda: global_vars.tick_scheduler.missed if global_vars.tick_scheduler else None)
+    registry.gauge('ticks', '策略线程已经运行的周期数',
+                   callback=lambda: global_vars.tick_scheduler.ticks if global_vars.tick_scheduler else None)
+    registry.histogram('tick_lateness_seconds', '策略线程每个周期实际开始时间相对截止时间的延迟（秒）',
+                       callback=lambda: {(): global_vars.tick_scheduler.lateness} if global_vars.tick_scheduler else {})
+    registry.histogram('tick_busy_seconds', '策略线程每个周期的处理耗时（秒）',
+                       callback=lambda: {(): global_vars.tick_scheduler.busy} if global_vars.tick_scheduler else {})
+    registry.histogram('tick_stage_seconds', '策略线程每个周期各个阶段的耗时（秒），启用分阶段计时时才有数据', ('stage',),
+                       callback=_stage_histograms)
+    registry.histogram('predict_seconds', '模型每次预测的耗时（秒）',
+                       callback=lambda: {(): global_vars.inference_monitor.latency})
+    registry.gauge('model_version', '策略线程当前使用的模型版本',
+                   callback=lambda: global_vars.predictor.version if global_vars.predictor else None)
+
+
+def _handler_class(registry: MetricsRegistry):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, data: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_profiler(self) -> None:
+            profiler = global_vars.profiler
+            if profiler is None:
+                self.send_error(404, 'profiler is not configured')
+                return
+            self._send(200, json.dumps(profiler.snapshot(), ensure_ascii=False).encode('utf-8'),
+                       'application/json; charset=utf-8')
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if path == '/metrics':
+                self._send(200, registry.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+            elif path == '/profiler':
+                self._send_profiler()
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            parts = urlsplit(self.path)
+            profiler = global_vars.profiler
+            if profiler is None or parts.path not in ('/profiler/start', '/profiler/stop'):
+                self.send_error(404)
+                return
+            if parts.path == '/profiler/start':
+                seconds = parse_qs(parts.query).get('seconds')
+                try:
+                    profiler.enable(float(seconds[0]) if seconds else None)
+                except ValueError:
+                    self.send_error(400, 'seconds must be a number')
+                    return
+            else:
+                profiler.disable()
+            self._send_profiler()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def metrics_thread(host: str = '127.0.0.1', port: int = 9108) -> None:
+    """
+    监控指标线程，在本地提供 http://host:port/metrics 接口，程序结束时停止。
+    启动失败（例如端口被占用）只记录日志，不影响其他线程。
+
+    参数：
+    - host: 监听的地址，默认只监听本机。
+    - port: 监听的端口，默认为9108。
+    """
+    register_runtime_metrics(global_vars.metrics)
+    try:
+        server = ThreadingHTTPServer((host, port), _handler_class(global_vars.metrics))
+    except OSError as e:
+        global_vars.lq.push(('监控指标线程-错误信息', 'error', f'监控指标线程启动失败：{e}'))
+        return
+    server.daemon_threads = True
+    server.timeout = 1  # 每秒检查一次程序是否结束
+    global_vars.lq.push(('监控指标线程-状态信息', 'info', f'监控指标线程启动，地址：http://{host}:{port}/metrics'))
+    try:
+        while not global_vars.s_finished_event:
+            server.handle_request()
+    finally:
+        server.server_close()
+    global_vars.lq.push(('监控指标线程-状态信息', 'info', '监控指标线程停止'))
@@ -0,0 +1,176 @@
+"""
+该模块定义了一个本地磁盘上的模型仓库（ModelRegistry），用于持久化保存模型训练线程训练出来的模型。具体功能包括：
+
+- 以版本号的形式保存模型对象、标准化参数（scaler）、特征列名、评估指标和元数据，以及构建预测器包需要的漂移检测参照分布
+  和校验编译模型的样本（训练集最后PARITY_SAMPLE_SIZE条），不保存整个训练集，每个版本的文件大小和加载时间不随训练数据量增长。
+- 程序启动时加载最近一次可用的模型（热启动），避免重启后第一轮训练完成前策略线程没有模型可用。
+- 只保留最近的若干个版本，旧版本自动删除。
+- 回滚到之前的某个版本。
+"""
+
+" 内置模块 "
+import json
+import os
+import threading
+from datetime import datetime
+
+" 第三方模块 "
+import joblib
+import pandas as pd
+
+" 自定义模块 "
+from inference_monitor import build_reference
+from predictor import PARITY_SAMPLE_SIZE
+
+
+class ModelRegistry:
+    """
+    本地磁盘上的模型仓库。
+
+    目录结构如下：
+        root/
+            index.json          记录所有版本的信息以及当前使用的版本号
+            model_v1.joblib     每一个版本对应一个joblib文件
+            model_v2.joblib
+            ...
+    """
+
+    def __init__(self, root: str = 'model_registry', keep: int = 5):
+        """
+        :param root: 模型仓库所在的目录，默认为当前工作目录下的model_registry目录
+        :param keep: 最多保留的版本数量，超过的旧版本会被删除（当前使用的版本不会被删除）
+        """
+        self.root = root
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.root, 'index.json')
+
+    def _read_index(self) -> dict:
+        """
+        读取index.json，如果文件不存在或者损坏，返回一个空的索引
+        """
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'current': None, 'versions': []}
+
+    def _write_index(self, index: dict) -> None:
+        """
+        先写临时文件再替换，保证index.json不会因为程序中途退出而损坏
+        """
+        tmp_path = self._index_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self._index_path())
+
+    def save(self, model: object, attr_df: pd.DataFrame, metrics: dict, metadata: dict = None) -> int:
+        """
+        保存一个新版本的模型，并把它设置为当前使用的版本。
+        :param model: 训练好的模型对象
+        :param attr_df: 没有进行标准化的特征数据集，用来计算标准化参数、参照分布和校验样本，本身不保存
+        :param metrics: 模型的评估指标，例如：{'accuracy': 0.63, 'model_name': 'RandomForestClassifier'}
+        :param metadata: 其他需要记录的信息
+        :return: 新版本的版本号
+        """
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            index = self._read_index()
+            version = max([v['version'] for v in index['versions']], default=0) + 1
+            file_name = f'model_v{version}.joblib'
+
+            bundle = {
+                'version': version,
+                'model': model,
+                'features': list(attr_df.columns),
+                'scaler': {'mean': attr_df.mean().to_numpy(), 'std': attr_df.std().to_numpy()},
+                'reference': build_reference(attr_df),
+                'parity_sample': attr_df.tail(PARITY_SAMPLE_SIZE).reset_index(drop=True),
+                'metrics': metrics,
+                'metadata': metadata or {},
+            }
+
+            tmp_path = os.path.join(self.root, file_name + '.tmp')
+            joblib.dump(bundle, tmp_path)
+            os.replace(tmp_path, os.path.join(self.root, file_name))
+
+            index['versions'].append({
+                'version': version,
+                'file': file_name,
+                'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'metrics': metrics,
+                'metadata': metadata or {},
+                'status': 'good',
+            })
+            index['current'] = version
+            self._prune(index)
+            self._write_index(index)
+            return version
+
+    def _prune(self, index: dict) -> None:
+        """
+        删除超出保留数量的旧版本，当前使用的版本永远不会被删除
+        """
+        versions = sorted(index['versions'], key=lambda v: v['version'])
+        while len(versions) > self.keep:
+            oldest = next((v for v in versions if v['version'] != index['current']), None)
+            if oldest is None:
+                break
+            versions.remove(oldest)
+            try:
+                os.remove(os.path.join(self.root, oldest['file']))
+            except FileNotFoundError:
+                pass
+        index['versions'] = versions
+
+    def load(self, version: int = None) -> dict | None:
+        """
+        加载某个版本的模型。
+        :param version: 版本号，默认为当前使用的版本
+        :return: 包含model、features、scaler、reference、parity_sample、metrics、metadata的字典，没有可用的模型时返回None
+        """
+        index = self._read_index()
+        if version is None:
+            version = index['current']
+        entry = next((v for v in index['versions'] if v['version'] == version), None)
+        if entry is None:
+            return None
+        try:
+            return joblib.load(os.path.join(self.root, entry['file']))
+        except (FileNotFoundError, EOFError):
+            return None
+
+    def rollback(self, version: int = None) -> dict | None:
+        """
+        回滚模型版本。回滚成功后当前版本会被标记为bad，不会再被回滚到。
+        :param version: 需要回滚到的版本号，默认为当前版本之前最近的一个可用版本
+        :return: 回滚后的模型字典，没有可以回滚的版本时返回None
+        """
+        with self._lock:
+            index = self._read_index()
+            current = index['current']
+
+            candidates = [v for v in index['versions'] if v['status'] == 'good' and v['version'] != current]
+            if version is not None:
+                candidates = [v for v in candidates if v['version'] == version]
+            else:
+                candidates = [v for v in candidates if current is None or v['version'] < current]
+            if not candidates:
+                return None
+
+            for v in index['versions']:
+                if v['version'] == current:
+                    v['status'] = 'bad'
+            target = max(candidates, key=lambda v: v['version'])
+            index['current'] = target['version']
+            self._write_index(index)
+
+        return self.load(target['version'])
+
+    def versions(self) -> list:
+        """
+        :return: 所有保留下来的版本信息列表
+        """
+        return self._read_index()['versions']
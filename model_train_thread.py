@@ -1,5 +1,5 @@
 """
-该模块定义了一个模型训练线程，用于训练和更新交易预测模型。
+该模块定义了一个模型训练线程，用于训练和更新交易预测模型，以及程序启动时从模型仓库热启动模型的函数。
 """
 
 " 内置模块 "
@@ -7,9 +7,56 @@ import time
 
 " 自定义模块 "
 from predict_model import get_data_from_mysql, data_preprocessing, divide_feature_and_target, train_model
+from predictor import build_predictor, build_predictor_from_registry
+from training_window import TrainingWindow
 import global_vars
 from mymail import send_email
 
+# 模型训练的监控指标
+MODEL_TRAIN_SECONDS = global_vars.metrics.histogram(
+    'model_train_seconds', '模型训练各个步骤的耗时（秒）：load读取和预处理数据，train训练模型，total一轮训练的总耗时', ('stage',))
+MODEL_TRAINS = global_vars.metrics.counter('model_trains_total', '模型训练的轮数', ('result',))
+
+
+def warm_start() -> bool:
+    """
+    程序启动时，从本地模型仓库中加载最近一次可用的模型，让策略线程在第一轮模型训练完成之前就可以使用模型进行预测。
+    :return: True表示加载成功，False表示模型仓库中没有可用的模型
+    """
+    try:
+        bundle = global_vars.model_registry.load()
+    except Exception as e:
+        global_vars.lq.push(('模型训练线程-状态信息', 'error', f'从模型仓库加载模型失败：{e}'))
+        return False
+
+    if bundle is None:
+        global_vars.lq.push(('模型训练线程-状态信息', 'info', '模型仓库中没有可用的模型'))
+        return False
+
+    global_vars.predictor = build_predictor_from_registry(bundle)
+    global_vars.inference_monitor.observe_predictor(bundle['version'], global_vars.predictor.reference)
+    global_vars.lq.push(('模型训练线程-状态信息', 'info', f'从模型仓库加载模型成功，版本：{bundle["version"]}'))
+    return True
+
+
+def wait_for_next_training(seconds: int, min_seconds: int = 60, step: int = 5) -> None:
+    """
+    等待下一轮模型训练。如果模型预测监控器检测到实时特征相对训练集发生了漂移，会提前结束等待。
+    :param seconds: 最长等待时间（秒）
+    :param min_seconds: 最短等待时间（秒），避免漂移一直存在时不停地训练模型
+    :param step: 检查漂移和程序结束标志的间隔（秒）
+    """
+    waited = 0
+    while waited < seconds:
+        if global_vars.s_finished_event:
+            return
+        if waited >= min_seconds and global_vars.inference_monitor.drift_detected():
+            global_vars.lq.push(('模型训练线程-状态信息', 'info',
+                                 f'检测到实时特征发生漂移，提前重新训练模型：{global_vars.inference_monitor.psi()}'))
+            return
+        time.sleep(step)
+        waited += step
+
 
 def model_train_thread(sender: str,
                        receiver: str,
@@ -19,7 +66,11 @@ def model_train_thread(sender: str,
                        password: str,
                        database_name: str,
                        start_date_str: str,
-                       port: int = 3306):
+                       port: int = 3306,
+                       window_policy: str = 'all',
+                       window_size: int = 0,
+                       window_half_life_days: float = 7.0,
+                       instIds: list = None):
     """
        模型训练线程，负责周期性地训练和更新交易预测模型。
        该函数在一个无限循环中运行，每次循环都会尝试从数据库中获取数据，
@@ -36,15 +87,21 @@ def model_train_thread(sender: str,
        - database_name: 要操作的数据库名称。
        - start_date_str: 用于数据提取的起始日期字符串，格式为 '%Y-%m-%d'。
        - port: MySQL数据库端口号，默认为3306。
+       - window_policy: 训练数据集窗口策略（all、days、trades、reservoir），默认为all（使用全部数据），详见training_window模块。
+       - window_size: 训练数据集窗口大小，days策略表示天数，trades和reservoir策略表示开仓记录的条数，all策略不使用。
+       - window_half_life_days: reservoir策略中权重衰减的半衰期（天），默认为7天。
+       - instIds: 多交易对策略引擎交易的交易对列表，不为None时从多交易对实时数据表中读取这些交易对的数据训练模型。
 
        返回：
-       - 无返回值，但会保存训练好的模型对象到全局变量 `global_vars.best_model` 中。
+       - 无返回值，但会在模型仓库 `global_vars.model_registry` 中保存一个新的版本，
+         并把模型和对应的标准化参数打包成预测器包，一次性发布到全局变量 `global_vars.predictor` 中。
 
        异常处理：
        - 如果在数据处理或模型训练过程中发生异常，会通过 `send_email` 函数发送错误通知邮件，
          并将 `global_vars.s_finished_event` 设置为 True 以停止所有线程。
        """
     global_vars.lq.push(('模型训练线程-状态信息', 'info', '模型训练线程启动'))
+    window = TrainingWindow(policy=window_policy, size=window_size, half_life_days=window_half_life_days)
     time.sleep(15) # 延迟启动，避免程序启动时出现错误
     while True:
 
@@ -53,22 +110,27 @@ def model_train_thread(sender: str,
             break
 
         try:
+            start = time.perf_counter()
 
             # 从数据库中获取数据
             data, target = get_data_from_mysql(host=host, username=username, password=password,
-                                               database_name=database_name, start_date_str=start_date_str, port=port)
+                                               database_name=database_name, start_date_str=start_date_str, port=port,
+                                               window=window, instIds=instIds)
 
             # 数据预处理
-            global_vars.attr_df, all_df = data_preprocessing(data, target)
+            attr_df, all_df = data_preprocessing(data, target)
+            MODEL_TRAIN_SECONDS.observe(time.perf_counter() - start, 'load')
 
             # 如果没有数据，不训练模型
             if all_df is None:
                 global_vars.lq.push(("模型训练线程-状态信息", "info", "没有可训练的数据！"))
+                MODEL_TRAINS.inc('no_data')
                 time.sleep(4 * 60)
                 continue
             # 如果数据量不足，不训练模型
             if len(all_df) < 1000:
                 global_vars.lq.push(("模型训练线程-状态信息", "info", "交易数据量不足，不训练模型"))
+                MODEL_TRAINS.inc('not_enough_data')
                 time.sleep(4 * 60)
                 continue
 
@@ -76,10 +138,26 @@ def model_train_thread(sender: str,
             train_data, test_data, train_target, test_target = divide_feature_and_target(all_df)
 
             # 训练模型返回最好的模型
-            global_vars.best_model = train_model(train_data, train_target, test_data, test_target)
+            train_start = time.perf_counter()
+            best_model, metrics = train_model(train_data, train_target, test_data, test_target)
+            MODEL_TRAIN_SECONDS.observe(time.perf_counter() - train_start, 'train')
             global_vars.lq.push(("模型训练线程-状态信息", "info", "'预测模型训练完成'"))
-            time.sleep(4 * 60)
+
+            # 保存到模型仓库，下次程序启动时可以直接加载
+            version = global_vars.model_registry.save(best_model, attr_df, metrics,
+                                                      metadata={'start_date_str': start_date_str,
+                                                                'training_window': window.describe()})
+            global_vars.lq.push(("模型训练线程-状态信息", "info", f"模型已保存到模型仓库，版本：{version}"))
+
+            # 一次引用赋值发布新的预测器包，策略线程不会读到模型和标准化参数不配套的状态
+            global_vars.predictor = build_predictor(version, best_model, attr_df)
+            # 立即让监控器切换到新版本的参照分布，否则在下一次开仓信号出现之前漂移标志会一直保留，导致每隔min_seconds就重新训练
+            global_vars.inference_monitor.observe_predictor(version, global_vars.predictor.reference)
+            MODEL_TRAIN_SECONDS.observe(time.perf_counter() - start, 'total')
+            MODEL_TRAINS.inc('published')
+            wait_for_next_training(4 * 60)
         except Exception as e:
+            MODEL_TRAINS.inc('failed')
             send_email(sender=sender, receiver=receiver, password=mail_password,
                        subject='来自okx自动化策略程序的运行错误的提醒:',
                        content="发生在:model_train_thread线程。\n"
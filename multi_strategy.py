@@ -0,0 +1,477 @@
+"""
+该模块是多交易对策略引擎，在一个进程的一个线程中同时交易多个交易对（例如10~50个永续合约）。具体包括：
+
+- InstrumentState：一个交易对的策略参数和动态状态，动态状态继承自strategy_state.StrategyState（与strategy_manager_thread相同），
+  每个交易对的动态参数保存在各自的参数文件中。
+- multi_strategy_manager_thread：每个周期只请求一次所有交易对的行情（myokx.get_tickers，主流币的均值也从这次的行情中计算）
+  和一次持仓，然后依次对每个交易对执行与strategy_manager_thread相同的开仓、止盈、止损逻辑。
+  只有需要下单、平仓时才会为单个交易对发送请求，所以每个周期的行情和持仓请求数不随交易对的数量增加。
+- 所有交易对的实时数据放入global_vars.m_r_d，第一列是交易对，由实时数据管理线程统一写入一张带instId列的表；
+  日志表、预测模型、控制程序开关表、周期调度器都由所有交易对共用。
+
+与strategy_manager_thread的不同之处：
+- 止盈、止损失败时不在本周期内反复重试，而是在下一个周期重新判断，避免一个交易对阻塞其他交易对。
+- 止损时不在周期内等待历史仓位更新，历史仓位还没有更新时在下一个周期再获取亏损金额。
+"""
+
+" 内置模块 "
+import os
+import sys
+from datetime import datetime as dt
+from datetime import timedelta
+
+" 自定义模块 "
+from getdata import get_majors_mean_p_from_tickers
+from strategy import go_long_signal, go_short_signal, predict
+from strategy_params import DEFAULT_PARAMS
+from strategy_state import StrategyState
+from sim_clock import RealClock
+from live_io import LiveIO
+from checkpoint import CheckpointWriter
+from protective_orders import ProtectiveOrders
+from tick_scheduler import TickScheduler
+import function
+import global_vars
+
+# 区间u_p_1到u_p_4、d_p_1到d_p_4的左右限参数名，顺序与function.update_u_p_and_d_p的参数顺序相同
+ZONE_KEYS = ('l_s1', 'l_s2', 'l_s3', 'l_s4', 'l_e1', 'l_e2', 'l_e3', 'l_e4',
+             's_s1', 's_s2', 's_s3', 's_s4', 's_e1', 's_e2', 's_e3', 's_e4')
+
+
+class InstrumentState(StrategyState):
+    """
+    一个交易对的策略参数和动态状态。
+    """
+
+    def __init__(self, instId: str, cfg: dict, day_table: str, parameter_path: str):
+        """
+        :param instId: 交易对，例如：'ETH-USDT-SWAP'
+        :param cfg: 策略参数，键与strategy_params.DEFAULT_PARAMS相同
+        :param day_table: 保存这个交易对日数据的表名
+        :param parameter_path: 这个交易对的动态参数文件的路径
+        """
+        super().__init__(cfg['place_uplimit'], cfg['place_downlimit'], cfg['sz'], cfg['place_position_nums'])
+        self.instId = instId
+        self.leverage = int(cfg['leverage'])
+        self.sz = cfg['sz']
+        self.place_position_nums = cfg['place_position_nums']
+        self.place_uplimit = cfg['place_uplimit']
+        self.place_downlimit = cfg['place_downlimit']
+        self.zones = tuple(cfg[k] for k in ZONE_KEYS)
+        self.l_c_limit = cfg['l_c_limit']
+        self.s_c_limit = cfg['s_c_limit']
+        self.limit_uplRatio = cfg['limit_uplRatio']
+        self.lower_take_profit = float(cfg['lower_take_profit'])
+        self.day_table = day_table
+        self.parameter_path = parameter_path
+        self.top_five = []  # 前五个周期的价格
+        self.pending_loss = False  # 止损后历史仓位还没有更新，下一个周期再获取亏损金额
+        self.protection: ProtectiveOrders | None = None  # 交易所端的止损止盈单，为None时由程序判断止损
+
+    def _reset_after_take_profit(self) -> None:
+        self.reset(self.place_uplimit, self.place_downlimit)
+        self.ppn = self.place_position_nums
+        self.n_sz = self.sz
+        self.loss = 0
+
+    def _take_profit(self, o, trade_type: int, message: str) -> int:
+        re = function.take_progit(o=o, instId=self.instId, leverage=self.leverage,
+                                  place_uplimit=self.place_uplimit, place_downlimit=self.place_downlimit)
+        if re:
+            self._reset_after_take_profit()
+            global_vars.lq.push(('多交易对线程-止盈记录', 'Success', f'{self.instId}止盈【{message}】成功'))
+            return trade_type
+        global_vars.lq.push(('多交易对线程-止盈记录', 'Error', f'{self.instId}止盈【{message}】失败'))
+        return 0
+
+    def _realized_pnl(self, o) -> float:
+        """
+        :return: 这个交易对最新一条历史仓位的已实现盈亏
+        """
+        return float(o.get_positions_history(instId=self.instId)['realizedPnl'])
+
+    def _update_loss(self, last_loss: float, current_price: float) -> bool:
+        """
+        用刚刚止损的历史仓位的亏损金额更新loss、profit、n_sz、ppn。
+        :param last_loss: 最新一条历史仓位的已实现盈亏
+        :return: 历史仓位还没有更新时返回False
+        """
+        if last_loss > 0:
+            global_vars.lq.push(('多交易对线程-止损记录', 'Info', f'{self.instId}等待平仓历史仓位信息更新'))
+            return False
+        self.loss = float(self.loss) + abs(last_loss)
+        self.profit = self.loss * 1.3
+        x = (self.profit / 0.6) * self.leverage
+        self.n_sz = round((x / current_price) * self.leverage)
+        self.ppn = self.n_sz * current_price / self.leverage - 50
+        global_vars.lq.push(('多交易对线程-止损记录', 'Success',
+                             f'{self.instId}更新n_sz成功:{self.n_sz}，更新ppn成功:{self.ppn}'))
+        return True
+
+    def tick(self, o, ticker: tuple, position: dict | None, current_mean_p: float, predictor,
+             formatted_now: str, interval: float) -> list:
+        """
+        对这个交易对执行一个周期的开仓、止盈、止损逻辑。
+        :param o: MyOkx（或者提供相同方法的对象）
+        :param ticker: 这个交易对的行情，(交易对的所有信息，最新价格，当前最新价格较昨收盘价的变化百分比变化)
+        :param position: 这个交易对在本周期开始时的持仓，没有持仓时为None
+        :param current_mean_p: 本周期主流币价格标准化均值
+        :param predictor: 本周期使用的预测器包
+        :param formatted_now: 本周期的时间
+        :param interval: 下一个周期的间隔（秒）
+        :return: 实时数据行，第一列是交易对，其余列与strategy_manager_thread的实时数据行相同
+        """
+        current_coin_data, current_price, p = ticker
+        current_bidSz, current_askSz = float(current_coin_data['bidSz']), float(current_coin_data['askSz'])
+        current_vol24h = float(current_coin_data['vol24h'])
+        before_price = self.before_price
+        trade_type = 0
+
+        current_position_nums = 0.0  # 空头取负值，多头取正值
+        today_pos = float(position['pos']) if position else 0.0
+        if today_pos:
+            current_position_nums = float(position['notionalUsd']) if today_pos > 0 else -float(position['notionalUsd'])
+
+        if before_price != 0:
+            self.last_p_p = (current_price - before_price) / before_price
+
+        # 用本周期开始时的持仓同步交易所端的止损止盈单，closed_direction不为0说明止损止盈单已经被交易所触发
+        reference_px = current_price / (1 + p)
+        closed_direction = self.protection.sync(position, reference_px) if self.protection is not None else 0
+
+        (self.u_p_1, self.d_p_1, self.u_p_2, self.d_p_2, self.u_p_3, self.d_p_3, self.u_p_4,
+         self.d_p_4) = function.update_u_p_and_d_p(self.u_p_1, self.d_p_1, self.u_p_2, self.d_p_2, self.u_p_3,
+                                                   self.d_p_3, self.u_p_4, self.d_p_4, p, *self.zones)
+
+        if len(self.top_five) < 5:
+            self.top_five.append(current_price)
+        if len(self.top_five) == 5:
+            self.current_five = sum(self.top_five) / 5
+            self.top_five.pop(0)
+
+        features = (predictor, current_price, before_price, self.before_five, self.current_five, self.before_mean_p,
+                    current_mean_p, self.before_bidSz, current_bidSz, self.before_askSz, current_askSz,
+                    self.before_vol24h, current_vol24h)
+
+        " 开仓逻辑 "
+        if go_long_signal(self.long_place_downlimit, self.long_place_uplimit, p, self.last_p_p, self.before_five,
+                          self.current_five, self.before_mean_p, current_mean_p, self.l_c, self.l_c_limit,
+                          self.before_bidSz, current_bidSz, self.before_vol24h, current_vol24h) and predict(*features):
+            if current_position_nums <= 0 or abs(current_position_nums) < self.ppn - 10:
+                with global_vars.tick_timer.span('order'):
+                    d, Sz = o.place_agreement_order(instId=self.instId, tdMode='cross', side='buy', ordType='market',
+                                                    lever=self.leverage, sz=self.n_sz)
+                if d['code'] != '0':
+                    global_vars.lq.push(('多交易对线程-交易记录', 'Error', f'{self.instId}买入失败:{d}'))
+                else:
+                    global_vars.lq.push(('多交易对线程-交易记录', 'Success', f'{self.instId}买入成功'))
+                    self.l_c += 1
+                    if self.l_c >= 3:
+                        self.long_place_downlimit, self.long_place_uplimit = (
+                            function.update_long_place_downlimit_and_long_place_uplimit_for_the_l_c(
+                                long_place_downlimit=self.long_place_downlimit,
+                                long_place_uplimit=self.long_place_uplimit,
+                                place_downlimit=self.place_downlimit, place_uplimit=self.place_uplimit, l_c=self.l_c))
+                    self.short_place_downlimit, self.short_place_uplimit = (
+                        function.update_short_place_uplimit_and_short_place_downlimit(
+                            short_place_downlimit=self.short_place_downlimit,
+                            short_place_uplimit=self.short_place_uplimit,
+                            before_price=before_price, current_price=current_price,
+                            place_downlimit=self.place_downlimit, place_uplimit=self.place_uplimit))
+                    trade_type = 1
+
+        elif go_short_signal(self.short_place_downlimit, self.short_place_uplimit, p, self.last_p_p, self.before_five,
+                             self.current_five, self.before_mean_p, current_mean_p, self.s_c, self.s_c_limit,
+                             self.before_askSz, current_askSz, self.before_vol24h, current_vol24h) and predict(*features):
+            if current_position_nums >= 0 or abs(current_position_nums) < self.ppn - 10:
+                with global_vars.tick_timer.span('order'):
+                    d, Sz = o.place_agreement_order(instId=self.instId, tdMode='cross', side='sell', ordType='market',
+                                                    lever=self.leverage, sz=self.n_sz)
+                if d['code'] != '0':
+                    global_vars.lq.push(('多交易对线程-交易记录', 'Error', f'{self.instId}卖出失败:{d}'))
+                else:
+                    global_vars.lq.push(('多交易对线程-交易记录', 'Success', f'{self.instId}卖出成功'))
+                    self.s_c += 1
+                    if self.s_c >= 3:
+                        self.short_place_downlimit, self.short_place_uplimit = (
+                            function.update_short_place_downlimit_and_short_place_uplimit_for_the_s_c(
+                                short_place_downlimit=self.short_place_downlimit,
+                                short_place_uplimit=self.short_place_uplimit,
+                                place_downlimit=self.place_downlimit, place_uplimit=self.place_uplimit, s_c=self.s_c))
+                    self.long_place_downlimit, self.long_place_uplimit = (
+                        function.update_long_place_uplimit_and_long_place_downlimit(
+                            long_place_downlimit=self.long_place_downlimit,
+                            long_place_uplimit=self.long_place_uplimit,
+                            before_price=before_price, current_price=current_price,
+                            place_downlimit=self.place_downlimit, place_uplimit=self.place_uplimit))
+                    trade_type = -1
+
+        " 获利逻辑 "
+        if today_pos and (p > self.lower_take_profit or p < -self.lower_take_profit):
+            if p > 0.25 or p < -0.25:
+                if today_pos > 0:
+                    trade_type = self._take_profit(o, 2, '多,超0.25方向') or trade_type
+                else:
+                    trade_type = self._take_profit(o, -2, '空,超0.25方向') or trade_type
+            elif today_pos > 0 and (self.u_p_1 > 50 or self.u_p_2 > 25 or self.u_p_3 > 13 or self.u_p_4 > 6):
+                trade_type = self._take_profit(o, 2, '多,区间计数器触发') or trade_type
+            elif today_pos < 0 and (self.d_p_1 > 50 or self.d_p_2 > 25 or self.d_p_3 > 13 or self.d_p_4 > 6):
+                trade_type = self._take_profit(o, -2, '空,区间计数器触发') or trade_type
+
+        # 本周期获取的历史仓位已实现盈亏，止损和统计盈亏共用，每次平仓只请求一次（每次请求先等待15秒）
+        realized_pnl = None
+
+        " 止损逻辑 "
+        with global_vars.tick_timer.span('stop_loss'):
+            if self.protection is not None:
+                # 开仓后重新获取一次持仓，下单或者按新的开仓均价修改触发价格；程序自己止盈平仓后撤单
+                if trade_type in (2, -2):
+                    self.protection.cancel()
+                elif trade_type in (1, -1):
+                    self.protection.follow(next((item for item in o.get_positions() or []
+                                                 if item['instId'] == self.instId and float(item['pos']) != 0), None),
+                                           reference_px)
+                if closed_direction:
+                    realized_pnl = self._realized_pnl(o)
+                    if realized_pnl < 0:
+                        trade_type = 3
+                        self.pending_loss = True
+                        global_vars.lq.push(('多交易对线程-止损记录', 'Success', f'{self.instId}交易所止损成功'))
+                    else:
+                        trade_type = 2 * closed_direction
+                        self._reset_after_take_profit()
+                        global_vars.lq.push(('多交易对线程-止盈记录', 'Success', f'{self.instId}交易所止盈成功'))
+            # 只有本周期开始时的持仓已经达到止损比例时才请求平仓，close_positions会重新获取持仓再判断一次
+            elif position and trade_type not in (2, -2) and float(position.get('uplRatio') or 0) < self.limit_uplRatio:
+                close_positions_re = o.close_positions(instId=self.instId, leverage=self.leverage, ordType='market',
+                                                       tdMode='cross', limit_uplRatio=self.limit_uplRatio)
+                if close_positions_re == 1:
+                    trade_type = 3
+                    self.pending_loss = True
+                    global_vars.lq.push(('多交易对线程-止损记录', 'Success', f'{self.instId}一键止损成功'))
+                elif close_positions_re:
+                    global_vars.lq.push(('多交易对线程-止损记录', 'Error', f'{self.instId}一键止损失败'))
+            if self.pending_loss:
+                realized_pnl = self._realized_pnl(o) if realized_pnl is None else realized_pnl
+                if self._update_loss(realized_pnl, current_price):
+                    self.pending_loss = False
+
+        # 统计盈亏情况
+        if trade_type in (2, -2, 3):
+            with global_vars.tick_timer.span('statistics'):
+                realized_pnl = self._realized_pnl(o) if realized_pnl is None else realized_pnl
+                self.profit = self.profit + realized_pnl
+
+        row = [
+            self.instId, formatted_now, current_price, before_price, p, self.last_p_p,
+            self.before_five, self.current_five, self.before_mean_p, current_mean_p,
+            self.before_bidSz, current_bidSz, self.before_askSz, current_askSz, self.before_vol24h, current_vol24h,
+            self.l_c, self.s_c, int(interval),
+            self.u_p_1, self.u_p_2, self.u_p_3, self.u_p_4, self.d_p_1, self.d_p_2, self.d_p_3, self.d_p_4,
+            self.long_place_downlimit, self.long_place_uplimit, self.short_place_downlimit, self.short_place_uplimit,
+            current_position_nums, trade_type, self.profit, self.loss,
+        ]
+
+        self.before_five = self.current_five
+        self.before_bidSz, self.before_askSz = current_bidSz, current_askSz
+        self.before_vol24h = current_vol24h
+        self.before_mean_p = current_mean_p
+        self.before_price = current_price
+        return row
+
+
+def multi_strategy_manager_thread(mysql_host: str, mysql_username: str, mysql_password: str,
+                                  mysql_coin_database: str, mysql_coin_day_date_table: str,
+                                  okx_api_key: str, okx_secret_key: str, okx_passphrase: str, instIds: list,
+                                  sender: str, receiver: str, sender_password: str,
+                                  mysql_port: int = 3306,
+                                  instrument_params: dict = None,
+                                  clock=None,
+                                  io=None,
+                                  parameter_dir: str = '.',
+                                  scheduler: TickScheduler = None,
+                                  checkpoint: CheckpointWriter = None,
+                                  exchange_tpsl: bool = False,
+                                  timing: bool = False,
+                                  max_ticks: int = None,
+                                  **strategy_params):
+    """
+    多交易对策略管理线程，可以代替strategy_manager_thread作为策略线程启动。
+    注意：使用这个策略之前，请你确保mysql_username用户拥有 create,select,insert 权限
+    :param mysql_host: 数据库主机
+    :param mysql_username: 数据库用户名
+    :param mysql_password: 通行密码
+    :param mysql_coin_database: 保存coin（币信息）的数据库名
+    :param mysql_coin_day_date_table: 保存instIds[0]日数据的表名，其他交易对的日数据保存在“表名_币种”表中
+    :param okx_api_key: okx申请api接口时，获得的api_key
+    :param okx_secret_key: okx申请api接口时，获得的secret_key
+    :param okx_passphrase: okx申请api时自己设置的密码
+    :param instIds: 交易对列表，例如：['ETH-USDT-SWAP', 'SOL-USDT-SWAP']
+    :param sender: QQ邮件发送者
+    :param receiver: QQ邮件接收者
+    :param sender_password: QQ邮件发送者的密码（授权码）
+    :param mysql_port: 数据库端口号，默认是：3306
+    :param instrument_params: 单独为某个交易对设置的策略参数，例如：{'SOL-USDT-SWAP': {'leverage': 5, 'sz': 2}}
+    :param clock: 时钟，默认为真实时钟RealClock
+    :param io: I/O层，默认为实盘的LiveIO
+    :param parameter_dir: 保存每个交易对动态参数文件（parameter_交易对.txt）的目录
+    :param scheduler: 周期调度器，默认按clock新建一个TickScheduler，并发布到global_vars.tick_scheduler
+    :param checkpoint: 动态参数的检查点写入器，默认新建一个CheckpointWriter，所有交易对的参数文件共用一个后台写入线程
+    :param exchange_tpsl: 为True时每个交易对开仓后在交易所下仓位止损止盈单，由交易所立即止损，
+                          与strategy_manager_thread的exchange_tpsl相同
+    :param timing: 为True时启用global_vars.tick_timer统计每个周期各个阶段的耗时，与strategy_manager_thread的timing相同
+    :param max_ticks: 最多运行的周期数，为None时一直运行到程序停止，用于性能测试
+    :param strategy_params: 所有交易对共用的策略参数（leverage、sz、place_uplimit、l_s1等，与strategy_manager_thread相同），
+                            没有提供的参数使用strategy_params.DEFAULT_PARAMS中的默认值
+    :return: 无返回值
+    """
+    clock = clock or RealClock()
+    io = io or LiveIO()
+    scheduler = scheduler or TickScheduler(clock)
+    global_vars.tick_scheduler = scheduler
+    checkpoint = checkpoint or CheckpointWriter()
+    timer = global_vars.tick_timer
+    if timing:
+        timer.enabled = True
+    global_vars.lq.push(('多交易对线程-状态信息', 'info', f'多交易对线程启动，交易对：{instIds}'))
+
+    o = io.create_okx(okx_api_key, okx_secret_key, okx_passphrase)
+
+    states = []
+    for i, instId in enumerate(instIds):
+        cfg = {**DEFAULT_PARAMS, **strategy_params, **(instrument_params or {}).get(instId, {})}
+        coin = instId.split('-')[0].lower()
+        day_table = mysql_coin_day_date_table if i == 0 else f'{mysql_coin_day_date_table}_{coin}'
+        state = InstrumentState(instId, cfg, day_table, os.path.join(parameter_dir, f'parameter_{instId}.txt'))
+        checkpoint.load(state, state.parameter_path)
+        if exchange_tpsl:
+            state.protection = ProtectiveOrders(o, instId, state.leverage, state.limit_uplRatio)
+            state.protection.adopt()
+        states.append(state)
+    checkpoint.start()
+
+    while True:
+        try:
+            io.create_control_program_switch_table(host=mysql_host, username=mysql_username, password=mysql_password,
+                                                   database=mysql_coin_database, table='switch')
+            global_vars.lq.push(('多交易对线程-创建控制程序开关表', 'Success', '创建控制程序开关表成功'))
+            break
+        except Exception as e:
+            global_vars.lq.push(('多交易对线程-创建控制程序开关表', 'Error', f'创建控制程序开关表失败:{e}，正在重试...'))
+            clock.sleep(3)
+
+    today = clock.now().strftime('%Y-%m-%d')
+    yesterday = (dt.strptime(today, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    c = 0  # 重试计数器
+    ticks = 0
+    while True:
+        if global_vars.s_finished_event or (max_ticks is not None and ticks >= max_ticks):
+            global_vars.lq.push(('多交易对线程-状态信息', 'info', '多交易对线程停止'))
+            checkpoint.close()
+            break
+        scheduler.start_tick()
+        timer.begin_tick()
+        try:
+            today = clock.now().strftime('%Y-%m-%d')
+
+            " 新的一天更新逻辑 "
+            if today != yesterday:
+                timer.heartbeat('new_day')  # 创建新的表、保存前一天的数据，看门狗据此判断停顿的阶段
+                today_str = today.replace('-', '_')
+                global_vars.data_table_name = today_str + '实时数据'
+                global_vars.multi_data_table_name = today_str + '多交易对实时数据'
+                global_vars.timing_table_name = today_str + '周期耗时'
+                log_table = f'{today_str}_multi_logs'
+                global_vars.log_table_name = log_table
+
+                if io.create_log_table(mysql_host=mysql_host, mysql_port=mysql_port, mysql_username=mysql_username,
+                                       mysql_password=mysql_password,
+                                       mysql_database=mysql_coin_database, mysql_log_table=log_table):
+                    global_vars.lq.push(('多交易对线程-创建日志表', 'Success', '创建新日期的日志表'))
+                else:
+                    global_vars.s_finished_event = True
+                    io.send_email(sender=sender, receiver=receiver, password=sender_password,
+                                  subject='来自okx自动化策略程序的运行错误的提醒:',
+                                  content="线程：multi_strategy_manager_thread"
+                                          "\n创建新的日志表失败,退出程序"
+                                          "\n请你前往服务器检查服务器网络,")
+                    continue
+
+                # 保存前一天的日数据到数据库中去，每个交易对保存到自己的日数据表
+                day_before = (dt.strptime(yesterday, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+                for state in states:
+                    try:
+                        io.sava_all_data_to_mysql(day_before, state.instId, username=mysql_username,
+                                                  password=mysql_password, host=mysql_host,
+                                                  database=mysql_coin_database, port=mysql_port,
+                                                  table=state.day_table)
+                    except Exception as e:
+                        global_vars.lq.push(('多交易对线程-保存前一天的收盘价', 'Error',
+                                             f'{state.instId}保存前一天收盘价到数据库失败:{e}'))
+                    state.reset(state.place_uplimit, state.place_downlimit)
+
+                yesterday = today
+
+            " 交易前准备：所有交易对共用一次行情请求和一次持仓请求 "
+            predictor = global_vars.predictor
+            with timer.span('ticker'):
+                tickers = io.get_tickers('SWAP')
+            if tickers is None:  # 行情请求失败时跳过这个周期，不计入连续异常的次数
+                global_vars.lq.push(('多交易对线程-获取行情', 'Error', '获取所有交易对的行情失败，跳过这个周期'))
+                timer.end_tick(clock.now().strftime('%Y-%m-%d %H:%M:%S'))
+                scheduler.wait()
+                continue
+            with timer.span('majors'):
+                current_mean_p = get_majors_mean_p_from_tickers(tickers)
+            with timer.span('positions'):
+                positions = {position['instId']: position for position in (o.get_positions() or [])
+                             if float(position['pos']) != 0}
+            formatted_now = clock.now().strftime('%Y-%m-%d %H:%M:%S')
+
+            # 波动最大的交易对决定下一个周期的间隔，行情中没有的交易对不参与
+            quoted = [state for state in states if state.instId in tickers]
+            if quoted:
+                fastest = max(quoted, key=lambda s: abs(tickers[s.instId][1] / s.before_price - 1) if s.before_price else 0)
+                interval = scheduler.update(fastest.before_price, tickers[fastest.instId][1])
+                # 等待期间查询波动最大的交易对的价格，价格剧烈变化时提前开始下一个周期
+                scheduler.watch(lambda instId=fastest.instId: io.get_ticker_last_price(instId)[1])
+            else:
+                interval = scheduler.interval
+
+            for state in states:
+                ticker = tickers.get(state.instId)
+                if ticker is None:
+                    global_vars.lq.push(('多交易对线程-状态更新', 'Error', f'行情中没有{state.instId}'))
+                    continue
+                try:
+                    row = state.tick(o, ticker, positions.get(state.instId), current_mean_p, predictor,
+                                     formatted_now, interval)
+                    global_vars.m_r_d.append(row)
+                except Exception as e:  # 一个交易对出错不影响其他交易对
+                    global_vars.lq.push(('多交易对线程-错误记录', 'Error', f'{state.instId}出现异常错误: {e}'))
+
+            with timer.span('checkpoint'):
+                checkpoint.commit()  # 只有参数发生变化的交易对才会在后台写入参数文件
+
+            timing_row = timer.end_tick(formatted_now)
+            if timing_row:
+                global_vars.t_r_d.append(timing_row)
+
+            ticks += 1
+            c = 0
+            sys.stdout.flush()
+            scheduler.wait()
+
+        except Exception as e:
+            if c < 3:
+                global_vars.lq.push(('多交易对线程-错误记录', 'Error', f'出现异常错误: {e}，将重试'))
+                c += 1
+                clock.sleep(10)
+            else:
+                global_vars.s_finished_event = True
+                io.send_email(sender=sender, receiver=receiver, password=sender_password,
+                              subject='来自okx自动化策略程序的运行错误的提醒:',
+                              content="发生在:multi_strategy_manager_thread线程。\n"
+                                      "错误位置：主while第一个try。\n"
+                                      f"错误原因：{e}\n")
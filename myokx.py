@@ -7,10 +7,21 @@
 - 获取仓位信息。
 - 获取历史K线数据。
 - 平仓操作。
+- 交易所端的仓位止损止盈单（策略委托）：下单、修改、撤单、查询未完成的止损止盈单。
+- 每个REST请求按接口记录请求次数、返回码和耗时到global_vars.metrics（okx_call）。
+- 每个REST请求之前先从global_vars.rate_limiter取令牌，令牌不够时按优先级排队，等待的时间也记录到global_vars.metrics。
+- 只读请求经过global_vars.request_cache：同时进行的相同请求只发出一次，短时间内的重复请求直接返回缓存的结果，
+  写操作完成后使受影响的缓存失效。
+- 所有请求都设置了连接超时和读取超时，并按照global_vars.request_policy重试（只读请求还会在耗时超过p95时发出对冲请求）。
+
+默认访问https://www.okx.com，设置环境变量OKX_DOMAIN（或者修改OKX_DOMAIN、实例化MyOkx时传入domain）
+可以改为访问其他地址，例如本地的fake_okx_server。
 """
 
 
 # 内置模块
+from functools import partial
+import os
 import requests
 import json
 from datetime import datetime
@@ -22,6 +33,97 @@ from okx.MarketData import MarketAPI
 from okx.Trade import TradeAPI
 
 import global_vars
+from rate_limiter import PRIORITY_NAMES
+from request_cache import request_key
+
+# Okx的访问地址
+OKX_DOMAIN = os.environ.get('OKX_DOMAIN', 'https://www.okx.com')
+
+# Okx REST请求的监控指标
+OKX_REQUESTS = global_vars.metrics.counter('okx_requests_total', 'Okx REST请求次数', ('endpoint', 'code'))
+OKX_REQUEST_SECONDS = global_vars.metrics.histogram('okx_request_seconds', 'Okx REST请求耗时（秒）', ('endpoint',))
+OKX_THROTTLED = global_vars.metrics.counter('okx_throttled_total', 'Okx REST请求因为限流等待令牌的次数',
+                                            ('endpoint', 'priority'))
+OKX_THROTTLE_SECONDS = global_vars.metrics.histogram('okx_throttle_wait_seconds', 'Okx REST请求因为限流等待令牌的时间（秒）',
+                                                     ('endpoint', 'priority'))
+OKX_CACHE = global_vars.metrics.counter('okx_cache_total', 'Okx只读请求经过缓存的次数，result为hit（命中缓存）、'
+                                                           'miss（发出请求）或shared（共享同时进行的相同请求）',
+                                        ('endpoint', 'result'))
+
+
+# 表示请求成功的返回码
+SUCCESS_CODES = ('http_200', '0', 'ok')
+
+
+def _result_code(result) -> str:
+    """
+    :return: 请求结果的返回码：HTTP响应为http_<状态码>，okx SDK返回的字典为其中的code
+    """
+    if isinstance(result, requests.Response):
+        return f'http_{result.status_code}'
+    if isinstance(result, dict):
+        return str(result.get('code'))
+    return 'none' if result is None else 'ok'
+
+
+def _succeeded(result) -> bool:
+    return _result_code(result) in SUCCESS_CODES
+
+
+def _set_timeout(client) -> None:
+    """
+    给okx SDK的客户端（httpx.Client）设置global_vars.request_policy的连接超时和读取超时。
+    """
+    client.timeout = global_vars.request_policy.httpx_timeout()
+
+
+def okx_call(endpoint: str, func, *args, **kwargs):
+    """
+    调用一个访问Okx的函数。只读接口先经过缓存（命中时不访问Okx），写操作完成后使受影响的缓存失效。
+    访问Okx时按照请求策略重试和对冲，每一次尝试都经过限流器。
+    :param endpoint: 接口路径，作为缓存、限流分组和指标的标签，例如'/api/v5/trade/order'
+    :param func: requests.get或者okx SDK的方法
+    :return: func的返回值，重试之后仍然失败时抛出最后一次的异常
+    """
+    cache = global_vars.request_cache
+    # 优先级在调用线程中确定，对冲请求在其他线程中发出时使用同样的优先级
+    attempt = partial(_request, endpoint, global_vars.rate_limiter.current_priority(endpoint), func, *args, **kwargs)
+    fetch = partial(global_vars.request_policy.run, endpoint, attempt, endpoint in cache.ttls, _result_code)
+    if not cache.cached(endpoint):
+        try:
+            return fetch()
+        finally:
+            cache.written(endpoint)
+    result, outcome = cache.call(endpoint, request_key(func, args, kwargs), fetch, _succeeded)
+    OKX_CACHE.inc((endpoint, outcome))
+    return result
+
+
+def _request(endpoint: str, priority: int, func, *args, **kwargs):
+    """
+    访问Okx一次：先从限流器取令牌，再记录请求次数、返回码和耗时，成功请求的耗时同时提供给请求策略计算对冲等待时间。
+    """
+    waited = global_vars.rate_limiter.acquire(endpoint, priority)
+    if waited > 0.001:
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        OKX_THROTTLED.inc((endpoint, name))
+        OKX_THROTTLE_SECONDS.observe(waited, (endpoint, name))
+
+    start = time.perf_counter()
+    code = 'exception'
+    try:
+        result = func(*args, **kwargs)
+        code = _result_code(result)
+        return result
+    except Exception as e:
+        code = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        OKX_REQUEST_SECONDS.observe(seconds, endpoint)
+        OKX_REQUESTS.inc((endpoint, code))
+        if code in SUCCESS_CODES:
+            global_vars.request_policy.observe(endpoint, seconds)
 
 
 def get_instId_lotsz(instrument_type, instrument_id):
@@ -31,13 +133,14 @@ def get_instId_lotsz(instrument_type, instrument_id):
     :param instrument_id: 交易id 如：BTC-USDT
     :return:
     """
-    url = "https://www.okx.com/api/v5/public/instruments"
+    url = f"{OKX_DOMAIN}/api/v5/public/instruments"
     params = {
         'instType': instrument_type,
         'instId': instrument_id
     }
 
-    response = requests.get(url, params=params)
+    response = okx_call('/api/v5/public/instruments', requests.get, url, params=params,
+                        timeout=global_vars.request_policy.timeout)
     if response.status_code == 200:
         data = response.json()
         if data['code'] == '0':
@@ -54,11 +157,12 @@ def get_ticker_last_price(instId: str) -> tuple | None:
     :param instId: 交易类型
     :return: 返回交易对的所有信息，交易对的最新价格信息，当前最新价格较昨收盘价的变化百分比变化
     """
-    url = 'https://www.okx.com/api/v5/market/ticker'
+    url = f'{OKX_DOMAIN}/api/v5/market/ticker'
     params = {
         'instId': instId,
     }
-    res = requests.get(url=url, params=params)
+    res = okx_call('/api/v5/market/ticker', requests.get, url=url, params=params,
+                   timeout=global_vars.request_policy.timeout)
     if res.status_code == 200:
         data1 = json.dumps(res.json(), indent=4)
         data1 = json.loads(data1)
@@ -69,13 +173,35 @@ def get_ticker_last_price(instId: str) -> tuple | None:
         return None
 
 
+def get_tickers(instType: str = 'SWAP') -> dict | None:
+    """
+    一次请求获取instType类型所有交易对的最近的市价信息，多个交易对同时交易时，每个周期只需要请求一次
+    :param instType: 交易类型，如'SWAP'
+    :return: 以交易对为键的字典，值与get_ticker_last_price的返回值相同：(交易对的所有信息，最新价格，当前最新价格较昨收盘价的变化百分比变化)
+    """
+    url = f'{OKX_DOMAIN}/api/v5/market/tickers'
+    params = {
+        'instType': instType,
+    }
+    res = okx_call('/api/v5/market/tickers', requests.get, url=url, params=params,
+                   timeout=global_vars.request_policy.timeout)
+    if res.status_code == 200:
+        tickers = {}
+        for data in res.json()['data']:
+            last, sod = float(data['last']), float(data['sodUtc8'])
+            tickers[data['instId']] = (data, last, (last - sod) / sod if sod else 0.0)
+        return tickers
+    else:
+        return None
+
+
 class MyOkx:
     """
     注意：访问Okx需要连接vpn。这里面的大部分方法都访问到了Okx。
     这个类封装了Okx的接口，你可以通过这个类来获取账户信息，下单，获取K线数据等。
     """
 
-    def __init__(self, api_key: str = None, secret_key: str = None, passphrase: str = None):
+    def __init__(self, api_key: str = None, secret_key: str = None, passphrase: str = None, domain: str = None):
         """
         实例化这个类时，请你提供api_key，secret_key，passphrase这些参数，这些参数中：api_key，secret_key
         是你在Okx自己的账户上申请api成功后，Okx官方提供给你的参数。passphrase是你在申请api时自己设置的。如果你不提供这些参数，
@@ -83,16 +209,21 @@ class MyOkx:
         :param api_key:
         :param secret_key:
         :param passphrase:
+        :param domain: Okx的访问地址，默认为OKX_DOMAIN
         """
         self.flag = "0"  # 实盘:0 , 模拟盘：1
+        self.domain = domain or OKX_DOMAIN
         if api_key is None or secret_key is None or passphrase is None:
             self.account = None
             self.trade_api = None
             self.market_api = None
         else:
-            self.account = AccountAPI(api_key, secret_key, passphrase, flag=self.flag, debug=False)
-            self.trade_api = TradeAPI(api_key, secret_key, passphrase, flag=self.flag, debug=False)
-            self.market_api = MarketAPI(api_key, secret_key, passphrase, flag=self.flag, debug=False)
+            self.account = AccountAPI(api_key, secret_key, passphrase, flag=self.flag, domain=self.domain, debug=False)
+            self.trade_api = TradeAPI(api_key, secret_key, passphrase, flag=self.flag, domain=self.domain, debug=False)
+            self.market_api = MarketAPI(api_key, secret_key, passphrase, flag=self.flag, domain=self.domain,
+                                        debug=False)
+            for client in (self.account, self.trade_api, self.market_api):
+                _set_timeout(client)
 
     def get_account_info(self):
         """
@@ -104,7 +235,7 @@ class MyOkx:
         if self.account is None:
             return None
 
-        data = self.account.get_account_balance()
+        data = okx_call('/api/v5/account/balance', self.account.get_account_balance)
         if data and data['code'] == '0':
             updated_time_str = data['data'][0]['details'][0]['uTime']  # 获取时间戳字符串
 
@@ -146,7 +277,7 @@ class MyOkx:
             'mgnMode': mgnMode,
             'lever': leverage
         }
-        re = self.account.set_leverage(**params)
+        re = okx_call('/api/v5/account/set-leverage', self.account.set_leverage, **params)
         if re and re['code'] == '0':
             return int(re['data'][0]['lever'])
         return None
@@ -227,7 +358,7 @@ class MyOkx:
             "side": side,  # 根据需要设置为buy或sell
             "sz": str(sz)  # 假设你需要根据position_nums和lever来计算订单大小
         }
-        data = self.trade_api.place_order(**params, **kwargs)
+        data = okx_call('/api/v5/trade/order', self.trade_api.place_order, **params, **kwargs)
         print(data)
         if data['code'] != '0':
             return data, 0
@@ -243,7 +374,7 @@ class MyOkx:
         if self.account is None:
             return None
 
-        data = json.dumps(self.account.get_positions(), indent=4)
+        data = json.dumps(okx_call('/api/v5/account/positions', self.account.get_positions), indent=4)
         data = json.loads(data)['data']
         return data
 
@@ -257,7 +388,8 @@ class MyOkx:
         :param:instId:交易币对
         :return:返回一个包含数组的数组数据，或者None
         """
-        marketDataAPI = MarketAPI(flag=self.flag, debug=False)
+        marketDataAPI = MarketAPI(flag=self.flag, domain=self.domain, debug=False)
+        _set_timeout(marketDataAPI)
 
         start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")  # 将字符串转换为时间对象
         end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
@@ -265,7 +397,7 @@ class MyOkx:
         end_dateTs = int(end_date_obj.timestamp() * 1000)  # 这是结束时间 ，将秒级时间戳转换为毫秒级时间戳
         start_dateTs = int(start_date_obj.timestamp() * 1000)  # 这是开始时间
 
-        result = marketDataAPI.get_history_candlesticks(
+        result = okx_call('/api/v5/market/history-candles', marketDataAPI.get_history_candlesticks,
             instId=instId,
             after=end_dateTs,
             before=start_dateTs,
@@ -329,7 +461,7 @@ class MyOkx:
             # 进行平仓条件检查
             if uplRatio < 0 and uplRatio < limit_uplRatio:
                 # 使用 self.trade_api.place_order 进行下单
-                result = self.trade_api.place_order(
+                result = okx_call('/api/v5/trade/order', self.trade_api.place_order,
                     instId=position['instId'],
                     tdMode=tdMode,
                     side=side,
@@ -343,7 +475,7 @@ class MyOkx:
                     return -1
 
             elif limit_uplRatio == 0 and pos < 0:  # 空止盈
-                result = self.trade_api.place_order(
+                result = okx_call('/api/v5/trade/order', self.trade_api.place_order,
                     instId=position['instId'],
                     tdMode=tdMode,
                     side='buy',
@@ -357,7 +489,7 @@ class MyOkx:
                     return -1
 
             elif limit_uplRatio == 0 and pos > 0:  # 多止盈
-                result = self.trade_api.place_order(
+                result = okx_call('/api/v5/trade/order', self.trade_api.place_order,
                     instId=position['instId'],
                     tdMode=tdMode,
                     side='sell',
@@ -372,6 +504,87 @@ class MyOkx:
 
         return None  # 如果没有进行任何平仓操作，返回 None
 
+    def place_tpsl_order(self, instId: str, side: str, tdMode: str = 'cross', slTriggerPx: float = None,
+                         tpTriggerPx: float = None) -> str | None:
+        """
+        注意：这个需要账户信息，请你实例化对象是提供对应的api参数。
+        下一个仓位止损止盈单（策略委托，closeFraction=1）：价格达到触发价格时，由交易所以市价平掉整个仓位，
+        不需要程序每个周期查询持仓再决定是否平仓。仓位被平掉后交易所会自动撤销这个止损止盈单。
+        :param instId: 合约代码，如 "BTC-USDT-SWAP"。
+        :param side: 平仓方向，多仓为"sell"，空仓为"buy"。
+        :param tdMode: 交易模式，如 "cross" 或 "isolated"。
+        :param slTriggerPx: 止损触发价格，为None时不设止损
+        :param tpTriggerPx: 止盈触发价格，为None时不设止盈
+        :return: 止损止盈单的algoId，或者None
+        """
+        if self.trade_api is None:
+            return None
+
+        params = {'instId': instId, 'tdMode': tdMode, 'side': side, 'ordType': 'conditional',
+                  'closeFraction': '1', 'reduceOnly': 'true'}
+        if slTriggerPx is not None:
+            params.update(slTriggerPx=f'{slTriggerPx:.6g}', slOrdPx='-1', slTriggerPxType='last')  # -1表示市价
+        if tpTriggerPx is not None:
+            params.update(tpTriggerPx=f'{tpTriggerPx:.6g}', tpOrdPx='-1', tpTriggerPxType='last')
+        re = okx_call('/api/v5/trade/order-algo', self.trade_api.place_algo_order, **params)
+        if re and re['code'] == '0':
+            return re['data'][0]['algoId']
+        print(re)
+        return None
+
+    def amend_tpsl_order(self, instId: str, algoId: str, slTriggerPx: float = None,
+                         tpTriggerPx: float = None) -> bool:
+        """
+        注意：这个需要账户信息，请你实例化对象是提供对应的api参数。
+        修改仓位止损止盈单的触发价格（例如加仓后开仓均价变化，或者新的一天昨收盘价变化）。
+        :param instId: 合约代码
+        :param algoId: place_tpsl_order返回的algoId
+        :param slTriggerPx: 新的止损触发价格，为None时不修改
+        :param tpTriggerPx: 新的止盈触发价格，为None时不修改
+        :return: 是否修改成功
+        """
+        if self.trade_api is None:
+            return False
+
+        params = {'instId': instId, 'algoId': algoId}
+        if slTriggerPx is not None:
+            params.update(newSlTriggerPx=f'{slTriggerPx:.6g}', newSlOrdPx='-1', newSlTriggerPxType='last')
+        if tpTriggerPx is not None:
+            params.update(newTpTriggerPx=f'{tpTriggerPx:.6g}', newTpOrdPx='-1', newTpTriggerPxType='last')
+        re = okx_call('/api/v5/trade/amend-algos', self.trade_api.amend_algo_order, **params)
+        return bool(re) and re['code'] == '0'
+
+    def cancel_algo_orders(self, instId: str, algoIds: list) -> bool:
+        """
+        注意：这个需要账户信息，请你实例化对象是提供对应的api参数。
+        撤销策略委托。
+        :param instId: 合约代码
+        :param algoIds: 要撤销的algoId列表
+        :return: 是否撤销成功
+        """
+        if self.trade_api is None or not algoIds:
+            return False
+
+        re = okx_call('/api/v5/trade/cancel-algos', self.trade_api.cancel_algo_order,
+                      [{'instId': instId, 'algoId': algoId} for algoId in algoIds])
+        return bool(re) and re['code'] == '0'
+
+    def get_pending_tpsl_orders(self, instId: str) -> list | None:
+        """
+        注意：这个需要账户信息，请你实例化对象是提供对应的api参数。
+        获取未完成的止损止盈单，程序重启后用来接管之前下的止损止盈单。
+        :param instId: 合约代码
+        :return: 未完成的止损止盈单列表，或者None
+        """
+        if self.trade_api is None:
+            return None
+
+        re = okx_call('/api/v5/trade/orders-algo-pending', self.trade_api.order_algos_list,
+                      ordType='conditional', instType='SWAP', instId=instId)
+        if re and re['code'] == '0':
+            return re['data']
+        return None
+
     def get_positions_history(self,instType='SWAP',instId='ETH-USDT-SWAP'):
         """
         获取历史持仓信息
@@ -381,5 +594,6 @@ class MyOkx:
         """
         # 获取历史持仓信息
         time.sleep(15)
-        positions_history = self.account.get_positions_history(instType=instType, instId=instId,limit=1)
+        positions_history = okx_call('/api/v5/account/positions-history', self.account.get_positions_history,
+                                     instType=instType, instId=instId, limit=1)
         return positions_history['data'][0]
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+该模块提供了从MySQL数据库流式读取数据到pandas的功能。具体包括：
+
+- 使用服务端游标（SSCursor）分批读取查询结果，数据不会一次性全部加载到客户端内存中。
+- 每一批数据读取后立即压缩数据类型：浮点数转换为float32，整数转换为能容纳的最小整数类型，
+  重复值较多的字符串转换为category。
+- 可以逐批交给调用方处理，也可以合并成一个DataFrame返回。
+
+与pd.read_sql一次性读取全部数据到float64/object列相比，加载大量历史数据时的峰值内存会小很多。
+"""
+
+" 内置模块 "
+from typing import Iterator
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+import pymysql
+import pymysql.cursors
+
+# 每一批读取的默认行数
+DEFAULT_CHUNKSIZE = 50000
+
+
+def downcast(df: pd.DataFrame, dtypes: dict = None, category_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    压缩DataFrame每一列的数据类型。
+    :param df: 需要压缩的DataFrame
+    :param dtypes: 指定某些列的数据类型，例如：{'交易类型': 'int8'}，没有指定的列自动压缩
+    :param category_ratio: 字符串列中不同值的数量占比小于这个值时转换为category
+    :return: 压缩后的DataFrame
+    """
+    dtypes = dtypes or {}
+    for col in df.columns:
+        series = df[col]
+        if col in dtypes:
+            df[col] = series.astype(dtypes[col])
+        elif pd.api.types.is_float_dtype(series):
+            df[col] = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_string_dtype(series) and len(series) > 0:
+            if series.nunique() < category_ratio * len(series):
+                df[col] = series.astype('category')
+    return df
+
+
+def stream_sql(client: pymysql.connections.Connection, sql: str, chunksize: int = DEFAULT_CHUNKSIZE,
+               dtypes: dict = None, yield_empty: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    使用服务端游标分批执行查询，每一批数据压缩数据类型后交给调用方。
+    注意：在迭代结束之前，这个连接不能执行其他查询。
+    :param client: pymysql的数据库连接
+    :param sql: 查询语句，请只查询需要用到的列
+    :param chunksize: 每一批读取的行数
+    :param dtypes: 指定某些列的数据类型
+    :param yield_empty: 查询没有数据时是否返回一个只有列名的空DataFrame（列名来自cursor.description）
+    :return: 逐批返回DataFrame的迭代器
+    """
+    with client.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql)
+        columns = [d[0] for d in cursor.description]
+        empty = True
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            empty = False
+            yield downcast(pd.DataFrame.from_records(rows, columns=columns), dtypes)
+        if empty and yield_empty:
+            yield pd.DataFrame(columns=columns)
+
+
+def read_sql_compact(client: pymysql.connections.Connection, sql: str, chunksize: int = DEFAULT_CHUNKSIZE,
+                     dtypes: dict = None) -> pd.DataFrame:
+    """
+    流式执行查询并把所有批次合并成一个压缩过数据类型的DataFrame。
+    :param client: pymysql的数据库连接
+    :param sql: 查询语句
+    :param chunksize: 每一批读取的行数
+    :param dtypes: 指定某些列的数据类型
+    :return: 查询结果，没有数据时返回只有列名的空DataFrame
+    """
+    chunks = list(stream_sql(client, sql, chunksize, dtypes, yield_empty=True))
+    if len(chunks) == 1:
+        return chunks[0]
+
+    # 不同批次的category取值可能不同，直接合并会退化成object，需要先统一category的取值
+    for col in chunks[0].columns:
+        if all(isinstance(chunk[col].dtype, pd.CategoricalDtype) for chunk in chunks):
+            union = pd.api.types.union_categoricals([chunk[col] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(union)
+    return pd.concat(chunks, ignore_index=True)
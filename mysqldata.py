@@ -4,7 +4,7 @@
 - 将数据保存到MySQL数据库。
 - 从数据库中获取数据并转换为DataFrame。
 - 获取前一天的收盘价。
-- 实时数据的批量写入数据库操作。
+- 实时数据的批量写入数据库操作（包括多个交易对共用一张表、带instId列的实时数据）。
 - 创建控制程序开关的表。
 """
 
@@ -13,6 +13,7 @@
 from datetime import timedelta
 import time
 from datetime import datetime
+from typing import Iterator
 
 # 第三方模块
 import pymysql
@@ -20,6 +21,9 @@ import pandas as pd
 
 # 自定义模块
 from myokx import MyOkx
+from rate_limiter import PRIORITY_BACKFILL
+import global_vars
+from mysql_stream import DEFAULT_CHUNKSIZE, read_sql_compact, stream_sql
 
 
 def sava_all_data_to_mysql(start_date: str, instId: str, username: str, password: str, host: str, database: str,
@@ -71,7 +75,8 @@ def sava_all_data_to_mysql(start_date: str, instId: str, username: str, password
             start_date = start_date_obj.strftime("%Y-%m-%d")
             end_date = end_date_obj.strftime("%Y-%m-%d")
 
-            data = o.get_closing_prices(start_date, end_date, instId)
+            with global_vars.rate_limiter.priority(PRIORITY_BACKFILL):  # 补数据让位于下单、持仓和行情请求
+                data = o.get_closing_prices(start_date, end_date, instId)
             if data is None:
                 return
             for item in data:
@@ -98,22 +103,46 @@ def sava_all_data_to_mysql(start_date: str, instId: str, username: str, password
 
 
 def get_data_from_mysql(username: str, password: str, host: str, database: str, table: str,
-                        port: int = 3306) -> pd.DataFrame:
+                        port: int = 3306, columns: list = None, chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
     """
-    这个方法从数据库中获取数据，返回一个DataFrame。
+    这个方法从数据库中获取数据，返回一个DataFrame。数据使用服务端游标分批读取，并压缩数据类型（float32/int8/category）。
     :param username: 数据库用户名
     :param password: 数据库密码
     :param host: 数据库主机
     :param port :数据库端口号，默认为：3306
     :param database: 数据库名
     :param table: 表名
+    :param columns: 需要获取的列名，默认获取所有列
+    :param chunksize: 每一批读取的行数
     :return: 返回一个DataFrame。
     """
     with pymysql.connect(host=host, port=port, user=username, password=password, database=database) as client:
-        df = pd.read_sql(f"SELECT * FROM {table}", con=client)
+        df = read_sql_compact(client, f"SELECT {select_columns(columns)} FROM {table}", chunksize=chunksize)
         return df
 
 
+def iter_data_from_mysql(username: str, password: str, host: str, database: str, table: str,
+                         port: int = 3306, columns: list = None,
+                         chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    与get_data_from_mysql相同，但是逐批返回DataFrame，适合数据量很大、可以逐批处理的场景。
+    :return: 逐批返回DataFrame的迭代器
+    """
+    with pymysql.connect(host=host, port=port, user=username, password=password, database=database) as client:
+        yield from stream_sql(client, f"SELECT {select_columns(columns)} FROM {table}", chunksize=chunksize)
+
+
+def select_columns(columns: list = None) -> str:
+    """
+    生成查询语句中的列名部分
+    :param columns: 列名列表，为None时查询所有列
+    :return: 例如：`时间`,`收盘价`
+    """
+    if not columns:
+        return "*"
+    return ",".join(f"`{col}`" for col in columns)
+
+
 def get_late_date_prices(username: str, password: str, host: str, database: str, table: str) -> float:
     """
     这个方法从数据库中获取前一天的收盘价，返回一个float类型数据。
@@ -256,6 +285,97 @@ def real_time_data(r_d: list, host: str, port: int, username: str, password: str
                     return False
 
 
+# 实时数据表中（除了id以外）的列名和类型，顺序与strategy_manager_thread中实时数据行的顺序相同
+REAL_TIME_COLUMNS = [
+    ('当前时间', 'DATETIME'), ('当前价格', 'FLOAT'), ('上一次价格', 'FLOAT'), ('较昨天的涨跌幅', 'FLOAT'),
+    ('较上一次的涨跌幅', 'FLOAT'), ('上一次五个当前价格的平均值', 'FLOAT'), ('当前五个当前价格的平均值', 'FLOAT'),
+    ('上一次主流货币当前价格标准化均值', 'FLOAT'), ('当前主流货币当前价格标准化均值', 'FLOAT'),
+    ('上一次bidSz', 'FLOAT'), ('当前bidSz', 'FLOAT'), ('上一次askSz', 'FLOAT'), ('当前askSz', 'FLOAT'),
+    ('上一次24小时交易量', 'FLOAT'), ('当前24小时交易量', 'FLOAT'), ('开多计数', 'INT'), ('开空计数', 'INT'),
+    ('下一次休眠时间', 'INT'),
+    ('多仓涨幅区间1次数', 'INT'), ('多仓涨幅区间2次数', 'INT'), ('多仓涨幅区间3次数', 'INT'), ('多仓涨幅区间4次数', 'INT'),
+    ('空仓跌幅区间1次数', 'INT'), ('空仓跌幅区间2次数', 'INT'), ('空仓跌幅区间3次数', 'INT'), ('空仓跌幅区间4次数', 'INT'),
+    ('long_place_downlimit', 'FLOAT'), ('long_place_uplimit', 'FLOAT'),
+    ('short_place_downlimit', 'FLOAT'), ('short_place_uplimit', 'FLOAT'),
+    ('当前仓位数量', 'FLOAT'), ('交易类型', 'INT'), ('累计盈亏情况', 'FLOAT'), ('亏损累计值', 'FLOAT'),
+]
+
+
+# 周期耗时表中（除了id以外）的列名和类型，顺序与tick_timing.TickTimer.end_tick返回的数据行相同，耗时单位为毫秒
+TICK_TIMING_COLUMNS = [
+    ('当前时间', 'DATETIME'), ('周期总耗时', 'FLOAT'), ('行情耗时', 'FLOAT'), ('主流币耗时', 'FLOAT'),
+    ('持仓耗时', 'FLOAT'), ('信号耗时', 'FLOAT'), ('预测耗时', 'FLOAT'), ('下单耗时', 'FLOAT'), ('止盈耗时', 'FLOAT'),
+    ('止损耗时', 'FLOAT'), ('盈亏统计耗时', 'FLOAT'), ('参数保存耗时', 'FLOAT'), ('其他耗时', 'FLOAT'),
+]
+
+
+def batch_insert(rows: list, host: str, port: int, username: str, password: str, database: str, table: str,
+                 columns: list, indexes: tuple = (), batch_size: int = 1000) -> bool:
+    """
+    按列定义创建表（已经存在时不创建），然后每batch_size行执行一次executemany，把队列中的数据写入表中。
+    :param rows: 数据队列，每一行的元素顺序与columns相同，写入成功的行会从队列中删除
+    :param host: 数据库主机
+    :param port: 数据库端口号
+    :param username: 数据库用户名
+    :param password: 数据库密码
+    :param database: 数据库名
+    :param table: 表名
+    :param columns: 表中（除了id以外）的列名和类型，例如：[('当前时间', 'DATETIME'), ('当前价格', 'FLOAT')]
+    :param indexes: 建表时额外的索引定义，例如：('INDEX `instId_时间` (`instId`, `当前时间`)',)
+    :param batch_size: 每次executemany写入的行数
+    :return: 写入成功返回True，否则返回False（未写入的行仍然留在队列中）
+    """
+    with pymysql.connect(host=host, port=port, user=username, password=password) as client:  # 连接数据库
+        cursor = client.cursor()
+        cursor.execute(f"""CREATE DATABASE IF NOT EXISTS {database}""")
+        client.commit()
+        client.select_db(database)
+
+        definitions = ',\n'.join([f'`{name}` {kind}' for name, kind in columns] + list(indexes))
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{table}` (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            {definitions}
+        )
+        """)
+
+        names = ', '.join(f'`{name}`' for name, _ in columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        insert_sql = f"INSERT INTO `{table}` ({names}) VALUES ({placeholders})"
+
+        try:
+            while rows:
+                batch = rows[:batch_size]
+                cursor.executemany(insert_sql, [tuple(row) for row in batch])
+                client.commit()
+                del rows[:len(batch)]
+            return True
+        except Exception:
+            return False
+
+
+def multi_real_time_data(rows: list, host: str, port: int, username: str, password: str, database: str,
+                         table: str, batch_size: int = 1000) -> bool:
+    """
+    批量将多个交易对的实时数据写入同一张表中，每一行的第一个元素是交易对（instId），其余元素与real_time_data中的一行相同。
+    与real_time_data逐行执行INSERT不同，这里每batch_size行执行一次executemany，交易对越多，节省的往返次数越多。
+    参数和返回值与batch_insert相同。
+    """
+    return batch_insert(rows, host, port, username, password, database, table,
+                        [('instId', 'VARCHAR(32)')] + REAL_TIME_COLUMNS,
+                        indexes=('INDEX `instId_时间` (`instId`, `当前时间`)',), batch_size=batch_size)
+
+
+def tick_timing_data(rows: list, host: str, port: int, username: str, password: str, database: str,
+                     table: str, batch_size: int = 1000) -> bool:
+    """
+    批量将策略线程的周期耗时数据写入周期耗时表，每batch_size行执行一次executemany。
+    参数和返回值与batch_insert相同。
+    """
+    return batch_insert(rows, host, port, username, password, database, table, TICK_TIMING_COLUMNS,
+                        batch_size=batch_size)
+
+
 def create_control_program_switch_table(host: str, username: str, password: str, database: str, port: int = 3306,
                                         table: str = 'switch'):
     """
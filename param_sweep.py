@@ -0,0 +1,319 @@
+"""
+该模块用来对策略参数进行批量回测（参数搜索），帮助选择自动化程序参数表中的参数
+（l_s1..l_s4、l_e1..l_e4、s_s1..s_s4、s_e1..s_e4、place_uplimit、place_downlimit、l_c_limit、s_c_limit、
+limit_uplRatio、lower_take_profit）。具体包括：
+
+- 把回测使用的实时数据按列保存为.npy文件，每个工作进程以内存映射的方式打开，多个进程共享同一份数据，不需要复制。
+- 网格搜索（grid）：对每个参数给出候选值列表，回测所有组合。
+- 随机搜索（random）：在每个参数的取值范围内随机抽样，然后围绕排名靠前的参数组合做局部细化（refine）。
+- 使用进程池并行回测，每完成一组参数立即追加写入JSONL结果文件，中断后重新运行会跳过已经完成的参数组合。
+  每条结果记录实时数据的指纹（周期数和时间列的哈希），重新读取了实时数据后，用旧数据回测的结果不会被跳过，也不会参与排名。
+- 记录每一组参数的回测耗时和工作进程，最后按目标指标排序输出CSV排名表。
+
+运行方式：
+    python param_sweep.py --ticks-dir ticks --host 主机 --username 用户名 --password 密码 --database 数据库 --start 2024-07-01
+    python param_sweep.py --ticks-dir ticks --mode random --trials 500 --workers 8
+"""
+
+" 内置模块 "
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+
+" 自定义模块 "
+from backtest import DEFAULT_PARAMS, TICK_COLUMNS, load_ticks, run_backtest
+
+# 随机搜索的默认取值范围：元组表示连续区间 (最小值, 最大值)，列表表示候选值
+SEARCH_SPACE = {
+    'place_uplimit': (0.003, 0.012),
+    'place_downlimit': (0.0005, 0.003),
+    'l_s1': (0.006, 0.014), 'l_s2': (0.015, 0.035), 'l_s3': (0.03, 0.06), 'l_s4': (0.05, 0.1),
+    'l_e1': (0.01, 0.02), 'l_e2': (0.025, 0.045), 'l_e3': (0.045, 0.085), 'l_e4': (0.08, 0.13),
+    's_s1': (-0.02, -0.01), 's_s2': (-0.045, -0.025), 's_s3': (-0.085, -0.045), 's_s4': (-0.13, -0.08),
+    's_e1': (-0.014, -0.006), 's_e2': (-0.035, -0.015), 's_e3': (-0.06, -0.03), 's_e4': (-0.1, -0.05),
+    'l_c_limit': [2, 4, 6, 8, 10, 12],
+    's_c_limit': [2, 4, 6, 8, 10, 12],
+    'limit_uplRatio': (-1.0, -0.1),
+    'lower_take_profit': (0.005, 0.03),
+}
+
+# 每个工作进程中以内存映射方式打开的实时数据和它的指纹
+_TICKS = None
+_FINGERPRINT = None
+
+# save_ticks保存实时数据指纹的文件名
+FINGERPRINT_FILE = 'fingerprint.txt'
+
+
+def save_ticks(ticks: dict, directory: str) -> None:
+    """
+    把实时数据按列保存为 directory/列名.npy。
+    :param ticks: backtest.load_ticks返回的字典
+    :param directory: 保存的目录
+    """
+    os.makedirs(directory, exist_ok=True)
+    for key, values in ticks.items():
+        np.save(os.path.join(directory, f'{key}.npy'), values)
+    with open(os.path.join(directory, FINGERPRINT_FILE), 'w', encoding='utf-8') as f:
+        f.write(fingerprint(ticks))
+
+
+def fingerprint(ticks: dict) -> str:
+    """
+    :return: 实时数据的指纹：周期数和时间列的哈希，用来区分不同的回测数据
+    """
+    times = np.ascontiguousarray(ticks['time'])
+    return f'{len(times)}-{hashlib.sha1(times.tobytes()).hexdigest()[:16]}'
+
+
+def read_fingerprint(directory: str) -> str:
+    """
+    读取save_ticks保存的实时数据指纹，以前保存的目录中没有指纹文件时从时间列计算。
+    """
+    try:
+        with open(os.path.join(directory, FINGERPRINT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return fingerprint(open_ticks(directory))
+
+
+def open_ticks(directory: str) -> dict:
+    """
+    以只读的内存映射方式打开save_ticks保存的实时数据。
+    :param directory: 保存的目录
+    :return: 与backtest.load_ticks格式相同的字典
+    """
+    return {key: np.load(os.path.join(directory, f'{key}.npy'), mmap_mode='r') for key in TICK_COLUMNS}
+
+
+def trial_id(params: dict) -> str:
+    """
+    :return: 参数组合的唯一标识，用来在重新运行时跳过已经完成的参数组合
+    """
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def is_valid(params: dict) -> bool:
+    """
+    检查参数组合是否合理：开仓下限小于开仓上限，每个区间的左限小于右限。
+    """
+    cfg = {**DEFAULT_PARAMS, **params}
+    if not cfg['place_downlimit'] < cfg['place_uplimit']:
+        return False
+    for k in range(1, 5):
+        if not cfg[f'l_s{k}'] < cfg[f'l_e{k}'] or not cfg[f's_s{k}'] < cfg[f's_e{k}']:
+            return False
+    return True
+
+
+def grid_trials(grid: dict) -> list:
+    """
+    网格搜索：生成所有参数组合。
+    :param grid: 参数名到候选值列表的字典
+    :return: 合理的参数组合列表
+    """
+    names = list(grid)
+    trials = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    return [t for t in trials if is_valid(t)]
+
+
+def _sample(space: dict, rng: np.random.Generator) -> dict:
+    params = {}
+    for name, domain in space.items():
+        if isinstance(domain, list):
+            params[name] = domain[rng.integers(len(domain))]
+        else:
+            params[name] = round(float(rng.uniform(*domain)), 6)
+    return params
+
+
+def random_trials(space: dict, n: int, seed: int = 0) -> list:
+    """
+    随机搜索：在取值范围内随机抽取n组合理的参数组合。
+    :param space: 取值范围，格式与SEARCH_SPACE相同
+    :param n: 参数组合的数量
+    :param seed: 随机数种子
+    :return: 参数组合列表
+    """
+    rng = np.random.default_rng(seed)
+    trials = []
+    attempts = 0
+    while len(trials) < n and attempts < n * 100:
+        attempts += 1
+        params = _sample(space, rng)
+        if is_valid(params):
+            trials.append(params)
+    return trials
+
+
+def refine_trials(best: list, space: dict, n: int, scale: float = 0.1, seed: int = 0) -> list:
+    """
+    局部细化：在排名靠前的参数组合附近随机扰动，生成新的参数组合。
+    连续参数按取值范围宽度的scale倍做正态扰动，候选值参数以较小的概率换成相邻的候选值。
+    :param best: 排名靠前的参数组合列表
+    :param space: 取值范围，格式与SEARCH_SPACE相同
+    :param n: 新参数组合的数量
+    :param scale: 扰动幅度
+    :param seed: 随机数种子
+    :return: 参数组合列表
+    """
+    if not best:
+        return []
+    rng = np.random.default_rng(seed)
+    trials = []
+    attempts = 0
+    while len(trials) < n and attempts < n * 100:
+        attempts += 1
+        params = dict(best[attempts % len(best)])
+        for name, domain in space.items():
+            if name not in params:
+                continue
+            if isinstance(domain, list):
+                if rng.random() < 0.2 and params[name] in domain:
+                    j = domain.index(params[name]) + int(rng.choice([-1, 1]))
+                    params[name] = domain[min(max(j, 0), len(domain) - 1)]
+            else:
+                low, high = domain
+                value = params[name] + rng.normal(0, scale * (high - low))
+                params[name] = round(float(min(max(value, low), high)), 6)
+        if is_valid(params):
+            trials.append(params)
+    return trials
+
+
+def _init_worker(directory: str, data: str) -> None:
+    global _TICKS, _FINGERPRINT
+    _TICKS = open_ticks(directory)
+    _FINGERPRINT = data
+
+
+def _run_trial(params: dict) -> dict:
+    start = time.perf_counter()
+    stats = run_backtest(_TICKS, params).stats
+    return {
+        'trial_id': trial_id(params),
+        'data': _FINGERPRINT,
+        'params': params,
+        'stats': stats,
+        'seconds': round(time.perf_counter() - start, 4),
+        'pid': os.getpid(),
+    }
+
+
+def read_results(path: str) -> list:
+    """
+    读取JSONL结果文件，文件不存在时返回空列表；最后一行不完整（写入时被中断）会被忽略。
+    """
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return results
+
+
+def run_sweep(directory: str, trials: list, results_path: str, workers: int = None) -> list:
+    """
+    使用进程池回测所有参数组合，已经在结果文件中、并且使用同一份实时数据（指纹相同）回测的参数组合会被跳过。
+    :param directory: save_ticks保存实时数据的目录
+    :param trials: 参数组合列表
+    :param results_path: JSONL结果文件路径，每完成一组参数追加一行
+    :param workers: 工作进程数，默认为CPU核数
+    :return: 结果文件中使用这份实时数据回测的所有结果（包括以前运行完成的）
+    """
+    data = read_fingerprint(directory)
+    done = {r['trial_id'] for r in read_results(results_path) if r.get('data') == data}
+    pending = [t for t in trials if trial_id(t) not in done]
+    pending = list({trial_id(t): t for t in pending}.values())  # 去掉重复的参数组合
+    print(f'共{len(trials)}组参数，已完成{len(trials) - len(pending)}组，待回测{len(pending)}组')
+
+    if pending:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(directory, data)) as pool, \
+                open(results_path, 'a', encoding='utf-8') as f:
+            futures = [pool.submit(_run_trial, t) for t in pending]
+            for i, future in enumerate(as_completed(futures), 1):
+                f.write(json.dumps(future.result(), ensure_ascii=False) + '\n')
+                f.flush()
+                if i % 10 == 0 or i == len(pending):
+                    elapsed = time.perf_counter() - start
+                    print(f'已完成{i}/{len(pending)}组，耗时{elapsed:.1f}秒，平均每组{elapsed / i:.2f}秒')
+    return [r for r in read_results(results_path) if r.get('data') == data]
+
+
+def rank_results(results: list, metric: str = 'total_pnl', ascending: bool = False) -> pd.DataFrame:
+    """
+    把结果按照目标指标排序，展开成一张表：每一行是一组参数，列为参数、回测统计和耗时。
+    :param results: run_sweep返回的结果
+    :param metric: 排序使用的回测统计指标，例如：total_pnl、max_drawdown、win_rate
+    :param ascending: 是否升序排列
+    :return: 排名表
+    """
+    rows = [{'trial_id': r['trial_id'], **r['params'],
+             **{f'stat_{k}': v for k, v in r['stats'].items()},
+             'trial_seconds': r['seconds'], 'pid': r['pid']} for r in results]
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df = df.sort_values(f'stat_{metric}', ascending=ascending, kind='stable').reset_index(drop=True)
+    df.index += 1
+    df.index.name = 'rank'
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='并行回测策略参数组合')
+    parser.add_argument('--ticks-dir', required=True, help='按列保存实时数据的目录')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int, default=3306)
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--database')
+    parser.add_argument('--start', help='从数据库读取实时数据的开始日期，格式为 %%Y-%%m-%%d')
+    parser.add_argument('--end', default=None, help='结束日期，默认为今天')
+    parser.add_argument('--mode', choices=('grid', 'random'), default='random')
+    parser.add_argument('--grid', default=None, help='网格搜索的JSON文件，参数名到候选值列表')
+    parser.add_argument('--trials', type=int, default=200, help='随机搜索的参数组合数量')
+    parser.add_argument('--refine', type=int, default=50, help='局部细化的参数组合数量')
+    parser.add_argument('--top', type=int, default=10, help='局部细化围绕的排名靠前的参数组合数量')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--metric', default='total_pnl')
+    parser.add_argument('--results', default='sweep_results.jsonl')
+    parser.add_argument('--output', default='sweep_ranking.csv')
+    args = parser.parse_args()
+
+    if args.host:
+        ticks = load_ticks(args.username, args.password, args.host, args.database, args.start, args.end, args.port)
+        save_ticks(ticks, args.ticks_dir)
+        print(f'已保存{len(ticks["time"])}个周期的实时数据到{args.ticks_dir}')
+
+    if args.mode == 'grid':
+        with open(args.grid, 'r', encoding='utf-8') as f:
+            trials = grid_trials(json.load(f))
+        results = run_sweep(args.ticks_dir, trials, args.results, args.workers)
+    else:
+        results = run_sweep(args.ticks_dir, random_trials(SEARCH_SPACE, args.trials, args.seed),
+                            args.results, args.workers)
+        if args.refine:
+            top = set(rank_results(results, args.metric)['trial_id'].head(args.top))
+            best = [r['params'] for r in results if r['trial_id'] in top]
+            results = run_sweep(args.ticks_dir, refine_trials(best, SEARCH_SPACE, args.refine, seed=args.seed),
+                                args.results, args.workers)
+
+    ranking = rank_results(results, args.metric)
+    ranking.to_csv(args.output, encoding='utf-8-sig')
+    print(ranking.head(args.top).to_string())
+    print(f'总回测耗时{ranking["trial_seconds"].sum():.1f}秒（所有进程合计），排名表已保存到{args.output}')
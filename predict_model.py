@@ -5,34 +5,53 @@
 - 数据预处理。
 - 划分特征和目标数据集。
 - 训练模型并返回最好的模型对象。
-- 使用模型进行预测。
+
+使用模型进行预测由predictor模块的预测器包（PredictorBundle、predict_one）完成。
 """
 
 " 第三方模块 "
+import numpy as np
 import pandas as pd
 import pymysql
 
-" 自定义模块 "
+" 内置模块 "
 from datetime import datetime, timedelta
 
+" 自定义模块 "
+from training_window import TrainingWindow
+from mysql_stream import read_sql_compact
+
+# 模型使用的特征列，训练和预测都按照这个顺序排列特征
+FEATURE_COLUMNS = ["新周期与上一周期的价差", "新周期五个当前价格的均值与上一周期五个当前价格的均值差",
+                   "新周期主流货币的价格均值与上一周期主流货币的价格均值差", "新周期bisSz与上一周期的bisSz差",
+                   "新周期askSz与上一周期的askSz差", "新周期24小时交易量与上一周期的24小时交易量差"]
+
 def get_data_from_mysql(host: str, username: str,
                         password: str,
                         database_name: str,
                         start_date_str: str,
-                        port: int = 3306) -> tuple:
+                        port: int = 3306,
+                        window: TrainingWindow = None,
+                        instIds: list = None) -> tuple:
     """
     从mysql数据库中获取用来提取特征集的数据集和目标集
+    多交易对策略引擎运行时（instIds不为空），从“日期多交易对实时数据”表中读取instIds的数据，结果多一列instId；
+    某一天没有多交易对实时数据表时（切换到多交易对策略引擎之前），读取这一天的单交易对实时数据表，这些数据属于instIds[0]
     :param host: 数据库地址
     :param username: 用户名
     :param password: 密码
     :param database_name: 数据库名称
     :param start_date_str: 开始日期
     :param port: 端口号
+    :param window: 训练数据集窗口，每加载一天的数据就按照窗口策略裁剪一次，默认不做限制
+    :param instIds: 多交易对策略引擎交易的交易对列表，为None时只读取单交易对实时数据表
     :return: 提取特征集的数据集和目标集
     """
     date_format = "%Y-%m-%d"
     attr_re_df = None
     target_re_df = None
+    window = window or TrainingWindow()
+    start_date_str = window.start_date(start_date_str)
 
     while True:
         # 修正此处，应该是datetime.strptime，拼写错误已修正
@@ -44,23 +63,32 @@ def get_data_from_mysql(host: str, username: str,
                                  port=port) as client:
                 # 查询语句
                 try:
-                    attr_sql = f"select 当前时间,当前价格,上一次价格,上一次五个当前价格的平均值,当前五个当前价格的平均值,上一次主流货币当前价格标准化均值,当前主流货币当前价格标准化均值,上一次bidSz,当前bidSz,上一次askSz,当前askSz,上一次24小时交易量,当前24小时交易量,交易类型 from {table_name} where 交易类型 in (-1,1)" # 特征标签查询sql
-                    target_sql = f"select 当前时间,交易类型 from {table_name} where 交易类型 in (-2,2,3)" # 目标标签查询sql
+                    if instIds:
+                        try:
+                            attr_temp_df, target_temp_df = read_day(
+                                client, f"{table_date_name}多交易对实时数据", instIds=instIds)
+                        except pymysql.err.ProgrammingError:  # 这一天还没有多交易对实时数据表
+                            attr_temp_df, target_temp_df = read_day(client, table_name)
+                            attr_temp_df.insert(0, "instId", instIds[0])
+                            target_temp_df.insert(0, "instId", instIds[0])
+                    else:
+                        attr_temp_df, target_temp_df = read_day(client, table_name)
 
                     # 获取特征值
-                    attr_temp_df = pd.read_sql(attr_sql, con=client)
                     if attr_re_df is None:
                         attr_re_df = attr_temp_df.copy()
                     else:
                         attr_re_df = pd.concat([attr_re_df, attr_temp_df], axis=0, ignore_index=True)
 
                     # 获取目标值
-                    target_temp_df = pd.read_sql(target_sql, con=client)
                     if target_re_df is None:
                         target_re_df = target_temp_df.copy()
                     else:
                         target_re_df = pd.concat([target_re_df, target_temp_df], axis=0, ignore_index=True)
 
+                    # 按照窗口策略裁剪，保证内存中的数据量不超过窗口大小
+                    attr_re_df, target_re_df = window.trim(attr_re_df, target_re_df)
+
                     next_date_object = start_date_object + timedelta(days=1)
                     next_date_str = next_date_object.strftime(date_format)
                     start_date_str = next_date_str
@@ -71,51 +99,81 @@ def get_data_from_mysql(host: str, username: str,
         except Exception as e:
             raise e
 
+def read_day(client: pymysql.connections.Connection, table_name: str, instIds: list = None) -> tuple:
+    """
+    读取一张实时数据表中的开仓记录和平仓记录
+    :param client: pymysql的数据库连接
+    :param table_name: 实时数据表名
+    :param instIds: 多交易对实时数据表中需要读取的交易对，为None时表示单交易对实时数据表（没有instId列）
+    :return: 开仓记录（交易类型为1或-1）和平仓记录（交易类型为-2、2、3）
+    """
+    columns = "当前时间,当前价格,上一次价格,上一次五个当前价格的平均值,当前五个当前价格的平均值,上一次主流货币当前价格标准化均值,当前主流货币当前价格标准化均值,上一次bidSz,当前bidSz,上一次askSz,当前askSz,上一次24小时交易量,当前24小时交易量,交易类型"
+    target_columns = "当前时间,交易类型"
+    condition = ""
+    if instIds:
+        columns, target_columns = f"instId,{columns}", f"instId,{target_columns}"
+        condition = f" and instId in {client.escape(tuple(instIds))}"
+
+    attr_sql = f"select {columns} from {table_name} where 交易类型 in (-1,1){condition}"  # 特征标签查询sql
+    target_sql = f"select {target_columns} from {table_name} where 交易类型 in (-2,2,3){condition}"  # 目标标签查询sql
+    return (read_sql_compact(client, attr_sql, dtypes={"交易类型": "int8"}),
+            read_sql_compact(client, target_sql, dtypes={"交易类型": "int8"}))
+
+
 def data_preprocessing(data: pd.DataFrame, target: pd.DataFrame) -> tuple:
     """
     数据预处理函数
+    每一条开仓记录（交易类型为1或-1）按照当前时间与它之后最近的一条平仓记录（交易类型为-2、2、3）进行as-of连接，
+    得到这笔开仓的盈亏结果。多条开仓记录对应同一次平仓时，它们都会得到这次平仓的结果；之后还没有平仓的开仓记录会被丢弃。
+    特征列一次性向量化计算，并使用float32保存以减少内存占用。
     :param data:  包含特征的数据集
     :param target:   包含目标变量的数据集
-    :return:   返回两个dframe，一个包含没有进行标准化的特征集（attr_data，这个数据集可用在方法：data_to_df作为orignal_data的参数）；一个包含标准化的特征和目标变量合并集（all_df，这个数据集可用在方法：divide_feature_and_target作为data的参数）
+    :return:   返回两个dframe，一个包含没有进行标准化的特征集（attr_data，这个数据集可用在方法：predictor.build_predictor中计算标准化参数）；一个包含标准化的特征和目标变量合并集（all_df，这个数据集可用在方法：divide_feature_and_target作为data的参数）
     """
     if data is None or target is None:
         return None, None
 
-    if len(data) == len(target) + 1:  # 删除正在交易，还没有确定是否盈亏的记录
-        # 获取索引的最后一个值（假设是整数索引）
-        last_index = data.index[-1]
-        # 使用drop方法删除最后一行
-        data = data.drop(last_index)
-
-    target = target.rename(columns={"交易类型": "盈亏情况"})
-    # 新建特征列
-    data["新周期与上一周期的价差"] = data["当前价格"] - data["上一次价格"]
-    data["新周期五个当前价格的均值与上一周期五个当前价格的均值差"] = data["当前五个当前价格的平均值"] - data[
-        "上一次五个当前价格的平均值"]
-    data["新周期主流货币的价格均值与上一周期主流货币的价格均值差"] = data["当前主流货币当前价格标准化均值"] - data[
-        "上一次主流货币当前价格标准化均值"]
-    data["新周期bisSz与上一周期的bisSz差"] = data["当前bidSz"] - data["上一次bidSz"]
-    data["新周期askSz与上一周期的askSz差"] = data["当前24小时交易量"] - data["上一次24小时交易量"]
-    data["新周期24小时交易量与上一周期的24小时交易量差"] = data["当前24小时交易量"] - data["上一次24小时交易量"]
-
-    # 提取特征列
-    attr_data = data[["新周期与上一周期的价差", "新周期五个当前价格的均值与上一周期五个当前价格的均值差",
-                      "新周期主流货币的价格均值与上一周期主流货币的价格均值差", "新周期bisSz与上一周期的bisSz差",
-                      "新周期askSz与上一周期的askSz差", "新周期24小时交易量与上一周期的24小时交易量差"]]
-
-    # 标准化
-    for col in attr_data.columns:
-        mean_value = attr_data[col].mean()
-        std_value = attr_data[col].std()
-        attr_data[col] = (attr_data[col] - mean_value) / std_value
-
-    all_df = pd.concat([attr_data, target["盈亏情况"]], axis=1)
-
-    all_df.loc[all_df['盈亏情况'].isin([-2, 2]), '盈亏情况'] = 1  # 1表示获利
-    all_df.loc[all_df['盈亏情况'] == 3, '盈亏情况'] = 0  # 表示亏损
+    labeled = label_entries(data, target)
+    if labeled.empty:
+        return None, None
+
+    # 新建特征列：当前周期的值减去上一周期的值，所有特征列一次计算完成
+    current = labeled[["当前价格", "当前五个当前价格的平均值", "当前主流货币当前价格标准化均值", "当前bidSz",
+                       "当前askSz", "当前24小时交易量"]].to_numpy(dtype=np.float32)
+    before = labeled[["上一次价格", "上一次五个当前价格的平均值", "上一次主流货币当前价格标准化均值", "上一次bidSz",
+                      "上一次askSz", "上一次24小时交易量"]].to_numpy(dtype=np.float32)
+    attr_data = pd.DataFrame(current - before, columns=FEATURE_COLUMNS)
+
+    # 标准化，attr_data需要保持没有标准化的状态返回，所以标准化的结果放在新的DataFrame中
+    std_attr_data = ((attr_data - attr_data.mean()) / attr_data.std()).astype(np.float32)
+
+    all_df = std_attr_data
+    # 1表示获利（止盈平仓：-2,2），0表示亏损（止损平仓：3）
+    all_df["盈亏情况"] = labeled["盈亏情况"].isin([-2, 2]).to_numpy().astype(np.int8)
 
     return attr_data, all_df
 
+
+def label_entries(data: pd.DataFrame, target: pd.DataFrame) -> pd.DataFrame:
+    """
+    给每一条开仓记录找到它之后最近的一条平仓记录（as-of连接）。有instId列时只匹配同一个交易对的平仓记录。
+    :param data: 开仓记录，必须包含当前时间列
+    :param target: 平仓记录，包含当前时间和交易类型两列（多交易对时还有instId列）
+    :return: 带有盈亏情况列（平仓记录的交易类型）的开仓记录，按当前时间排序，没有平仓结果的记录已经被删除
+    """
+    by = "instId" if "instId" in data.columns else None
+    entries = data.assign(当前时间=pd.to_datetime(data["当前时间"])).sort_values("当前时间", kind="stable")
+    outcomes = pd.DataFrame({"平仓时间": pd.to_datetime(target["当前时间"]),
+                             "盈亏情况": target["交易类型"].to_numpy(dtype=np.int8)})
+    if by:
+        # 不同日期读取的category取值不同，统一成字符串再按交易对连接
+        entries["instId"] = entries["instId"].astype(str)
+        outcomes["instId"] = target["instId"].astype(str).to_numpy()
+    outcomes = outcomes.sort_values("平仓时间", kind="stable")
+
+    labeled = pd.merge_asof(entries, outcomes, left_on="当前时间", right_on="平仓时间", by=by, direction="forward")
+    return labeled[labeled["盈亏情况"].notna()].reset_index(drop=True)
+
 def divide_feature_and_target(data: pd.DataFrame, test_size: float = 0.2) -> tuple:
     """
     划分特征集和目标集
@@ -125,9 +183,7 @@ def divide_feature_and_target(data: pd.DataFrame, test_size: float = 0.2) -> tup
     """
     # 划分特征集和目标集
     target = data["盈亏情况"]
-    attr = data[["新周期与上一周期的价差", "新周期五个当前价格的均值与上一周期五个当前价格的均值差",
-                 "新周期主流货币的价格均值与上一周期主流货币的价格均值差", "新周期bisSz与上一周期的bisSz差"
-        , "新周期askSz与上一周期的askSz差", "新周期24小时交易量与上一周期的24小时交易量差"]]
+    attr = data[FEATURE_COLUMNS]
 
     # 划分训练集和测试集
     from sklearn.model_selection import train_test_split
@@ -136,14 +192,14 @@ def divide_feature_and_target(data: pd.DataFrame, test_size: float = 0.2) -> tup
     return X_train, X_test, y_train, y_test
 
 def train_model(X_train: pd.DataFrame, y_train: pd.DataFrame, X_test: pd.DataFrame,
-                y_test: pd.DataFrame) -> object:
+                y_test: pd.DataFrame) -> tuple:
     """
     会依次训练多个模型，根据评估结果返回最好的模型对象
     :param X_train: 训练集特征
     :param y_train: 训练集目标
     :param y_test:  测试集目标
     :param X_test:  测试集特征
-    :return: 评分最好的模型对象
+    :return: 评分最好的模型对象，以及它的评估指标字典（模型名称、准确率、训练样本数）
     """
     # 训练模型
     from sklearn.tree import DecisionTreeClassifier
@@ -158,6 +214,7 @@ def train_model(X_train: pd.DataFrame, y_train: pd.DataFrame, X_test: pd.DataFra
     # 训练模型，返回评估结果最好的模型对象
     best_model = None
     best_score = 0
+    best_name = None
     for model_name, model in models.items():  # 训练模型
         model.fit(X_train, y_train)
 
@@ -167,60 +224,8 @@ def train_model(X_train: pd.DataFrame, y_train: pd.DataFrame, X_test: pd.DataFra
         if accuracy > best_score:
             best_score = accuracy
             best_model = model
-    return best_model
-
+            best_name = model_name
 
-def predict(model: object, X: pd.DataFrame) -> bool:
-    """
-    使用训练好的模型对一条记录进行预测。
-    :param model: 训练好的模型
-    :param X: 待预测的记录
-    :return: True表示预测为获利，False表示预测为亏损
-    """
-    if model.predict(X)[0] == 1:
-        return True
-    else:
-        return False
-
-
-def data_to_df(orignal_data: pd.DataFrame, current_price: float, last_price: float,
-               current_five_current_data_average: float,
-               before_five_current_data_average: float, current_mean_normalized: float,
-               before_mean_normalized: float, current_bidSz: float, before_bidSz: float, current_askSz: float,
-               before_askSz: float, current_vol24h: float, before_vol24h: float) -> pd.DataFrame:
-    """
-    将一条数据转换为DataFrame，并进行标准化处理。
-    :param orignal_data: 原始特征集，没有进行标准化过的。
-    :param current_price: 当前价格。
-    :param last_price: 上一周期价格。
-    :param current_five_current_data_average: 当前周期五个当前价格的均值。
-    :param before_five_current_data_average: 上一周期五个当前价格的均值。
-    :param current_mean_normalized: 当前周期主流货币的价格均值。
-    :param before_mean_normalized: 上一周期主流货币的价格均值。
-    :param current_bidSz: 当前周期bisSz。
-    :param before_bidSz: 上一周期bisSz。
-    :param current_askSz: 当前周期askSz。
-    :param before_askSz: 上一周期askSz。
-    :param current_vol24h: 当前周期24小时交易量。
-    :param before_vol24h: 上一周期24小时交易量。
-    :return: 转换并标准化后的数据框架的最后一行，这是最新的符合交易的数据记录。需要标准化后返回给预测方法进行预测，如果交易的话，预测盈亏情况。
-    """
-    # 计算差值
-    data = pd.DataFrame({"新周期与上一周期的价差": [current_price - last_price],
-                         "新周期五个当前价格的均值与上一周期五个当前价格的均值差": [
-                             current_five_current_data_average - before_five_current_data_average],
-                         "新周期主流货币的价格均值与上一周期主流货币的价格均值差": [
-                             current_mean_normalized - before_mean_normalized],
-                         "新周期bisSz与上一周期的bisSz差": [float(current_bidSz) - float(before_bidSz)],
-                         "新周期askSz与上一周期的askSz差": [float(current_askSz) - float(before_askSz)],
-                         "新周期24小时交易量与上一周期的24小时交易量差": [float(current_vol24h) - float(before_vol24h)]})
-    # 将数据添加到DataFrame中
-    all_df = pd.concat([orignal_data, data], ignore_index=True)
-
-    # 标准化
-    for col in all_df.columns:
-        mean_value = all_df[col].mean()
-        std_value = all_df[col].std()
-        all_df[col] = (all_df[col] - mean_value) / std_value
-
-    return all_df.iloc[-1]
\ No newline at end of file
+    metrics = {'model_name': best_name, 'accuracy': float(best_score), 'train_size': len(X_train),
+               'test_size': len(X_test)}
+    return best_model, metrics
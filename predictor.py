@@ -0,0 +1,138 @@
+"""
+该模块定义了预测器包（PredictorBundle）。具体包括：
+
+- 一个不可变的预测器包，打包了模型对象、标准化参数、特征列名和版本号。
+- 从训练结果或者模型仓库中的记录构建预测器包。
+- 根据一个周期的行情数据计算特征向量。
+- 树模型会被编译成NumPy节点数组（tree_inference），预测时不经过pandas；不支持的模型继续使用sklearn进行预测。
+
+模型训练线程训练出新模型后，构建一个新的预测器包，然后通过一次引用赋值（global_vars.predictor = bundle）发布出去。
+策略线程每个周期只读取一次global_vars.predictor，之后的所有预测都使用这一个对象，
+所以模型和标准化参数永远是配套的，不会出现新特征集配旧模型的情况，读取时也不需要加锁。
+"""
+
+" 内置模块 "
+from typing import NamedTuple
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+
+" 自定义模块 "
+from tree_inference import CompiledTreeModel, compile_model, check_parity
+from inference_monitor import build_reference
+
+# 构建预测器包时，用来校验编译后的模型与sklearn预测结果是否一致的最多记录数
+PARITY_SAMPLE_SIZE = 500
+
+
+class PredictorBundle(NamedTuple):
+    """
+    不可变的预测器包，发布后不会再被修改。
+    """
+    version: int  # 模型版本号，与模型仓库中的版本号一致
+    model: object  # 训练好的模型对象
+    features: tuple  # 特征列名，顺序与训练时一致
+    mean: np.ndarray  # 没有标准化的特征集每一列的均值
+    std: np.ndarray  # 没有标准化的特征集每一列的标准差
+    compiled: CompiledTreeModel = None  # 编译后的树模型，为None时使用sklearn进行预测
+    reference: dict = None  # 训练集特征的参照分布，用于检测实时特征的漂移
+
+
+def build_predictor(version: int, model: object, attr_df: pd.DataFrame) -> PredictorBundle:
+    """
+    根据训练结果构建预测器包。
+    :param version: 模型版本号
+    :param model: 训练好的模型对象
+    :param attr_df: 没有进行标准化的特征数据集
+    :return: 预测器包
+    """
+    return build_predictor_from_scaler(version, model, tuple(attr_df.columns),
+                                       attr_df.mean().to_numpy(), attr_df.std().to_numpy(),
+                                       attr_df.tail(PARITY_SAMPLE_SIZE), build_reference(attr_df))
+
+
+def build_predictor_from_registry(entry: dict) -> PredictorBundle:
+    """
+    根据模型仓库中加载出来的记录构建预测器包。以前的版本保存的是整个训练集（attr_df），加载时从中计算参照分布和校验样本。
+    :param entry: ModelRegistry.load返回的字典
+    :return: 预测器包
+    """
+    sample, reference = entry.get('parity_sample'), entry.get('reference')
+    attr_df = entry.get('attr_df')
+    if attr_df is not None:
+        sample, reference = attr_df.tail(PARITY_SAMPLE_SIZE), build_reference(attr_df[list(entry['features'])])
+    return build_predictor_from_scaler(entry['version'], entry['model'], tuple(entry['features']),
+                                       entry['scaler']['mean'], entry['scaler']['std'], sample, reference)
+
+
+def _report_parity_fallback(version: int, model_name: str, rows: int) -> None:
+    """
+    编译后的模型与sklearn的预测结果不一致、改用sklearn预测时，记录日志和监控指标。
+    """
+    import global_vars  # global_vars导入了本模块，所以在函数中导入
+
+    global_vars.lq.push(('预测器-编译模型', 'Warning',
+                         f'模型版本{version}（{model_name}）编译后的预测结果与sklearn在{rows}条记录上不一致，改用sklearn预测'))
+    global_vars.metrics.counter('compiled_model_fallbacks_total', '编译后的树模型因为与sklearn预测结果不一致而被放弃的次数',
+                                ('model',)).inc(model_name)
+
+
+def build_predictor_from_scaler(version: int, model: object, features: tuple, mean: np.ndarray,
+                                std: np.ndarray, parity_sample: pd.DataFrame = None,
+                                reference: dict = None) -> PredictorBundle:
+    """
+    根据标准化参数构建预测器包，标准差为0的列按1处理，避免标准化时出现零除。
+    如果模型可以编译，会用parity_sample中的记录（没有标准化的特征，最多PARITY_SAMPLE_SIZE条）校验编译后的模型与sklearn的预测结果，
+    不一致时放弃编译后的模型，并记录日志和监控指标。
+    reference是build_reference返回的训练集特征的参照分布，用于漂移检测。
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    std = np.asarray(std, dtype=np.float64).copy()
+    std[(std == 0) | np.isnan(std)] = 1.0
+    mean.setflags(write=False)
+    std.setflags(write=False)
+
+    compiled = compile_model(model)
+    if compiled is not None and parity_sample is not None:
+        sample = parity_sample[list(features)].tail(PARITY_SAMPLE_SIZE)
+        sample = pd.DataFrame((sample.to_numpy(dtype=np.float64) - mean) / std, columns=list(features))
+        if not check_parity(compiled, model, sample):
+            compiled = None
+            _report_parity_fallback(version, type(model).__name__, len(sample))
+
+    return PredictorBundle(version=version, model=model, features=features, mean=mean, std=std, compiled=compiled,
+                           reference=reference)
+
+
+def feature_vector(current_price: float, last_price: float,
+                   current_five_current_data_average: float, before_five_current_data_average: float,
+                   current_mean_normalized: float, before_mean_normalized: float,
+                   current_bidSz: float, before_bidSz: float,
+                   current_askSz: float, before_askSz: float,
+                   current_vol24h: float, before_vol24h: float) -> np.ndarray:
+    """
+    计算一个周期的特征向量，顺序与predict_model.FEATURE_COLUMNS一致。
+    :return: 没有进行标准化的特征向量
+    """
+    return np.array([current_price - last_price,
+                     float(current_five_current_data_average) - float(before_five_current_data_average),
+                     float(current_mean_normalized) - float(before_mean_normalized),
+                     float(current_bidSz) - float(before_bidSz),
+                     float(current_askSz) - float(before_askSz),
+                     float(current_vol24h) - float(before_vol24h)], dtype=np.float64)
+
+
+def predict_one(predictor: PredictorBundle, x: np.ndarray) -> bool:
+    """
+    使用预测器包对一条没有标准化的特征向量进行预测。
+    :param predictor: 预测器包
+    :param x: 没有标准化的特征向量
+    :return: True表示预测为获利，False表示预测为亏损
+    """
+    z = (x - predictor.mean) / predictor.std
+    if predictor.compiled is not None and not np.isnan(z).any():
+        return bool(predictor.compiled.predict(z) == 1)
+
+    X = pd.DataFrame([z], columns=list(predictor.features))
+    return bool(predictor.model.predict(X)[0] == 1)
@@ -0,0 +1,167 @@
+"""
+该模块定义了交易所端止损止盈单的管理器（ProtectiveOrders），代替策略线程每个周期调用MyOkx.close_positions的止损方式。
+
+原来的止损方式每个周期都要请求一次持仓，在本地比较uplRatio和limit_uplRatio后再下市价单平仓，止损只能在周期到来时发生
+（周期间隔2到100秒）。这里在开仓后给整个仓位下一个交易所端的止损止盈单（策略委托，closeFraction=1），价格达到触发价格时
+由交易所立即平仓。具体包括：
+
+- 止损触发价格由开仓均价、杠杆倍数和limit_uplRatio计算：未实现收益率 = (价格 / 开仓均价 - 1) * 杠杆倍数 * 方向，
+  收益率等于limit_uplRatio时的价格就是止损触发价格。
+- 止盈触发价格对应原来“涨幅超过25%或者跌幅超过25%就止盈”的逻辑：昨收盘价 * (1 ± take_profit)。
+- 每个周期用本周期已经获取到的持仓同步一次：没有止损止盈单时下单，加仓后开仓均价变化或者新的一天昨收盘价变化时修改触发价格，
+  仓位方向改变时撤单重下。触发价格没有变化时不发送任何请求。
+- 之前有止损止盈单的仓位在两个周期之间消失了，说明止损止盈单已经被交易所触发，sync()返回被平掉的仓位方向，由策略线程统计盈亏。
+  程序自己的订单平掉仓位（止盈、反向开仓）后调用cancel()或者follow()，不会被当作交易所触发。
+"""
+
+" 内置模块 "
+import threading
+
+" 自定义模块 "
+import global_vars
+
+
+class ProtectiveOrders:
+    """
+    一个交易对的交易所端止损止盈单。
+    """
+
+    def __init__(self, o, instId: str, leverage: int, limit_uplRatio: float, take_profit: float = 0.25,
+                 tdMode: str = 'cross', tolerance: float = 0.0001):
+        """
+        :param o: MyOkx（或者提供相同方法的对象）
+        :param instId: 交易对
+        :param leverage: 杠杆倍数
+        :param limit_uplRatio: 止损的未实现收益率，例如-0.5
+        :param take_profit: 止盈的涨跌幅（相对昨收盘价），为None时只设止损
+        :param tdMode: 交易模式
+        :param tolerance: 触发价格的相对变化超过tolerance时才修改止损止盈单
+        """
+        self.o = o
+        self.instId = instId
+        self.leverage = leverage
+        self.limit_uplRatio = limit_uplRatio
+        self.take_profit = take_profit
+        self.tdMode = tdMode
+        self.tolerance = tolerance
+
+        self.algoId: str | None = None  # 当前的止损止盈单
+        self.direction = 0  # 被保护的仓位方向，1为多仓，-1为空仓
+        self.sl_px: float | None = None
+        self.tp_px: float | None = None
+        self._lock = threading.Lock()
+
+        self.placed = 0
+        self.amended = 0
+        self.cancelled = 0
+        self.triggered = 0
+
+    def targets(self, position: dict, reference_px: float) -> tuple:
+        """
+        :param position: 持仓信息，需要pos和avgPx
+        :param reference_px: 昨收盘价
+        :return: (仓位方向, 止损触发价格, 止盈触发价格)
+        """
+        direction = 1 if float(position['pos']) > 0 else -1
+        avg_px = float(position['avgPx'])
+        sl_px = avg_px * (1 + direction * self.limit_uplRatio / self.leverage)
+        tp_px = reference_px * (1 + direction * self.take_profit) if self.take_profit and reference_px else None
+        return direction, sl_px, tp_px
+
+    def adopt(self) -> None:
+        """
+        程序启动时接管之前下的止损止盈单，多余的撤销，避免重复下单。
+        """
+        pending = self.o.get_pending_tpsl_orders(self.instId) or []
+        with self._lock:
+            if not pending:
+                return
+            first = pending[0]
+            self.algoId = first['algoId']
+            self.direction = 1 if first['side'] == 'sell' else -1
+            self.sl_px = float(first['slTriggerPx']) if first.get('slTriggerPx') else None
+            self.tp_px = float(first['tpTriggerPx']) if first.get('tpTriggerPx') else None
+        if len(pending) > 1:
+            self.o.cancel_algo_orders(self.instId, [order['algoId'] for order in pending[1:]])
+        global_vars.lq.push(('止损止盈单-接管', 'Info', f'{self.instId}接管止损止盈单{self.algoId}'))
+
+    def _moved(self, new: float | None, old: float | None) -> bool:
+        if new is None or old is None:
+            return new != old
+        return abs(new - old) > self.tolerance * old
+
+    def sync(self, position: dict | None, reference_px: float) -> int:
+        """
+        用最新的持仓同步止损止盈单。
+        :param position: 这个交易对的持仓，没有持仓时为None
+        :param reference_px: 昨收盘价，用来计算止盈触发价格
+        :return: 止损止盈单已经被交易所触发（仓位已经被平掉）时返回被平掉的仓位方向（1为多仓，-1为空仓），否则返回0
+        """
+        with self._lock:
+            if position is None or float(position['pos']) == 0:
+                if self.algoId is None:
+                    return 0
+                direction = self.direction
+                global_vars.lq.push(('止损止盈单-触发', 'Info', f'{self.instId}的止损止盈单{self.algoId}已触发'))
+                self._clear()
+                self.triggered += 1
+                return direction
+
+            direction, sl_px, tp_px = self.targets(position, reference_px)
+            if self.algoId is not None and direction != self.direction:
+                self._cancel()
+
+            if self.algoId is not None and (self._moved(sl_px, self.sl_px) or self._moved(tp_px, self.tp_px)):
+                if self.o.amend_tpsl_order(self.instId, self.algoId, sl_px, tp_px):
+                    self.sl_px, self.tp_px = sl_px, tp_px
+                    self.amended += 1
+                else:  # 修改失败（例如止损止盈单已经不存在），撤单重下
+                    global_vars.lq.push(('止损止盈单-修改', 'Error', f'{self.instId}修改止损止盈单失败，撤单重下'))
+                    self._cancel()
+
+            if self.algoId is None:
+                side = 'sell' if direction > 0 else 'buy'
+                algoId = self.o.place_tpsl_order(self.instId, side, self.tdMode, sl_px, tp_px)
+                if algoId is None:  # 下一个周期重试
+                    global_vars.lq.push(('止损止盈单-下单', 'Error', f'{self.instId}下止损止盈单失败'))
+                    return 0
+                self.algoId, self.direction, self.sl_px, self.tp_px = algoId, direction, sl_px, tp_px
+                self.placed += 1
+                global_vars.lq.push(('止损止盈单-下单', 'Success',
+                                     f'{self.instId}下止损止盈单成功，止损价格：{sl_px}，止盈价格：{tp_px}'))
+            return 0
+
+    def follow(self, position: dict | None, reference_px: float) -> None:
+        """
+        程序自己开仓之后，用重新获取的持仓同步止损止盈单。反向开仓正好平掉原来的仓位时只撤单，不算作被交易所触发。
+        :param position: 这个交易对开仓之后的持仓，没有持仓时为None
+        :param reference_px: 昨收盘价
+        """
+        if position is None or float(position['pos']) == 0:
+            self.cancel()
+        else:
+            self.sync(position, reference_px)
+
+    def cancel(self) -> None:
+        """
+        撤销当前的止损止盈单，程序自己平仓（例如区间计数器触发止盈）后调用。
+        """
+        with self._lock:
+            self._cancel()
+
+    def _cancel(self) -> None:
+        if self.algoId is not None:
+            self.o.cancel_algo_orders(self.instId, [self.algoId])  # 仓位被平掉后交易所会自动撤单，撤单失败不影响
+            self.cancelled += 1
+        self._clear()
+
+    def _clear(self) -> None:
+        self.algoId, self.direction, self.sl_px, self.tp_px = None, 0, None, None
+
+    def snapshot(self) -> dict:
+        """
+        :return: 止损止盈单的状态和统计信息
+        """
+        return {'algoId': self.algoId, 'direction': self.direction, 'sl_px': self.sl_px, 'tp_px': self.tp_px,
+                'placed': self.placed, 'amended': self.amended, 'cancelled': self.cancelled,
+                'triggered': self.triggered}
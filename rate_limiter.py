@@ -0,0 +1,200 @@
+"""
+该模块定义了所有访问Okx的代码共用的限流器（RateLimiter）。策略线程、主流币行情、每次下单前的set_leverage、close_positions、
+get_positions_history、sava_all_data_to_mysql补数据以及getdata中ccxt的循环都会访问Okx，以前互相不知道对方用了多少请求次数，
+行情剧烈波动、周期间隔缩短到2到4秒时可能触发Okx的限速。具体包括：
+
+- 按照Okx每个接口的限速（例如行情接口每2秒20次、持仓接口每2秒10次、下单接口每2秒60次）分组，每组一个令牌桶，
+  为了留出余量，默认只使用限速的safety倍（80%）。没有配置的接口使用默认的限速。
+- 优先级：下单 > 持仓 > 行情 > 补数据。令牌不够时按优先级排队，同一优先级先到先得；优先级越低，桶里需要保留的令牌越多
+  （补数据只在桶里的令牌超过一半时才能取令牌），避免补数据把令牌用完之后下单还要排队。
+- 每个接口有默认的优先级，也可以用priority()在一段代码中临时指定（例如补数据）。
+- 记录每次请求等待令牌的时间，由myokx.okx_call写入监控指标。
+"""
+
+" 内置模块 "
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# 优先级，数字越小越优先
+PRIORITY_ORDER = 0  # 下单、撤单、设置杠杆
+PRIORITY_POSITION = 1  # 持仓、账户余额、历史持仓
+PRIORITY_MARKET = 2  # 行情、合约信息
+PRIORITY_BACKFILL = 3  # 补历史数据
+
+PRIORITY_NAMES = {PRIORITY_ORDER: 'order', PRIORITY_POSITION: 'position', PRIORITY_MARKET: 'market',
+                  PRIORITY_BACKFILL: 'backfill'}
+
+# 每个优先级取令牌时，桶里至少需要保留的令牌占桶容量的比例
+DEFAULT_RESERVES = {PRIORITY_ORDER: 0.0, PRIORITY_POSITION: 0.0, PRIORITY_MARKET: 0.1, PRIORITY_BACKFILL: 0.5}
+
+# Okx每个接口的限速：接口 -> (窗口内的请求次数, 窗口长度（秒）, 默认优先级)
+OKX_LIMITS = {
+    '/api/v5/market/ticker': (20, 2.0, PRIORITY_MARKET),
+    '/api/v5/market/tickers': (20, 2.0, PRIORITY_MARKET),
+    '/api/v5/market/history-candles': (20, 2.0, PRIORITY_BACKFILL),
+    '/api/v5/public/instruments': (20, 2.0, PRIORITY_MARKET),
+    '/api/v5/account/balance': (10, 2.0, PRIORITY_POSITION),
+    '/api/v5/account/positions': (10, 2.0, PRIORITY_POSITION),
+    '/api/v5/account/positions-history': (10, 2.0, PRIORITY_POSITION),
+    '/api/v5/account/set-leverage': (20, 2.0, PRIORITY_ORDER),
+    '/api/v5/trade/order': (60, 2.0, PRIORITY_ORDER),
+    '/api/v5/trade/order-algo': (20, 2.0, PRIORITY_ORDER),
+    '/api/v5/trade/amend-algos': (20, 2.0, PRIORITY_ORDER),
+    '/api/v5/trade/cancel-algos': (20, 2.0, PRIORITY_ORDER),
+    '/api/v5/trade/orders-algo-pending': (20, 2.0, PRIORITY_POSITION),
+}
+
+# 没有配置的接口使用的限速
+DEFAULT_LIMIT = (10, 2.0, PRIORITY_MARKET)
+
+
+class TokenBucket:
+    """
+    一个带优先级排队的令牌桶，线程安全。
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶的容量
+        :param clock: 时钟函数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self._cond = threading.Condition()
+        self._waiters = []  # (优先级, 序号)组成的小顶堆，堆顶是下一个可以取令牌的请求
+        self._seq = itertools.count()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int = PRIORITY_MARKET, reserve: float = 0.0) -> float:
+        """
+        取一个令牌，令牌不够或者前面还有更优先的请求时等待。
+        :param priority: 优先级，数字越小越优先
+        :param reserve: 取令牌后桶里至少需要剩下的令牌数
+        :return: 等待的时间（秒）
+        """
+        start = self.clock()
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry:
+                        shortage = 1 + reserve - self.tokens
+                        if shortage <= 0:
+                            self.tokens -= 1
+                            heapq.heappop(self._waiters)
+                            self._cond.notify_all()  # 让下一个请求成为堆顶
+                            return self.clock() - start
+                        self._cond.wait(shortage / self.rate)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+
+
+class RateLimiter:
+    """
+    按接口分组的限流器，global_vars.rate_limiter是所有访问Okx的代码共用的实例。
+    """
+
+    def __init__(self, limits: dict = None, default_limit: tuple = DEFAULT_LIMIT, safety: float = 0.8,
+                 reserves: dict = None, clock=time.monotonic):
+        """
+        :param limits: 接口 -> (窗口内的请求次数, 窗口长度（秒）, 默认优先级)，默认为OKX_LIMITS
+        :param default_limit: 没有配置的接口使用的限速
+        :param safety: 只使用限速的多少倍，留出余量
+        :param reserves: 每个优先级取令牌时桶里至少需要保留的令牌占桶容量的比例，默认为DEFAULT_RESERVES
+        :param clock: 时钟函数
+        """
+        self.limits = dict(OKX_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self.safety = safety
+        self.reserves = {**DEFAULT_RESERVES, **(reserves or {})}
+        self.clock = clock
+        self.enabled = True
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.requests = {}  # 接口 -> 请求次数
+        self.throttled = {}  # 接口 -> 需要等待令牌的请求次数
+        self.waited = {}  # 接口 -> 等待令牌的总时间（秒）
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            count, window, _ = self.limits.get(endpoint, self.default_limit)
+            capacity = max(1.0, count * self.safety)
+            with self._lock:
+                bucket = self._buckets.setdefault(endpoint, TokenBucket(capacity / window, capacity, self.clock))
+        return bucket
+
+    def default_priority(self, endpoint: str) -> int:
+        """
+        :return: 接口的默认优先级
+        """
+        return self.limits.get(endpoint, self.default_limit)[2]
+
+    def current_priority(self, endpoint: str) -> int:
+        """
+        :return: 当前线程访问这个接口的优先级：priority()指定的优先级，没有指定时为接口的默认优先级
+        """
+        priority = getattr(self._local, 'priority', None)
+        return self.default_priority(endpoint) if priority is None else priority
+
+    @contextmanager
+    def priority(self, priority: int):
+        """
+        在with语句块中，当前线程的所有请求都使用指定的优先级，例如补数据时使用PRIORITY_BACKFILL。
+        :param priority: 优先级
+        """
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def acquire(self, endpoint: str, priority: int = None) -> float:
+        """
+        访问一个接口之前调用，令牌不够时等待。
+        :param endpoint: 接口路径，例如'/api/v5/trade/order'
+        :param priority: 优先级，为None时使用current_priority(endpoint)
+        :return: 等待的时间（秒）
+        """
+        if not self.enabled:
+            return 0.0
+        priority = self.current_priority(endpoint) if priority is None else priority
+        bucket = self._bucket(endpoint)
+        waited = bucket.acquire(priority, self.reserves.get(priority, 0.0) * bucket.capacity)
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if waited > 0.001:
+                self.throttled[endpoint] = self.throttled.get(endpoint, 0) + 1
+                self.waited[endpoint] = self.waited.get(endpoint, 0.0) + waited
+        return waited
+
+    def snapshot(self) -> dict:
+        """
+        :return: 每个接口的请求次数、需要等待的次数、等待的总时间和桶里剩下的令牌数
+        """
+        with self._lock:
+            return {endpoint: {'requests': count, 'throttled': self.throttled.get(endpoint, 0),
+                               'waited': self.waited.get(endpoint, 0.0),
+                               'tokens': self._buckets[endpoint].tokens if endpoint in self._buckets else None}
+                    for endpoint, count in self.requests.items()}
@@ -8,7 +8,8 @@ import time
 " 第三方模块 "
 import global_vars
 from mymail import send_email
-from mysqldata import real_time_data
+from mysqldata import real_time_data, multi_real_time_data, tick_timing_data
+from metrics_thread import timed_flush
 
 
 def real_time_data_manager_thread(host: str, port: int, username: str, password: str, database: str,
@@ -18,6 +19,9 @@ def real_time_data_manager_thread(host: str, port: int, username: str, password:
     实时数据管理线程，负责批处理实时数据队列中的数据并保存到MySQL数据库中。
 
     该函数周期性地检查全局变量 `global_vars.r_d` 中的实时数据队列，并将队列中的数据批量写入到MySQL数据库中。
+    多交易对策略引擎运行时，还会把 `global_vars.m_r_d` 中带instId的实时数据写入 `global_vars.multi_data_table_name` 表中，
+    所有交易对共用这一个写入线程和这一张表。
+    策略线程启用分阶段计时时，还会把 `global_vars.t_r_d` 中的周期耗时数据写入 `global_vars.timing_table_name` 表中。
     如果遇到任何错误，它会发送邮件通知并记录日志。
 
     参数：
@@ -45,11 +49,29 @@ def real_time_data_manager_thread(host: str, port: int, username: str, password:
             if global_vars.s_finished_event:  # 事件对象被设置，说明s进程结束
 
                 # 确保r_d的数据被完全写入数据库
-                real_time_data(global_vars.r_d, host, port, username, password, database, global_vars.data_table_name)
+                if global_vars.r_d or not global_vars.multi_data_table_name:
+                    timed_flush('real_time', global_vars.r_d, real_time_data, global_vars.r_d, host, port, username,
+                                password, database, global_vars.data_table_name)
+                if global_vars.multi_data_table_name:
+                    timed_flush('multi_real_time', global_vars.m_r_d, multi_real_time_data, global_vars.m_r_d, host,
+                                port, username, password, database, global_vars.multi_data_table_name)
+                if global_vars.t_r_d and global_vars.timing_table_name:
+                    timed_flush('tick_timing', global_vars.t_r_d, tick_timing_data, global_vars.t_r_d, host, port,
+                                username, password, database, global_vars.timing_table_name)
                 global_vars.lq.push(('实时数据管理线程-状态信息','info','实时数据管理线程结束运行'))
                 break
 
-            if real_time_data(global_vars.r_d, host, port, username, password, database, global_vars.data_table_name):
+            ok = True
+            if global_vars.r_d or not global_vars.multi_data_table_name:  # 只运行多交易对策略引擎时不创建单交易对的实时数据表
+                ok = timed_flush('real_time', global_vars.r_d, real_time_data, global_vars.r_d, host, port, username,
+                                 password, database, global_vars.data_table_name)
+            if ok and global_vars.multi_data_table_name:
+                ok = timed_flush('multi_real_time', global_vars.m_r_d, multi_real_time_data, global_vars.m_r_d, host,
+                                 port, username, password, database, global_vars.multi_data_table_name)
+            if ok and global_vars.t_r_d and global_vars.timing_table_name:
+                ok = timed_flush('tick_timing', global_vars.t_r_d, tick_timing_data, global_vars.t_r_d, host, port,
+                                 username, password, database, global_vars.timing_table_name)
+            if ok:
                 time.sleep(6 * 60)
             else:
                 send_email(sender, receiver, sender_password, subject='来自okx自动化策略程序的运行错误的提醒:',
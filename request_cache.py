@@ -0,0 +1,182 @@
+"""
+该模块定义了Okx只读请求的合并（SingleFlight）和短时缓存（RequestCache）。策略线程一个周期内会多次请求同样的数据：
+交易ETH时主流币均值又请求一次ETH的行情，下单前后多次获取持仓，每次下单都获取一次合约信息；多个线程也可能在同一时刻请求
+同样的数据。具体包括：
+
+- SingleFlight：同一个请求（接口和参数都相同）正在进行时，其他线程不再发出请求，而是等待这一次请求的结果（或者异常）。
+- RequestCache：按接口配置缓存时间（例如行情250毫秒、持仓1秒、合约信息60秒），缓存时间内的重复请求直接返回上一次成功的结果，
+  不占用限流器的令牌。缓存时间为0的接口只合并同时进行的请求，不缓存。
+- 写操作（下单、设置杠杆、止损止盈单的下单/修改/撤单）完成后，使受影响的接口（持仓、余额、未完成的止损止盈单）的缓存失效，
+  之后的请求一定会重新访问Okx；失效之前已经发出的请求的结果也不会被缓存或者共享给失效之后的请求。
+- 没有配置的接口不经过缓存，写操作永远不会被合并。
+
+由myokx.okx_call使用，命中、未命中和共享正在进行的请求的次数由okx_call记录到监控指标。
+"""
+
+" 内置模块 "
+import threading
+import time
+
+# 只读接口的缓存时间（秒），为0时只合并同时进行的请求
+DEFAULT_TTLS = {
+    '/api/v5/market/ticker': 0.25,
+    '/api/v5/market/tickers': 0.25,
+    '/api/v5/public/instruments': 60.0,
+    '/api/v5/account/positions': 1.0,
+    '/api/v5/account/balance': 1.0,
+    '/api/v5/trade/orders-algo-pending': 1.0,
+    '/api/v5/account/positions-history': 0.0,
+    '/api/v5/market/history-candles': 0.0,
+}
+
+# 写操作 -> 完成后需要使缓存失效的接口
+DEFAULT_INVALIDATIONS = {
+    '/api/v5/trade/order': ('/api/v5/account/positions', '/api/v5/account/balance',
+                            '/api/v5/trade/orders-algo-pending', '/api/v5/account/positions-history'),
+    '/api/v5/account/set-leverage': ('/api/v5/account/positions', '/api/v5/account/balance'),
+    '/api/v5/trade/order-algo': ('/api/v5/trade/orders-algo-pending',),
+    '/api/v5/trade/amend-algos': ('/api/v5/trade/orders-algo-pending',),
+    '/api/v5/trade/cancel-algos': ('/api/v5/trade/orders-algo-pending',),
+}
+
+
+def request_key(func, args: tuple, kwargs: dict) -> tuple:
+    """
+    :return: 一次请求的键：绑定方法所属的对象（不同账户的AccountAPI不共享结果）、函数名和参数
+    """
+    owner = getattr(func, '__self__', None)
+    return id(owner), getattr(func, '__name__', repr(func)), repr(args), repr(sorted(kwargs.items()))
+
+
+class _Flight:
+    """
+    一次正在进行的请求。
+    """
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并同时进行的相同请求，线程安全。
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fetch) -> tuple:
+        """
+        同一个键的请求正在进行时等待它的结果，否则调用fetch。
+        :param key: 请求的键
+        :param fetch: 没有参数的函数，发出请求
+        :return: (结果, 是否共享了其他线程的请求)，请求抛出的异常原样抛出
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = fetch()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+class RequestCache:
+    """
+    按接口配置缓存时间的只读请求缓存，同时合并同时进行的相同请求。global_vars.request_cache是全局唯一的实例。
+    """
+
+    def __init__(self, ttls: dict = None, invalidations: dict = None, max_entries: int = 1024, clock=time.monotonic):
+        """
+        :param ttls: 接口 -> 缓存时间（秒），默认为DEFAULT_TTLS
+        :param invalidations: 写操作 -> 完成后需要使缓存失效的接口，默认为DEFAULT_INVALIDATIONS
+        :param max_entries: 每个接口最多缓存的结果数量，超过时先清理过期的结果
+        :param clock: 时钟函数
+        """
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.invalidations = dict(DEFAULT_INVALIDATIONS if invalidations is None else invalidations)
+        self.max_entries = max_entries
+        self.clock = clock
+        self.enabled = True
+        self.flights = SingleFlight()
+        self._entries = {}  # 接口 -> {请求的键: (过期时间, 结果)}
+        self._generations = {}  # 接口 -> 失效的次数
+        self._lock = threading.Lock()
+
+    def cached(self, endpoint: str) -> bool:
+        """
+        :return: 这个接口是否经过缓存（只读接口）
+        """
+        return self.enabled and endpoint in self.ttls
+
+    def call(self, endpoint: str, key, fetch, cacheable=None) -> tuple:
+        """
+        缓存中有没有过期的结果时直接返回，否则发出请求（相同的请求正在进行时等待它的结果）。
+        :param endpoint: 接口路径
+        :param key: 请求的键（request_key的返回值）
+        :param fetch: 没有参数的函数，发出请求
+        :param cacheable: 判断结果是否可以缓存的函数，为None时除了None以外的结果都缓存
+        :return: (结果, 'hit'/'miss'/'shared')
+        """
+        ttl = self.ttls[endpoint]
+        with self._lock:
+            generation = self._generations.get(endpoint, 0)
+            entry = self._entries.get(endpoint, {}).get(key)
+        if entry is not None and entry[0] > self.clock():
+            return entry[1], 'hit'
+
+        result, shared = self.flights.do((endpoint, generation, key), fetch)
+        if not shared and ttl > 0 and (result is not None if cacheable is None else cacheable(result)):
+            expires = self.clock() + ttl
+            with self._lock:
+                if self._generations.get(endpoint, 0) == generation:  # 请求期间没有失效
+                    entries = self._entries.setdefault(endpoint, {})
+                    if len(entries) >= self.max_entries:
+                        now = self.clock()
+                        for stale in [k for k, (t, _) in entries.items() if t <= now]:
+                            del entries[stale]
+                        if len(entries) >= self.max_entries:
+                            entries.clear()
+                    entries[key] = (expires, result)
+        return result, 'shared' if shared else 'miss'
+
+    def invalidate(self, *endpoints: str) -> None:
+        """
+        使接口的缓存失效。
+        """
+        with self._lock:
+            for endpoint in endpoints:
+                self._entries.pop(endpoint, None)
+                self._generations[endpoint] = self._generations.get(endpoint, 0) + 1
+
+    def written(self, endpoint: str) -> None:
+        """
+        写操作完成（无论是否成功）后调用，使受影响的接口的缓存失效。
+        :param endpoint: 写操作的接口路径
+        """
+        affected = self.invalidations.get(endpoint)
+        if affected:
+            self.invalidate(*affected)
+
+    def clear(self) -> None:
+        """
+        清空全部缓存。
+        """
+        self.invalidate(*list(self._entries))
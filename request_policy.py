@@ -0,0 +1,202 @@
+"""
+该模块定义了访问Okx的请求策略（RequestPolicy），用来控制请求耗时的长尾：以前myokx中的请求都没有设置超时，Okx某个节点响应慢时
+一个周期可能卡住几十秒，策略线程外层的except重试3次之后就会停止整个程序。具体包括：
+
+- 超时：连接超时和读取超时分开设置（requests的timeout=(连接, 读取)，okx SDK的httpx客户端的Timeout）。
+- 对冲请求：幂等的只读请求（GET）发出后，超过这个接口最近耗时的p95还没有返回时，再发出一个相同的请求，
+  使用先返回的结果。对冲请求的次数不超过请求次数的max_hedge_ratio，避免Okx整体变慢时请求数翻倍。
+- 重试：网络错误、超时、HTTP 5xx/429以及Okx表示系统繁忙的返回码按照带抖动的指数退避重试，最多max_attempts次。
+  写操作（下单等）只在连接阶段失败（请求肯定没有发到Okx）时重试，避免重复下单。
+- 每个接口的耗时直方图、对冲和重试的次数记录到监控指标。
+
+这样一次请求的最长耗时约为 max_attempts * (连接超时 + 读取超时) + 退避时间之和，策略线程每个周期的耗时有了上界。
+由myokx.okx_call使用，每一次尝试（包括对冲请求）都经过限流器并记录请求指标。
+"""
+
+" 内置模块 "
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+" 第三方模块 "
+import httpx
+import requests
+
+" 自定义模块 "
+from histogram import LatencyHistogram
+
+# 连接阶段的错误：请求肯定没有发到Okx，写操作也可以安全重试
+CONNECT_ERRORS = (requests.exceptions.ConnectTimeout, httpx.ConnectError, httpx.ConnectTimeout)
+
+# 可以重试的错误：网络错误和超时
+RETRYABLE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError)
+
+# 可以重试的返回码：HTTP 429/5xx，Okx的系统错误、服务暂时不可用、接口请求超时、请求过于频繁、系统繁忙
+RETRYABLE_CODES = frozenset({'http_429', 'http_500', 'http_502', 'http_503', 'http_504',
+                             '50000', '50001', '50004', '50011', '50013'})
+
+
+class RequestPolicy:
+    """
+    超时、对冲请求和重试的策略，线程安全。global_vars.request_policy是全局唯一的实例。
+    """
+
+    def __init__(self, connect_timeout: float = 3.05, read_timeout: float = 5.0, max_attempts: int = 3,
+                 backoff_base: float = 0.2, backoff_cap: float = 2.0, hedge_percentile: float = 95,
+                 min_hedge_delay: float = 0.05, max_hedge_delay: float = 2.0, min_samples: int = 20,
+                 max_hedge_ratio: float = 0.1, max_workers: int = 8, registry=None):
+        """
+        :param connect_timeout: 连接超时（秒）
+        :param read_timeout: 读取超时（秒）
+        :param max_attempts: 每个请求最多尝试的次数（包括第一次）
+        :param backoff_base: 第一次重试的最长退避时间（秒），之后每次翻倍
+        :param backoff_cap: 最长退避时间（秒）
+        :param hedge_percentile: 发出对冲请求的耗时分位数
+        :param min_hedge_delay: 对冲请求的最短等待时间（秒）
+        :param max_hedge_delay: 对冲请求的最长等待时间（秒）
+        :param min_samples: 接口的耗时样本少于这个数量时不对冲
+        :param max_hedge_ratio: 对冲请求的次数占请求次数的上限
+        :param max_workers: 发出对冲请求的线程数量
+        :param registry: 监控指标注册表，为None时不记录指标
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_workers = max_workers
+        self.hedging = True
+
+        self._latency = {}  # 接口 -> 每次成功请求的耗时
+        self._requests = 0
+        self._hedges = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+        if registry is not None:
+            self._retries = registry.counter('okx_retries_total', 'Okx REST请求重试的次数', ('endpoint', 'reason'))
+            self._hedged = registry.counter('okx_hedges_total', 'Okx只读请求的对冲请求次数，result为issued（发出）或won（先返回）',
+                                            ('endpoint', 'result'))
+        else:
+            self._retries = self._hedged = None
+
+    @property
+    def timeout(self) -> tuple:
+        """
+        :return: requests使用的超时：(连接超时, 读取超时)
+        """
+        return self.connect_timeout, self.read_timeout
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        """
+        :return: okx SDK（httpx客户端）使用的超时
+        """
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def latency(self, endpoint: str) -> LatencyHistogram:
+        histogram = self._latency.get(endpoint)
+        if histogram is None:
+            with self._lock:
+                histogram = self._latency.setdefault(endpoint, LatencyHistogram())
+        return histogram
+
+    def hedge_delay(self, endpoint: str) -> float | None:
+        """
+        :return: 发出对冲请求之前等待的时间（秒）：接口耗时的hedge_percentile分位数，样本不够时返回None（不对冲）
+        """
+        histogram = self.latency(endpoint)
+        if histogram.count < self.min_samples:
+            return None
+        delay = histogram.percentile(self.hedge_percentile)
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, delay))
+
+    def backoff(self, attempt: int) -> float:
+        """
+        :param attempt: 已经失败的次数（从1开始）
+        :return: 带抖动的退避时间（秒），在0到min(backoff_cap, backoff_base * 2 ** (attempt - 1))之间均匀分布
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _count(self, counter, labels: tuple) -> None:
+        if counter is not None:
+            counter.inc(labels)
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        """
+        记录一次成功请求的耗时（不包括等待限流器令牌的时间），用来计算对冲请求的等待时间。
+        """
+        self.latency(endpoint).record(seconds)
+
+    def _hedged_fetch(self, endpoint: str, fetch, delay: float):
+        """
+        发出请求，超过delay秒还没有返回时再发出一个相同的请求，返回先成功的结果；两个都失败时抛出后失败的异常。
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='okx_hedge')
+        primary = self._executor.submit(fetch)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        with self._lock:
+            if self._hedges >= self.max_hedge_ratio * self._requests:
+                return primary.result()
+            self._hedges += 1
+        self._count(self._hedged, (endpoint, 'issued'))
+        hedge = self._executor.submit(fetch)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count(self._hedged, (endpoint, 'won'))
+                    return future.result()
+            if not pending:
+                return next(iter(done)).result()
+
+    def run(self, endpoint: str, fetch, idempotent: bool, result_code=None):
+        """
+        按照策略发出请求。
+        :param endpoint: 接口路径
+        :param fetch: 没有参数的函数，发出一次请求（经过限流器）
+        :param idempotent: 是否是幂等的只读请求，只有幂等的请求才对冲、才按返回码和读取阶段的错误重试
+        :param result_code: 把请求结果转换为返回码的函数，返回码在RETRYABLE_CODES中时重试，为None时不按返回码重试
+        :return: 最后一次尝试的结果，最后一次尝试抛出的异常原样抛出
+        """
+        with self._lock:
+            self._requests += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                delay = self.hedge_delay(endpoint) if idempotent and self.hedging else None
+                if delay is None:
+                    result = fetch()
+                else:
+                    result = self._hedged_fetch(endpoint, fetch, delay)
+            except Exception as e:
+                retryable = isinstance(e, RETRYABLE_ERRORS) if idempotent else isinstance(e, CONNECT_ERRORS)
+                if not retryable or attempt >= self.max_attempts:
+                    raise
+                reason = type(e).__name__
+            else:
+                code = result_code(result) if idempotent and result_code is not None else None
+                if code not in RETRYABLE_CODES or attempt >= self.max_attempts:
+                    return result
+                reason = code
+            self._count(self._retries, (endpoint, reason))
+            time.sleep(self.backoff(attempt))
+
+    def snapshot(self) -> dict:
+        """
+        :return: 请求次数、对冲请求次数和每个接口当前的对冲等待时间
+        """
+        return {'requests': self._requests, 'hedges': self._hedges,
+                'hedge_delay': {endpoint: self.hedge_delay(endpoint) for endpoint in list(self._latency)}}
@@ -0,0 +1,273 @@
+"""
+该模块定义了资源监控器（ResourceMonitor）和资源监控线程，程序连续运行几个星期时用来发现内存泄漏、文件描述符泄漏和队列积压。具体包括：
+
+- 每interval秒采样一次：进程的常驻内存（RSS）和虚拟内存、进程和每个线程的CPU使用率（按线程名统计）、打开的文件描述符和网络连接数、
+  垃圾回收各代的待回收对象数和累计回收次数、日志队列/实时数据队列/周期耗时数据队列的长度、当前预测器包占用的内存。
+- 超过阈值（例如RSS超过rss_limit_mb）或者增长速度超过阈值（例如RSS在growth_window秒内平均每小时增长超过rss_growth_mb_per_hour）时，
+  通过日志队列告警。同一种告警在alert_interval秒内只告警一次，避免刷屏。
+- 每次采样追加一行JSON到本地的历史文件，文件超过max_bytes时轮转（resource_history.jsonl.1、.2……），最多保留backups个旧文件，
+  程序出问题之后可以根据历史文件分析内存是怎么增长的。
+- 最近一次采样结果注册到global_vars.metrics，可以通过监控指标线程采集。
+"""
+
+" 内置模块 "
+import gc
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+" 第三方模块 "
+import numpy as np
+import psutil
+
+" 自定义模块 "
+import global_vars
+
+# 告警阈值的默认值
+DEFAULT_LIMITS = {
+    'rss_mb': 2048,  # 常驻内存（MB）
+    'num_fds': 1000,  # 打开的文件描述符数量
+    'connections': 200,  # 网络连接数量
+    'lq_len': 10000,  # 日志队列长度
+    'r_d_len': 50000,  # 实时数据队列长度
+    'm_r_d_len': 100000,  # 多交易对实时数据队列长度
+    't_r_d_len': 50000,  # 周期耗时数据队列长度
+    'thread_cpu_percent': 95,  # 单个线程的CPU使用率（%）
+}
+
+# 增长速度告警阈值的默认值（每小时）
+DEFAULT_GROWTH_LIMITS = {
+    'rss_mb': 100,
+    'num_fds': 50,
+    'lq_len': 5000,
+    'r_d_len': 10000,
+}
+
+
+def _nbytes(obj, depth: int = 2) -> int:
+    """
+    统计一个对象中numpy数组占用的字节数，递归进入字典、元组、列表和对象的属性，最多depth层。
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if depth <= 0 or obj is None:
+        return 0
+    if isinstance(obj, dict):
+        return sum(_nbytes(value, depth - 1) for value in obj.values())
+    if isinstance(obj, (tuple, list)):
+        return sum(_nbytes(value, depth - 1) for value in obj)
+    if hasattr(obj, '__dict__'):
+        return sum(_nbytes(value, depth - 1) for value in vars(obj).values())
+    return 0
+
+
+class ResourceMonitor:
+    """
+    资源监控器，sample()和check()只在资源监控线程中调用。
+    """
+
+    def __init__(self, history_path: str = 'resource_history.jsonl', max_bytes: int = 5 * 2 ** 20,
+                 backups: int = 3, limits: dict = None, growth_limits: dict = None, growth_window: float = 3600.0,
+                 alert_interval: float = 1800.0):
+        """
+        :param history_path: 历史文件路径，为None时不写历史文件
+        :param max_bytes: 历史文件超过这个大小时轮转
+        :param backups: 保留的旧历史文件数量
+        :param limits: 告警阈值，会覆盖DEFAULT_LIMITS中的同名项
+        :param growth_limits: 增长速度告警阈值（每小时），会覆盖DEFAULT_GROWTH_LIMITS中的同名项
+        :param growth_window: 计算增长速度的时间窗口（秒），采样时间跨度达到窗口的一半以后才计算
+        :param alert_interval: 同一种告警的最短间隔（秒）
+        """
+        self.history_path = history_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.growth_limits = {**DEFAULT_GROWTH_LIMITS, **(growth_limits or {})}
+        self.growth_window = growth_window
+        self.alert_interval = alert_interval
+
+        self.process = psutil.Process()
+        self.process.cpu_percent(None)  # 第一次调用返回0，之后返回相对上一次调用的使用率
+        self._thread_cpu = {}  # 线程id -> 上一次采样时的累计CPU时间
+        self._last_time = time.monotonic()
+        self._window = deque()  # (采样时间, 采样结果)，用来计算增长速度
+        self._alerted = {}  # 告警名称 -> 上一次告警的时间
+        self.last: dict | None = None
+        self.samples = 0
+        self.alerts = 0
+
+    def _thread_names(self) -> dict:
+        return {thread.native_id: thread.name for thread in threading.enumerate()}
+
+    def _threads_cpu(self, elapsed: float) -> dict:
+        """
+        :return: 每个线程的CPU使用率（%），键为线程名，没有Python线程对应的本地线程以tid命名
+        """
+        names = self._thread_names()
+        current = {}
+        usage = {}
+        for thread in self.process.threads():
+            total = thread.user_time + thread.system_time
+            current[thread.id] = total
+            before = self._thread_cpu.get(thread.id)
+            if before is not None and elapsed > 0:
+                name = names.get(thread.id, f'tid-{thread.id}')
+                usage[name] = round(usage.get(name, 0.0) + (total - before) / elapsed * 100, 1)
+        self._thread_cpu = current
+        return usage
+
+    def sample(self) -> dict:
+        """
+        采样一次。
+        :return: 采样结果
+        """
+        now = time.monotonic()
+        elapsed, self._last_time = now - self._last_time, now
+        with self.process.oneshot():
+            memory = self.process.memory_info()
+            cpu_percent = self.process.cpu_percent(None)
+            num_fds = self.process.num_fds() if hasattr(self.process, 'num_fds') else self.process.num_handles()
+            num_threads = self.process.num_threads()
+        try:
+            connections = len(self.process.net_connections(kind='inet'))
+        except (psutil.Error, AttributeError):
+            connections = None
+
+        predictor = global_vars.predictor
+        sample = {
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'rss_mb': round(memory.rss / 2 ** 20, 1),
+            'vms_mb': round(memory.vms / 2 ** 20, 1),
+            'cpu_percent': cpu_percent,
+            'num_threads': num_threads,
+            'num_fds': num_fds,
+            'connections': connections,
+            'gc_count': list(gc.get_count()),
+            'gc_collections': [stats['collections'] for stats in gc.get_stats()],
+            'gc_garbage': len(gc.garbage),
+            'lq_len': len(global_vars.lq.logs),
+            'r_d_len': len(global_vars.r_d),
+            'm_r_d_len': len(global_vars.m_r_d),
+            't_r_d_len': len(global_vars.t_r_d),
+            'predictor_mb': round(_nbytes(predictor) / 2 ** 20, 2) if predictor is not None else 0.0,
+            'threads': self._threads_cpu(elapsed),
+        }
+        self.last = sample
+        self.samples += 1
+
+        self._window.append((now, sample))
+        while self._window and now - self._window[0][0] > self.growth_window:
+            self._window.popleft()
+        return sample
+
+    def growth(self) -> dict:
+        """
+        :return: growth_limits中各项在时间窗口内的平均增长速度（每小时），采样时间跨度不到窗口的一半时返回空字典
+        """
+        if len(self._window) < 2:
+            return {}
+        (t0, first), (t1, last) = self._window[0], self._window[-1]
+        hours = (t1 - t0) / 3600
+        if t1 - t0 < self.growth_window / 2 or hours <= 0:
+            return {}
+        return {name: (last[name] - first[name]) / hours for name in self.growth_limits
+                if last.get(name) is not None and first.get(name) is not None}
+
+    def check(self, sample: dict) -> list:
+        """
+        检查采样结果是否超过阈值或者增长速度是否超过阈值，超过时通过日志队列告警。
+        :return: 这一次检查发现的全部问题（包括因为告警间隔没有推送到日志队列的）
+        """
+        problems = []
+        for name, limit in self.limits.items():
+            if name == 'thread_cpu_percent':
+                for thread, percent in sample['threads'].items():
+                    if percent > limit:
+                        problems.append((f'thread_cpu:{thread}', f'线程{thread}的CPU使用率为{percent}%，超过{limit}%'))
+            elif sample.get(name) is not None and sample[name] > limit:
+                problems.append((name, f'{name}为{sample[name]}，超过{limit}'))
+        for name, rate in self.growth().items():
+            if rate > self.growth_limits[name]:
+                problems.append((f'growth:{name}', f'{name}每小时增长{rate:.1f}，超过{self.growth_limits[name]}，'
+                                                   f'当前为{sample[name]}'))
+
+        now = time.monotonic()
+        for key, message in problems:
+            last = self._alerted.get(key)
+            if last is not None and now - last < self.alert_interval:
+                continue
+            self._alerted[key] = now
+            self.alerts += 1
+            global_vars.lq.push(('资源监控-告警', 'Warning', message))
+        return problems
+
+    def write_history(self, sample: dict) -> None:
+        """
+        追加一行采样结果到历史文件，文件超过max_bytes时先轮转。
+        """
+        if not self.history_path:
+            return
+        try:
+            if os.path.exists(self.history_path) and os.path.getsize(self.history_path) >= self.max_bytes:
+                for i in range(self.backups - 1, 0, -1):
+                    if os.path.exists(f'{self.history_path}.{i}'):
+                        os.replace(f'{self.history_path}.{i}', f'{self.history_path}.{i + 1}')
+                if self.backups > 0:
+                    os.replace(self.history_path, f'{self.history_path}.1')
+                else:
+                    os.remove(self.history_path)
+            with open(self.history_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(sample, ensure_ascii=False) + '\n')
+        except OSError as e:
+            global_vars.lq.push(('资源监控-历史文件', 'Error', f'写入{self.history_path}失败:{e}'))
+
+    def register_metrics(self, registry) -> None:
+        """
+        把最近一次采样结果注册到监控指标注册表中。
+        """
+        fields = ('rss_mb', 'vms_mb', 'cpu_percent', 'num_threads', 'num_fds', 'connections', 'gc_garbage',
+                  'predictor_mb')
+        registry.gauge('resource', '资源监控器最近一次采样的结果', ('field',),
+                       callback=lambda: {field: self.last.get(field) for field in fields} if self.last else None)
+        registry.gauge('thread_cpu_percent', '每个线程的CPU使用率（%）', ('thread',),
+                       callback=lambda: dict(self.last['threads']) if self.last else None)
+        registry.gauge('gc_collections', '垃圾回收各代的累计回收次数', ('generation',),
+                       callback=lambda: {str(i): n for i, n in enumerate(self.last['gc_collections'])}
+                       if self.last else None)
+
+    def snapshot(self) -> dict:
+        """
+        :return: 最近一次采样结果和统计信息
+        """
+        return {'samples': self.samples, 'alerts': self.alerts, 'last': self.last, 'growth': self.growth()}
+
+
+def resource_monitor_thread(interval: float = 60.0, history_path: str = 'resource_history.jsonl',
+                            limits: dict = None, growth_limits: dict = None) -> None:
+    """
+    资源监控线程，每interval秒采样一次进程的资源使用情况，超过阈值时告警，并写入历史文件。程序结束时停止。
+
+    参数：
+    - interval: 采样间隔（秒），默认为60秒。
+    - history_path: 历史文件路径，默认为resource_history.jsonl。
+    - limits: 告警阈值，详见DEFAULT_LIMITS。
+    - growth_limits: 增长速度告警阈值（每小时），详见DEFAULT_GROWTH_LIMITS。
+    """
+    monitor = ResourceMonitor(history_path=history_path, limits=limits, growth_limits=growth_limits)
+    monitor.register_metrics(global_vars.metrics)
+    global_vars.lq.push(('资源监控线程-状态信息', 'info', '资源监控线程启动'))
+    while not global_vars.s_finished_event:
+        try:
+            sample = monitor.sample()
+            monitor.check(sample)
+            monitor.write_history(sample)
+        except Exception as e:  # 资源监控出错不影响交易，只记录日志
+            global_vars.lq.push(('资源监控线程-错误信息', 'error', f'资源监控出错：{e}'))
+        waited = 0.0
+        while waited < interval and not global_vars.s_finished_event:
+            time.sleep(min(1.0, interval))
+            waited += min(1.0, interval)
+    global_vars.lq.push(('资源监控线程-状态信息', 'info', '资源监控线程停止'))
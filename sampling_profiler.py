@@ -0,0 +1,233 @@
+"""
+该模块定义了一个采样分析器（SamplingProfiler），用来查看某个周期突然变慢时时间花在了哪里（网络请求、sklearn、pandas还是MySQL）。具体包括：
+
+- 默认不启用，可以在运行时通过enable()/disable()开关（监控指标线程的本地HTTP接口POST /profiler/start、/profiler/stop
+  调用的就是这两个方法），enable(seconds)可以只采样一段时间。
+- 启用后，后台线程每隔一段时间用sys._current_frames()读取所有线程（策略线程、日志管理线程、实时数据管理线程、开关线程、
+  模型训练线程等，采样线程自身除外）当前的调用栈，按照“线程名;文件:函数;文件:函数...”累计次数。不需要修改被采样的代码，
+  也不会像sys.setprofile一样拖慢每一次函数调用。
+- 开销预算：记录每次采样本身的耗时，自动拉长采样间隔，使采样线程占用的时间不超过overhead_budget（默认2%）。
+- 每dump_interval秒把这段时间的采样结果写入本地目录：.collapsed文件是火焰图工具（flamegraph.pl、speedscope）可以直接读取的
+  折叠调用栈格式，.top.txt是按自身耗时和包含子函数的耗时排序的前top_n个函数。目录中最多保留max_dumps组文件。
+"""
+
+" 内置模块 "
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+" 自定义模块 "
+import global_vars
+
+
+def _frame_name(code) -> str:
+    return f'{os.path.basename(code.co_filename)}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+class SamplingProfiler:
+    """
+    基于sys._current_frames()的采样分析器，全部采样和写入都在后台线程中进行。
+    """
+
+    def __init__(self, output_dir: str = 'profiles', interval: float = 0.01, dump_interval: float = 60.0,
+                 top_n: int = 30, overhead_budget: float = 0.02, max_depth: int = 128, max_dumps: int = 100):
+        """
+        :param output_dir: 采样结果的输出目录
+        :param interval: 最短采样间隔（秒）
+        :param dump_interval: 每隔多少秒写入一次采样结果
+        :param top_n: .top.txt中列出的函数数量
+        :param overhead_budget: 采样线程占用时间的上限（占墙上时间的比例）
+        :param max_depth: 每个调用栈最多记录的层数（从最内层开始）
+        :param max_dumps: 输出目录中最多保留的采样结果组数
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.dump_interval = dump_interval
+        self.top_n = top_n
+        self.overhead_budget = overhead_budget
+        self.max_depth = max_depth
+        self.max_dumps = max_dumps
+
+        self._stacks = Counter()  # 折叠的调用栈 -> 采样次数
+        self._samples = 0
+        self._sampling_time = 0.0  # 本轮采样本身花费的时间
+        self._window_start = None
+        self._enabled = threading.Event()
+        self._stop = threading.Event()
+        self._until = None  # enable(seconds)时自动停止的时间
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        self.dumps = 0
+        self.total_samples = 0
+        self.last_dump: str | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled.is_set()
+
+    def enable(self, seconds: float = None) -> None:
+        """
+        开始采样，没有启动后台线程时自动启动。
+        :param seconds: 采样多少秒后自动停止，为None时一直采样直到disable()
+        """
+        with self._lock:
+            self._until = time.monotonic() + seconds if seconds else None
+            if not self._enabled.is_set():
+                self._window_start = time.monotonic()
+                self._enabled.set()
+                global_vars.lq.push(('采样分析器-状态信息', 'info',
+                                     f'采样分析器启动，结果写入{self.output_dir}' + (f'，{seconds}秒后停止' if seconds else '')))
+        self.start()
+
+    def disable(self) -> None:
+        """
+        停止采样，并立即写入还没有写入的采样结果。
+        """
+        if self._enabled.is_set():
+            self._enabled.clear()
+            self.dump()
+            global_vars.lq.push(('采样分析器-状态信息', 'info', '采样分析器停止'))
+
+    def sample(self) -> int:
+        """
+        采样一次所有线程的调用栈。
+        :return: 采样到的线程数量
+        """
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        sampled = 0
+        for ident, frame in frames.items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f'thread-{ident}'))
+            stack.reverse()
+            self._stacks[';'.join(stack)] += 1
+            sampled += 1
+        del frames
+        self._samples += 1
+        return sampled
+
+    def top(self, stacks: Counter = None) -> tuple:
+        """
+        :return: (按自身采样次数排序的前top_n个函数, 按包含子函数的采样次数排序的前top_n个函数)，每一项为(函数, 次数)
+        """
+        stacks = self._stacks if stacks is None else stacks
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')[1:]  # 第一个是线程名
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        return own.most_common(self.top_n), inclusive.most_common(self.top_n)
+
+    def dump(self) -> str | None:
+        """
+        写入这段时间的采样结果并清空计数。
+        :return: 输出文件的路径前缀，没有采样结果时返回None
+        """
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+            samples, self._samples = self._samples, 0
+            sampling_time, self._sampling_time = self._sampling_time, 0.0
+            started, self._window_start = self._window_start, time.monotonic()
+        if not stacks:
+            return None
+
+        elapsed = time.monotonic() - started if started else 0.0
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+        with open(prefix + '.collapsed', 'w', encoding='utf-8') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f'{stack} {count}\n')
+
+        own, inclusive = self.top(stacks)
+        total = sum(stacks.values())
+        with open(prefix + '.top.txt', 'w', encoding='utf-8') as f:
+            f.write(f'采样次数：{samples}，线程调用栈数：{total}，时长：{elapsed:.1f}秒，'
+                    f'采样开销：{sampling_time / elapsed * 100 if elapsed else 0:.2f}%\n\n')
+            f.write('按自身采样次数排序：\n')
+            for name, count in own:
+                f.write(f'{count:>8} {count / total * 100:6.2f}%  {name}\n')
+            f.write('\n按包含子函数的采样次数排序：\n')
+            for name, count in inclusive:
+                f.write(f'{count:>8} {count / total * 100:6.2f}%  {name}\n')
+
+        self.dumps += 1
+        self.last_dump = prefix
+        self._prune()
+        return prefix
+
+    def _prune(self) -> None:
+        """
+        只保留最近max_dumps组采样结果。
+        """
+        collapsed = sorted(name for name in os.listdir(self.output_dir) if name.endswith('.collapsed'))
+        for name in collapsed[:max(0, len(collapsed) - self.max_dumps)]:
+            base = os.path.join(self.output_dir, name[:-len('.collapsed')])
+            for path in (base + '.collapsed', base + '.top.txt'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _run(self) -> None:
+        """
+        后台采样线程：没有启用时等待，启用后按照开销预算采样，每dump_interval秒写入一次。
+        """
+        while not self._stop.is_set() and not global_vars.s_finished_event:
+            if not self._enabled.wait(1.0):
+                continue
+            if self._until is not None and time.monotonic() >= self._until:
+                self.disable()
+                continue
+
+            with self._lock:
+                start = time.perf_counter()
+                self.sample()
+                cost = time.perf_counter() - start
+                self._sampling_time += cost
+            self.total_samples += 1
+
+            if time.monotonic() - self._window_start >= self.dump_interval:
+                self.dump()
+            # 采样耗时为cost时，至少等待cost / overhead_budget - cost秒，保证采样线程的占用不超过预算
+            self._stop.wait(max(self.interval, cost / self.overhead_budget - cost))
+        if self._enabled.is_set():
+            self._enabled.clear()
+            self.dump()
+
+    def start(self) -> 'SamplingProfiler':
+        """
+        启动后台采样线程（没有启用时只是等待，几乎没有开销）。
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling_profiler_thread', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """
+        停止后台采样线程，并写入还没有写入的采样结果。
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def snapshot(self) -> dict:
+        """
+        :return: 采样分析器的状态
+        """
+        return {'enabled': self.enabled, 'total_samples': self.total_samples, 'dumps': self.dumps,
+                'last_dump': self.last_dump, 'output_dir': self.output_dir}
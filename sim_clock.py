@@ -0,0 +1,88 @@
+"""
+该模块定义了策略线程使用的时钟，把“获取当前时间”和“休眠”从策略线程中抽离出来。具体包括：
+
+- RealClock：真实时钟，now()返回系统时间，sleep()真正休眠，实盘运行时使用。
+- VirtualClock：虚拟时钟，从指定的时间开始，sleep()只是把虚拟时间向前推进，不会真正等待（也可以按speed倍速等待），
+  配合sim_io.ReplayIO重放已记录的实时数据，一整天的运行（包括零点切换到新的实时数据表和日志表）几秒钟就能完成。
+
+两种时钟都提供wait(event, seconds)：等待seconds秒，event被设置时提前返回，tick_scheduler用它实现可以被提前唤醒的等待。
+"""
+
+" 内置模块 "
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class RealClock:
+    """
+    真实时钟。
+    """
+
+    def now(self) -> datetime:
+        """
+        :return: 当前的本地时间
+        """
+        return datetime.now()
+
+    def sleep(self, seconds: float) -> None:
+        """
+        休眠seconds秒
+        """
+        time.sleep(seconds)
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        """
+        等待seconds秒，event被设置时提前返回
+        :return: True表示被event提前唤醒
+        """
+        return event.wait(max(0.0, seconds))
+
+
+class VirtualClock:
+    """
+    虚拟时钟，线程安全。
+    """
+
+    def __init__(self, start: datetime, speed: float = None):
+        """
+        :param start: 虚拟时间的起点
+        :param speed: 倍速，例如1000表示虚拟时间比真实时间快1000倍；为None时sleep()不等待
+        """
+        self._now = start
+        self.speed = speed
+        self.slept = 0.0  # 累计休眠的虚拟秒数
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        """
+        :return: 当前的虚拟时间
+        """
+        with self._lock:
+            return self._now
+
+    def sleep(self, seconds: float) -> None:
+        """
+        把虚拟时间向前推进seconds秒。
+        """
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        self.advance(seconds)
+
+    def wait(self, event: threading.Event, seconds: float) -> bool:
+        """
+        event已经被设置时立即返回，否则把虚拟时间向前推进seconds秒
+        :return: True表示被event提前唤醒
+        """
+        if event.is_set():
+            return True
+        self.sleep(max(0.0, seconds))
+        return False
+
+    def advance(self, seconds: float) -> None:
+        """
+        不休眠，直接把虚拟时间向前推进seconds秒。
+        """
+        with self._lock:
+            self._now += timedelta(seconds=seconds)
+            self.slept += seconds
@@ -0,0 +1,297 @@
+"""
+该模块定义了策略线程访问外部世界（Okx行情、Okx账户和交易、MySQL建表、邮件）的I/O层，
+把这些调用从策略线程中抽离出来，使策略线程可以不做任何修改地在重放模式下运行。具体包括：
+
+- LiveIO：实盘使用的I/O层，定义在live_io中（实盘的策略线程只导入live_io，不导入本模块和回测的代码）。
+- OfflineIO：行情和交易照常访问Okx的接口（通常是指向fake_okx_server的地址），建表、保存日数据和发送邮件只做记录，
+  用于在本地测试策略线程和多交易对策略引擎。
+- ReplayIO：重放已记录的实时数据（backtest.load_ticks返回的数据），根据虚拟时钟的时间返回当时的行情，
+  账户和交易由SimulatedOkx在本地模拟，建表、保存日数据和发送邮件只做记录。数据重放完后设置global_vars.s_finished_event，
+  策略线程在下一个周期开始时正常退出。
+- SimulatedOkx：提供与MyOkx相同的方法（get_positions、place_agreement_order、close_positions、get_positions_history，
+  以及止损止盈单的下单、修改、撤单、查询），订单由backtest.SimulatedExchange按当前行情成交。
+  止损止盈单在每次查询持仓时按当前行情检查是否触发，触发时按触发价格平仓。
+- run_replay：在虚拟时钟下运行策略线程，重放一段实时数据，用于长时间运行测试和回归性能测试。
+"""
+
+" 内置模块 "
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+" 第三方模块 "
+import numpy as np
+
+" 自定义模块 "
+from backtest import SimulatedExchange
+from live_io import LiveIO
+from myokx import MyOkx
+from sim_clock import VirtualClock
+import function
+import global_vars
+
+
+def _to_datetime(seconds: int) -> datetime:
+    """
+    把backtest.ticks_from_frame中的秒级时间戳（本地时间）转换为datetime
+    """
+    return datetime(1970, 1, 1) + timedelta(seconds=int(seconds))
+
+
+class OfflineIO(LiveIO):
+    """
+    不访问MySQL、不发送邮件的I/O层，行情和交易照常访问Okx的接口。
+    """
+
+    def __init__(self, domain: str = None):
+        """
+        :param domain: Okx的访问地址，默认为myokx.OKX_DOMAIN
+        """
+        self.domain = domain
+        self.tables = []  # 创建过的日志表
+        self.saved_days = []  # 保存过日数据的日期
+        self.emails = []  # 发送过的邮件
+
+    def create_okx(self, api_key: str, secret_key: str, passphrase: str) -> MyOkx:
+        return MyOkx(api_key, secret_key, passphrase, domain=self.domain)
+
+    def create_control_program_switch_table(self, **kwargs) -> None:
+        pass
+
+    def create_log_table(self, **kwargs) -> bool:
+        self.tables.append(kwargs.get('mysql_log_table'))
+        return True
+
+    def sava_all_data_to_mysql(self, *args, **kwargs) -> None:
+        self.saved_days.append(args[0] if args else kwargs.get('start_date'))
+
+    def send_email(self, **kwargs) -> None:
+        self.emails.append(kwargs)
+
+
+class SimulatedOkx:
+    """
+    本地模拟的Okx账户，方法与MyOkx中策略线程用到的方法相同。
+    """
+
+    def __init__(self, io: 'ReplayIO', instId: str, leverage: int, min_sz: float = 0.01, ct_val: float = 0.1,
+                 fee_rate: float = 0.0005):
+        """
+        :param io: 提供当前行情的ReplayIO
+        :param instId: 交易对
+        :param leverage: 杠杆倍数
+        :param min_sz: 最小下单量（张）
+        :param ct_val: 每张合约的面值（币）
+        :param fee_rate: 手续费率
+        """
+        self.io = io
+        self.instId = instId
+        self.exchange = SimulatedExchange(leverage, min_sz, ct_val, fee_rate)
+        self.last_closed_pnl = 0.0
+        self.orders = 0
+        self.algos = {}  # 未完成的止损止盈单，{algoId: (平仓方向, 止损触发价格, 止盈触发价格)}
+        self.algo_id = 0
+
+    def set_leverage(self, instId: str, mgnMode: str, leverage: int) -> int:
+        return leverage
+
+    def _check_algos(self, price: float) -> None:
+        """
+        检查止损止盈单是否被当前价格触发，触发时按当前价格以市价平掉整个仓位。
+        重放的行情只有每个周期的价格，所以触发只能在周期开始查询持仓时发生。
+        """
+        for side, sl_px, tp_px in list(self.algos.values()):
+            if self.exchange.pos == 0:
+                break
+            long = side == 'sell'  # 平仓方向为卖出，说明保护的是多仓
+            if sl_px is not None and (price <= sl_px if long else price >= sl_px) or \
+                    tp_px is not None and (price >= tp_px if long else price <= tp_px):
+                self._fill(side, abs(self.exchange.pos))
+
+    def get_positions(self) -> list:
+        price = self.io.price
+        self._check_algos(price)
+        if self.exchange.pos == 0:
+            return []
+        return [{
+            'instId': self.instId,
+            'pos': str(self.exchange.pos),
+            'avgPx': str(self.exchange.avg_px),
+            'notionalUsd': str(abs(self.exchange.notional(price))),
+            'upl': str(self.exchange.upl(price)),
+            'uplRatio': str(self.exchange.upl_ratio(price)),
+        }]
+
+    def _fill(self, side: str, sz: float) -> dict:
+        closed_pnl = self.exchange.place_market(side, sz, self.io.price)
+        if closed_pnl is not None:
+            self.last_closed_pnl = closed_pnl
+            self.algos.clear()  # 仓位被平掉后交易所撤销这个仓位的止损止盈单
+        self.orders += 1
+        return {'code': '0', 'msg': '', 'data': [{'ordId': str(self.orders), 'sCode': '0', 'sMsg': ''}]}
+
+    def place_agreement_order(self, instId: str, tdMode: str, side: str, ordType: str, lever: int, sz: int = 0,
+                              ccy: str = 'USDT', **kwargs) -> tuple:
+        size = self.exchange.order_size(sz)
+        global_vars.minSz = self.exchange.min_sz
+        return self._fill(side, size), size
+
+    def close_positions(self, instId=None, leverage=10, ordType='market', tdMode='cross', limit_uplRatio: float = -1,
+                        ccy: str = 'USDT'):
+        """
+        与MyOkx.close_positions的判断逻辑相同：亏损比例低于limit_uplRatio时止损，limit_uplRatio为0时止盈。
+        """
+        if instId is None or self.exchange.pos == 0:
+            return None
+        uplRatio = self.exchange.upl_ratio(self.io.price)
+        side = 'sell' if self.exchange.pos > 0 else 'buy'
+        if (uplRatio < 0 and uplRatio < limit_uplRatio) or limit_uplRatio == 0:
+            self._fill(side, abs(self.exchange.pos))
+            return 1
+        return None
+
+    def get_positions_history(self, instType='SWAP', instId='ETH-USDT-SWAP') -> dict:
+        return {'instId': self.instId, 'realizedPnl': str(self.last_closed_pnl)}
+
+    def place_tpsl_order(self, instId: str, side: str, tdMode: str = 'cross', slTriggerPx: float = None,
+                         tpTriggerPx: float = None) -> str | None:
+        if self.exchange.pos == 0:
+            return None
+        self.algo_id += 1
+        self.algos[str(self.algo_id)] = (side, slTriggerPx, tpTriggerPx)
+        return str(self.algo_id)
+
+    def amend_tpsl_order(self, instId: str, algoId: str, slTriggerPx: float = None,
+                         tpTriggerPx: float = None) -> bool:
+        if algoId not in self.algos:
+            return False
+        side, sl_px, tp_px = self.algos[algoId]
+        self.algos[algoId] = (side, sl_px if slTriggerPx is None else slTriggerPx,
+                              tp_px if tpTriggerPx is None else tpTriggerPx)
+        return True
+
+    def cancel_algo_orders(self, instId: str, algoIds: list) -> bool:
+        for algoId in algoIds:
+            self.algos.pop(algoId, None)
+        return True
+
+    def get_pending_tpsl_orders(self, instId: str) -> list:
+        return [{'algoId': algoId, 'instId': self.instId, 'side': side,
+                 'slTriggerPx': '' if sl_px is None else str(sl_px), 'tpTriggerPx': '' if tp_px is None else str(tp_px)}
+                for algoId, (side, sl_px, tp_px) in self.algos.items()]
+
+
+class ReplayIO(OfflineIO):
+    """
+    重放已记录的实时数据的I/O层。
+    """
+
+    def __init__(self, ticks: dict, clock: VirtualClock, instId: str = 'ETH-USDT-SWAP', leverage: int = 10,
+                 min_sz: float = 0.01, ct_val: float = 0.1, fee_rate: float = 0.0005):
+        """
+        :param ticks: backtest.load_ticks返回的字典
+        :param clock: 策略线程使用的虚拟时钟
+        :param instId: 交易对
+        :param leverage: 杠杆倍数
+        :param min_sz: 最小下单量（张）
+        :param ct_val: 每张合约的面值（币）
+        :param fee_rate: 手续费率
+        """
+        super().__init__()
+        self.ticks = ticks
+        self.times = np.asarray(ticks['time'])
+        self.clock = clock
+        self.okx = SimulatedOkx(self, instId, leverage, min_sz, ct_val, fee_rate)
+        self.index = 0
+        self.price = float(ticks['price'][0])
+        self.ticks_served = 0
+
+    @property
+    def start(self) -> datetime:
+        """
+        :return: 第一条实时数据的时间，用作虚拟时钟的起点
+        """
+        return _to_datetime(self.times[0])
+
+    def create_okx(self, api_key: str, secret_key: str, passphrase: str) -> SimulatedOkx:
+        return self.okx
+
+    def _select(self) -> int:
+        now = self.clock.now()
+        seconds = int((now - datetime(1970, 1, 1)).total_seconds())
+        if seconds > self.times[-1]:
+            global_vars.s_finished_event = True  # 数据重放完了，策略线程在下一个周期开始时退出
+        self.index = max(0, int(np.searchsorted(self.times, seconds, side='right')) - 1)
+        return self.index
+
+    def get_ticker_last_price(self, instId: str) -> tuple:
+        i = self._select()
+        self.ticks_served += 1
+        self.price = float(self.ticks['price'][i])
+        p = float(self.ticks['p'][i])
+        data = {
+            'instId': instId,
+            'last': str(self.price),
+            'sodUtc8': str(self.price / (1 + p)),
+            'bidSz': str(self.ticks['current_bidSz'][i]),
+            'askSz': str(self.ticks['current_askSz'][i]),
+            'vol24h': str(self.ticks['current_vol24h'][i]),
+        }
+        return data, self.price, p
+
+    def get_majors_mean_p(self) -> float:
+        return float(self.ticks['current_mean_p'][self.index])
+
+
+def run_replay(ticks: dict, instId: str = 'ETH-USDT-SWAP', leverage: int = 10, sz: int = 1, speed: float = None,
+               **strategy_kwargs) -> dict:
+    """
+    在虚拟时钟下运行（没有修改过的）策略线程，重放ticks中的实时数据，直到数据重放完为止。
+    运行前会清空global_vars中的结束事件、实时数据队列和周期耗时数据队列，动态参数文件使用临时目录中的新文件，不会覆盖parameter.txt。
+    :param ticks: backtest.load_ticks返回的字典
+    :param instId: 交易对
+    :param leverage: 杠杆倍数
+    :param sz: minSz的整数倍
+    :param speed: 虚拟时钟的倍速，为None时不等待
+    :param strategy_kwargs: 传给strategy_manager_thread的其他策略参数，例如place_uplimit
+    :return: 运行结果，包括策略线程产生的实时数据行、创建的日志表、耗时和加速倍数
+    """
+    from strategy_manager_thread import strategy_manager_thread
+
+    clock = VirtualClock(datetime(1970, 1, 1) + timedelta(seconds=int(ticks['time'][0])), speed)
+    io = ReplayIO(ticks, clock, instId, leverage)
+
+    global_vars.s_finished_event = False
+    global_vars.r_d = []
+    global_vars.t_r_d = []
+    logs_before = len(global_vars.lq.logs)
+
+    with tempfile.TemporaryDirectory() as directory:
+        parameter_path = os.path.join(directory, 'parameter.txt')
+        function.save_parameter(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, sz, 0, 0, path=parameter_path)
+
+        start = time.perf_counter()
+        strategy_manager_thread(mysql_host='replay', mysql_username='replay', mysql_password='replay',
+                                mysql_coin_database='replay', mysql_coin_day_date_table='replay',
+                                okx_api_key='replay', okx_secret_key='replay', okx_passphrase='replay',
+                                instId=instId, leverage=leverage, sender='replay', receiver='replay',
+                                sender_password='replay', sz=sz, clock=clock, io=io,
+                                parameter_path=parameter_path, **strategy_kwargs)
+        elapsed = time.perf_counter() - start
+
+    rows = global_vars.r_d
+    logs = global_vars.lq.logs[logs_before:]
+    return {
+        'rows': rows,
+        'ticks': len(rows),
+        'log_tables': io.tables,
+        'saved_days': io.saved_days,
+        'emails': len(io.emails),
+        'errors': sum(1 for log in logs if str(log[1]).lower() == 'error'),
+        'orders': io.okx.orders,
+        'realized_pnl': io.okx.exchange.realized,
+        'seconds': round(elapsed, 3),
+        'virtual_seconds': clock.slept,
+        'speedup': round(clock.slept / elapsed) if elapsed > 0 else None,
+    }
@@ -1,11 +1,20 @@
 """
-该模块定义了交易策略中使用的信号生成函数，用于确定开多仓和开空仓的时机。
+该模块定义了交易策略中使用的信号生成函数，用于确定开多仓和开空仓的时机，以及使用模型对开仓信号进行过滤的预测函数。
+go_long_signal_array和go_short_signal_array是信号生成函数的数组版本，一次计算大量周期的信号，用于回测和研究。
 """
 
-from predict_model import data_to_df
+" 内置模块 "
+import time
+
+" 第三方模块 "
+import numpy as np
+
+" 自定义模块 "
+from predictor import PredictorBundle, feature_vector, predict_one
 import global_vars
 
 
+@global_vars.tick_timer.timed('signal')
 def go_long_signal(long_place_downlimit: float, long_place_uplimit: float, p: float, last_p_p: float,
                    before_five_current_data_average: float,
                    current_five_current_data_average: float,
@@ -47,6 +56,7 @@ def go_long_signal(long_place_downlimit: float, long_place_uplimit: float, p: fl
         return False
 
 
+@global_vars.tick_timer.timed('signal')
 def go_short_signal(short_place_downlimit: float, short_place_uplimit: float, p: float, last_p_p: float,
                     before_five_current_data_average: float,
                     current_five_current_data_average: float,
@@ -89,7 +99,53 @@ def go_short_signal(short_place_downlimit: float, short_place_uplimit: float, p:
         return False
 
 
-def predict(current_price: float,
+def go_long_signal_array(long_place_downlimit, long_place_uplimit, p, last_p_p,
+                         before_five_current_data_average, current_five_current_data_average,
+                         before_mean_p, current_mean_p,
+                         l_c, l_c_limit, before_bidSz, current_bidSz,
+                         before_vol24h, current_vol24h) -> np.ndarray:
+    """
+    go_long_signal的数组版本，参数含义与go_long_signal相同。
+    每个参数可以是numpy数组，也可以是标量（例如固定的开仓上下限和计数器），按照numpy的广播规则计算。
+    对每一个元素的结果与go_long_signal完全相同（包括含有NaN时返回False）。
+    :return: 布尔数组，True表示这个周期满足开多仓条件
+    """
+    p = np.asarray(p, dtype=np.float64)
+    return ((np.asarray(long_place_downlimit, dtype=np.float64) < p) &
+            (p < np.asarray(long_place_uplimit, dtype=np.float64)) &
+            (np.asarray(before_five_current_data_average, dtype=np.float64) <=
+             np.asarray(current_five_current_data_average, dtype=np.float64)) &
+            (np.asarray(before_mean_p, dtype=np.float64) <= np.asarray(current_mean_p, dtype=np.float64)) &
+            (np.asarray(l_c) <= np.asarray(l_c_limit)) &
+            (np.asarray(before_bidSz, dtype=np.float64) < np.asarray(current_bidSz, dtype=np.float64)) &
+            (np.asarray(before_vol24h, dtype=np.float64) < np.asarray(current_vol24h, dtype=np.float64)) &
+            (np.asarray(last_p_p, dtype=np.float64) > 0))
+
+
+def go_short_signal_array(short_place_downlimit, short_place_uplimit, p, last_p_p,
+                          before_five_current_data_average, current_five_current_data_average,
+                          before_mean_p, current_mean_p,
+                          s_c, s_c_limit, before_askSz, current_askSz,
+                          before_vol24h, current_vol24h) -> np.ndarray:
+    """
+    go_short_signal的数组版本，参数含义与go_short_signal相同，广播规则与go_long_signal_array相同。
+    :return: 布尔数组，True表示这个周期满足开空仓条件
+    """
+    p = np.asarray(p, dtype=np.float64)
+    return ((-np.asarray(short_place_downlimit, dtype=np.float64) > p) &
+            (p > -np.asarray(short_place_uplimit, dtype=np.float64)) &
+            (np.asarray(before_five_current_data_average, dtype=np.float64) >=
+             np.asarray(current_five_current_data_average, dtype=np.float64)) &
+            (np.asarray(before_mean_p, dtype=np.float64) >= np.asarray(current_mean_p, dtype=np.float64)) &
+            (np.asarray(s_c) <= np.asarray(s_c_limit)) &
+            (np.asarray(before_askSz, dtype=np.float64) <= np.asarray(current_askSz, dtype=np.float64)) &
+            (np.asarray(before_vol24h, dtype=np.float64) <= np.asarray(current_vol24h, dtype=np.float64)) &
+            (np.asarray(last_p_p, dtype=np.float64) < 0))
+
+
+@global_vars.tick_timer.timed('predict')
+def predict(predictor: PredictorBundle | None,
+            current_price: float,
             last_price: float,
             before_five_current_data_average: float,
             current_five_current_data_average: float,
@@ -105,6 +161,7 @@ def predict(current_price: float,
     使用训练好的模型预测交易是否盈利。
 
     参数：
+    - predictor: PredictorBundle, 本周期开始时读取的预测器包（global_vars.predictor），同一个周期内的预测都使用它。
     - current_price: float, 当前价格。
     - last_price: float, 上一次价格。
     - before_five_current_data_average: float, 前五个周期的当前价格平均值。
@@ -121,22 +178,28 @@ def predict(current_price: float,
     返回：
     - bool, 如果预测盈利，返回True；否则，返回False。
     """
-    # 检查是否有可用的最佳模型和未经标准化的特征数据集
-    if global_vars.best_model is None or global_vars.attr_df is None:
-        # 如果没有可用模型或数据，无法进行预测，返回True以保守起见
+    start = time.perf_counter()
+    monitor = global_vars.inference_monitor
+
+    # 检查是否有可用的预测器包
+    if predictor is None:
+        # 如果没有可用模型，无法进行预测，返回True以保守起见
+        monitor.record(time.perf_counter() - start, True, None)
         return True
 
-    # 将当前数据转换为DataFrame，并进行标准化处理
-    new_d = data_to_df(global_vars.attr_df,
-                       current_price, last_price,
+    monitor.observe_predictor(predictor.version, predictor.reference)
+
+    # 计算当前周期的特征向量
+    x = feature_vector(current_price, last_price,
                        current_five_current_data_average, before_five_current_data_average,
                        current_mean_p, before_mean_p,
                        current_bidSz, before_bidSz,
                        current_askSz, before_askSz,
                        current_vol24h, before_vol24h)
 
-    # 使用最佳模型进行预测,返回预测结果，True表示预测盈利，False表示预测亏损
-    if global_vars.best_model.predict(new_d)[0] == 1:
-        return True
-    else:
-        return False
+    # 使用预测器包进行标准化和预测,返回预测结果，True表示预测盈利，False表示预测亏损
+    allowed = predict_one(predictor, x)
+
+    # 记录预测耗时、预测结果和特征，用于监控否决率和特征漂移
+    monitor.record(time.perf_counter() - start, allowed, x)
+    return allowed
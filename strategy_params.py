@@ -0,0 +1,25 @@
+"""
+该模块定义了策略参数的默认值，由回测（backtest）、参数搜索（param_sweep）和实盘的多交易对策略引擎（multi_strategy）共用。
+单独放在一个没有依赖的模块中，实盘的策略线程不需要导入回测的代码。
+"""
+
+# 策略参数的默认值，与strategy_manager_thread的默认参数一致；
+# leverage、sz、min_sz、ct_val、fee_rate是回测额外需要的参数（实盘中来自用户配置和Okx的合约信息）
+DEFAULT_PARAMS = {
+    'leverage': 10,
+    'sz': 1,
+    'place_position_nums': 150,
+    'place_uplimit': 0.0055,
+    'place_downlimit': 0.0015,
+    'l_s1': 0.01, 'l_s2': 0.025, 'l_s3': 0.045, 'l_s4': 0.075,
+    'l_e1': 0.015, 'l_e2': 0.035, 'l_e3': 0.065, 'l_e4': 0.1,
+    's_s1': -0.015, 's_s2': -0.035, 's_s3': -0.065, 's_s4': -0.1,
+    's_e1': -0.01, 's_e2': -0.025, 's_e3': -0.045, 's_e4': -0.075,
+    'l_c_limit': 10,
+    's_c_limit': 10,
+    'limit_uplRatio': -0.5,
+    'lower_take_profit': 0.012,
+    'min_sz': 0.01,  # 最小下单量（张）
+    'ct_val': 0.1,  # 每张合约的面值（币），ETH-USDT-SWAP为0.1
+    'fee_rate': 0.0005,  # 吃单手续费率
+}
@@ -0,0 +1,159 @@
+"""
+该模块定义了交易策略的动态状态StrategyState，把strategy_manager_thread中分散的局部变量放到一个使用__slots__的对象中。具体包括：
+
+- 需要保存到参数文件中的动态参数（开仓上下限、开仓计数器、区间计数器、n_sz、亏损和盈利累计值），
+  顺序与function.save_parameter、function.load_parameter相同，参数文件的格式不变。
+- 只在运行过程中使用的状态（计划持仓头寸ppn、上一周期的价格、五个价格的平均值、主流币均值、买卖深度、24小时交易量，
+  以及回测中最后一个周期的日期编号day，回测分支时用来判断第一个周期是否是新的一天）。
+- snapshot()/restore()：用一个元组保存和恢复全部状态，不需要重新构造参数元组或者JSON，
+  用于参数检查点和回测中的分支点（从同一个状态出发用不同的参数继续回测）。
+- to_bytes()/from_bytes()：定长的二进制序列化，每个字段8个字节。
+- diff()：比较两个状态（或者状态和快照），返回发生变化的字段。
+"""
+
+" 内置模块 "
+import json
+import os
+import struct
+from operator import attrgetter
+
+# 保存到参数文件中的字段，顺序与function.save_parameter的参数顺序相同
+PERSISTED_FIELDS = ('long_place_downlimit', 'long_place_uplimit', 'short_place_downlimit', 'short_place_uplimit',
+                    'l_c', 's_c', 'u_p_1', 'u_p_2', 'u_p_3', 'u_p_4', 'd_p_1', 'd_p_2', 'd_p_3', 'd_p_4',
+                    'n_sz', 'loss', 'profit')
+
+# 只在运行过程中使用的字段
+RUNTIME_FIELDS = ('ppn', 'before_price', 'last_p_p', 'before_five', 'current_five', 'before_mean_p',
+                  'before_bidSz', 'before_askSz', 'before_vol24h', 'day')
+
+FIELDS = PERSISTED_FIELDS + RUNTIME_FIELDS
+
+# 整数字段，二进制序列化时与浮点数字段一样保存为8字节的double，反序列化时转换回int
+INT_FIELDS = frozenset(('l_c', 's_c', 'u_p_1', 'u_p_2', 'u_p_3', 'u_p_4', 'd_p_1', 'd_p_2', 'd_p_3', 'd_p_4', 'n_sz',
+                        'day'))
+
+_STRUCT = struct.Struct('<' + 'd' * len(FIELDS))
+_GET_ALL = attrgetter(*FIELDS)
+_GET_PERSISTED = attrgetter(*PERSISTED_FIELDS)
+_INT_INDEXES = tuple(i for i, name in enumerate(FIELDS) if name in INT_FIELDS)
+
+
+def persisted_json(values: tuple) -> str:
+    """
+    :param values: StrategyState.persisted()的返回值
+    :return: 参数文件的内容，与function.save_parameter写入的内容相同
+    """
+    return json.dumps(dict(zip(PERSISTED_FIELDS, values)), indent=4)
+
+
+class StrategyState:
+    """
+    交易策略的动态状态。
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, place_uplimit: float = 0.0, place_downlimit: float = 0.0, sz: int = 0,
+                 place_position_nums: float = 0.0):
+        """
+        :param place_uplimit: 用户设定的开仓涨幅上限
+        :param place_downlimit: 用户设定的开仓跌幅下限
+        :param sz: 用户配置的minSz的整数倍，n_sz的初始值
+        :param place_position_nums: 用户配置的最大头寸数量，ppn的初始值
+        """
+        for name in FIELDS:
+            setattr(self, name, 0.0)
+        self.day = 0
+        self.n_sz = sz
+        self.ppn = place_position_nums
+        self.reset(place_uplimit, place_downlimit)
+
+    def reset(self, place_uplimit: float, place_downlimit: float) -> None:
+        """
+        初始化区间计数器、开仓上下限和开仓计数器，与function.init_arguments相同（新的一天或者止盈成功后调用）。
+        """
+        self.u_p_1 = self.d_p_1 = self.u_p_2 = self.d_p_2 = self.u_p_3 = self.d_p_3 = self.u_p_4 = self.d_p_4 = 0
+        self.long_place_uplimit = self.short_place_uplimit = place_uplimit
+        self.long_place_downlimit = self.short_place_downlimit = place_downlimit
+        self.l_c = self.s_c = 0
+
+    def snapshot(self) -> tuple:
+        """
+        :return: 全部字段的值组成的元组，顺序与FIELDS相同
+        """
+        return _GET_ALL(self)
+
+    def restore(self, snapshot: tuple) -> None:
+        """
+        从snapshot()返回的元组恢复全部字段。
+        """
+        for name, value in zip(FIELDS, snapshot):
+            setattr(self, name, value)
+
+    def copy(self) -> 'StrategyState':
+        """
+        :return: 一个字段相同的新状态
+        """
+        state = StrategyState.__new__(StrategyState)
+        state.restore(self.snapshot())
+        return state
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: 定长的二进制序列化结果
+        """
+        return _STRUCT.pack(*self.snapshot())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'StrategyState':
+        """
+        :param data: to_bytes()的返回值
+        :return: 反序列化得到的状态
+        """
+        values = list(_STRUCT.unpack(data))
+        for i in _INT_INDEXES:
+            values[i] = int(values[i])
+        state = cls.__new__(cls)
+        state.restore(values)
+        return state
+
+    def diff(self, other) -> dict:
+        """
+        比较两个状态。
+        :param other: 另一个StrategyState，或者snapshot()返回的元组
+        :return: 发生变化的字段，格式为：{字段名: (本状态的值, other的值)}
+        """
+        mine = self.snapshot()
+        theirs = other.snapshot() if isinstance(other, StrategyState) else other
+        if mine == theirs:
+            return {}
+        return {name: (a, b) for name, a, b in zip(FIELDS, mine, theirs) if a != b}
+
+    def persisted(self) -> tuple:
+        """
+        :return: 需要保存到参数文件中的字段的值，顺序与function.save_parameter的参数顺序相同
+        """
+        return _GET_PERSISTED(self)
+
+    def load(self, path: str = 'parameter.txt') -> bool:
+        """
+        从参数文件中加载动态参数，参数文件的格式与function.load_parameter相同。
+        :return: 参数文件不存在时返回False，状态不变；参数文件损坏时抛出ValueError或KeyError，状态不变
+        """
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r') as f:
+            data = json.load(f)
+        values = [data[name] for name in PERSISTED_FIELDS]  # 先取出全部字段，缺少字段时抛出KeyError，状态不变
+        for name, value in zip(PERSISTED_FIELDS, values):
+            setattr(self, name, value)
+        return True
+
+    def save(self, path: str = 'parameter.txt') -> None:
+        """
+        保存动态参数到参数文件，格式与function.save_parameter相同。
+        """
+        with open(path, 'w') as f:
+            f.write(persisted_json(self.persisted()))
+
+    def __repr__(self) -> str:
+        return f'StrategyState({", ".join(f"{name}={value!r}" for name, value in zip(FIELDS, self.snapshot()))})'
@@ -46,6 +46,8 @@ def switch_thread(host: str, username: str, password: str, database: str, port:
                 if re == 0:
                     global_vars.s_finished_event = True
                     global_vars.next_model_train_sleep_time = 1
+                    if global_vars.tick_scheduler is not None:
+                        global_vars.tick_scheduler.wake()  # 提前唤醒策略线程，使其立即停止，不用等到下一个周期
                     global_vars.lq.push(('程序状态', 'Info', '程序将停止运行'))
 
             time.sleep(30)
@@ -0,0 +1,9 @@
+"""
+测试使用项目根目录下的模块（项目是平铺的模块，没有包），所以把项目根目录加入sys.path。
+"""
+
+" 内置模块 "
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,45 @@
+"""
+多交易对实时数据训练模型的测试：开仓记录只和同一个交易对的平仓记录连接，训练数据集窗口按交易对保留平仓记录。
+"""
+
+" 第三方模块 "
+import pandas as pd
+
+" 自定义模块 "
+from predict_model import label_entries
+from training_window import TrainingWindow
+
+
+def _t(minutes: int) -> pd.Timestamp:
+    return pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=minutes)
+
+
+def _records() -> tuple:
+    data = pd.DataFrame({'instId': pd.Categorical(['A', 'B', 'A', 'B']),
+                         '当前时间': [_t(0), _t(1), _t(2), _t(3)],
+                         '交易类型': [1, -1, 1, 1]})
+    target = pd.DataFrame({'instId': pd.Categorical(['B', 'A', 'B']),
+                           '当前时间': [_t(2), _t(5), _t(9)],
+                           '交易类型': [3, 2, -2]})
+    return data, target
+
+
+def test_label_entries_matches_same_instrument():
+    data, target = _records()
+    labeled = label_entries(data, target)
+    assert labeled['instId'].tolist() == ['A', 'B', 'A', 'B']
+    assert labeled['盈亏情况'].tolist() == [2, 3, 2, -2]
+
+
+def test_label_entries_without_instId_matches_any_close():
+    data, target = _records()
+    labeled = label_entries(data.drop(columns='instId'), target.drop(columns='instId'))
+    assert labeled['盈亏情况'].tolist() == [3, 3, 3, 2]
+
+
+def test_trim_keeps_outcomes_per_instrument():
+    data, target = _records()
+    data, target = TrainingWindow('trades', 3).trim(data, target)
+    assert data['当前时间'].tolist() == [_t(1), _t(2), _t(3)]
+    assert sorted(zip(target['instId'].astype(str), target['当前时间'])) == [('A', _t(5)), ('B', _t(2)), ('B', _t(9))]
+    assert label_entries(data, target)['盈亏情况'].tolist() == [3, 2, -2]
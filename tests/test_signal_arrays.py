@@ -0,0 +1,97 @@
+"""
+开仓信号的数组版本（go_long_signal_array、go_short_signal_array）与逐个计算的版本（go_long_signal、go_short_signal）逐个元素一致的测试：
+相等的边界、NaN、标量参数的广播。
+"""
+
+" 第三方模块 "
+import numpy as np
+import pytest
+
+" 自定义模块 "
+from strategy import go_long_signal, go_long_signal_array, go_short_signal, go_short_signal_array
+
+N = 5000
+
+
+def _arrays(seed: int, nan_fraction: float = 0.0) -> list:
+    """
+    生成14个参数的数组。取值来自很小的离散集合，所以相邻的比较（<、<=）经常正好相等，覆盖相等的边界。
+    """
+    rng = np.random.default_rng(seed)
+    limits = np.array([0.005, 0.01, 0.015])
+    args = [rng.choice(limits, N), rng.choice(limits + 0.01, N),
+            rng.choice(np.array([-0.02, -0.015, -0.01, -0.005, 0.0, 0.005, 0.01, 0.015, 0.02]), N),
+            rng.choice(np.array([-0.001, 0.0, 0.001]), N)]
+    for _ in range(2):  # 前五个周期均值、主流币均值
+        args += [rng.choice(np.array([1.0, 2.0]), N), rng.choice(np.array([1.0, 2.0]), N)]
+    args += [rng.integers(0, 4, N), rng.integers(1, 3, N)]
+    for _ in range(2):  # 盘口深度、24小时交易量
+        args += [rng.choice(np.array([10.0, 11.0]), N), rng.choice(np.array([10.0, 11.0]), N)]
+    if nan_fraction:
+        for arg in args:
+            if arg.dtype.kind == 'f':
+                arg[rng.random(N) < nan_fraction] = np.nan
+    return args
+
+
+def _scalar(func, args: list) -> np.ndarray:
+    return np.array([func(*(a if np.isscalar(a) else a[i] for a in args)) for i in range(N)])
+
+
+@pytest.mark.parametrize('scalar, array', [(go_long_signal, go_long_signal_array),
+                                           (go_short_signal, go_short_signal_array)], ids=['long', 'short'])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_arrays_match_scalar(scalar, array, seed):
+    args = _arrays(seed)
+    expected = _scalar(scalar, args)
+    assert expected.any() and not expected.all()  # 两种结果都要覆盖到
+    np.testing.assert_array_equal(array(*args), expected)
+
+
+@pytest.mark.parametrize('scalar, array', [(go_long_signal, go_long_signal_array),
+                                           (go_short_signal, go_short_signal_array)], ids=['long', 'short'])
+def test_equality_boundaries(scalar, array):
+    args = _arrays(3)
+    # 逐个让严格不等式和非严格不等式的两边相等
+    for left, right in ((0, 2), (2, 1), (4, 5), (6, 7), (8, 9), (10, 11), (12, 13)):
+        case = [a.copy() for a in args]
+        case[left] = case[right].astype(case[left].dtype)
+        np.testing.assert_array_equal(array(*case), _scalar(scalar, case))
+    case = [a.copy() for a in args]
+    case[3] = np.zeros(N)  # last_p_p为0时多空都不开仓
+    assert not array(*case).any()
+    np.testing.assert_array_equal(array(*case), _scalar(scalar, case))
+
+
+@pytest.mark.parametrize('scalar, array', [(go_long_signal, go_long_signal_array),
+                                           (go_short_signal, go_short_signal_array)], ids=['long', 'short'])
+def test_nan_never_opens(scalar, array):
+    args = _arrays(4, nan_fraction=0.05)
+    expected = _scalar(scalar, args)
+    result = array(*args)
+    np.testing.assert_array_equal(result, expected)
+    has_nan = np.zeros(N, dtype=bool)
+    for arg in args:
+        if arg.dtype.kind == 'f':
+            has_nan |= np.isnan(arg)
+    assert has_nan.any() and not result[has_nan].any()
+
+
+@pytest.mark.parametrize('scalar, array', [(go_long_signal, go_long_signal_array),
+                                           (go_short_signal, go_short_signal_array)], ids=['long', 'short'])
+def test_scalar_broadcasting(scalar, array):
+    args = _arrays(5)
+    # 开仓上下限、计数器和计数上限是标量，与回测时固定参数的用法一致
+    for positions in ((0, 1), (8, 9), (0, 1, 8, 9)):
+        case = list(args)
+        for i in positions:
+            case[i] = case[i][0].item()
+        result = array(*case)
+        assert result.shape == (N,)
+        np.testing.assert_array_equal(result, _scalar(scalar, case))
+
+
+def test_all_scalars_gives_zero_dimensional_result():
+    args = [a[0].item() for a in _arrays(6)]
+    assert bool(go_long_signal_array(*args)) == go_long_signal(*args)
+    assert bool(go_short_signal_array(*args)) == go_short_signal(*args)
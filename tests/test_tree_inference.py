@@ -0,0 +1,126 @@
+"""
+tree_inference编译后的树模型与sklearn的model.predict逐条一致的测试：决策树、随机森林，阈值上的取值、float32输入、NaN。
+"""
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+" 自定义模块 "
+from predict_model import FEATURE_COLUMNS
+from predictor import build_predictor, predict_one
+from tree_inference import check_parity, compile_model
+
+
+def _training_set(n: int = 600, seed: int = 0) -> tuple:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURE_COLUMNS)))
+    # 一部分特征取离散值，训练出的阈值两边都有大量相同的取值
+    X[:, 3] = rng.integers(-3, 4, size=n)
+    y = ((X[:, 0] + 0.5 * X[:, 3] + rng.normal(scale=0.5, size=n)) > 0).astype(int)
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS), y
+
+
+def _models() -> list:
+    X, y = _training_set()
+    return [DecisionTreeClassifier(random_state=0).fit(X, y),
+            DecisionTreeClassifier(max_depth=4, random_state=0).fit(X, y),
+            RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y),
+            RandomForestClassifier(n_estimators=10, max_depth=3, random_state=0).fit(X, y)]
+
+
+def _threshold_rows(model) -> np.ndarray:
+    """
+    每个分裂节点生成三条记录：被分裂的特征正好等于阈值、比阈值大一个float64的最小间隔、比阈值小一个float32的最小间隔。
+    """
+    X, _ = _training_set()
+    base = X.to_numpy().mean(axis=0)
+    trees = model.estimators_ if hasattr(model, 'estimators_') else [model]
+    rows = []
+    for tree in trees:
+        for feature, threshold in zip(tree.tree_.feature, tree.tree_.threshold):
+            if feature < 0:
+                continue
+            for value in (threshold, np.nextafter(threshold, np.inf),
+                          float(np.nextafter(np.float32(threshold), np.float32(-np.inf)))):
+                row = base.copy()
+                row[feature] = value
+                rows.append(row)
+    return np.array(rows)
+
+
+def _assert_parity(model, rows: np.ndarray) -> None:
+    compiled = compile_model(model)
+    expected = model.predict(pd.DataFrame(rows, columns=FEATURE_COLUMNS))
+    actual = np.array([compiled.predict(row) for row in rows])
+    np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize('model', _models(), ids=['tree', 'tree_depth4', 'forest', 'forest_depth3'])
+def test_parity_on_training_rows(model):
+    X, _ = _training_set()
+    assert check_parity(compile_model(model), model, X)
+    _assert_parity(model, X.to_numpy())
+
+
+@pytest.mark.parametrize('model', _models(), ids=['tree', 'tree_depth4', 'forest', 'forest_depth3'])
+def test_parity_at_thresholds(model):
+    _assert_parity(model, _threshold_rows(model))
+
+
+@pytest.mark.parametrize('model', _models(), ids=['tree', 'tree_depth4', 'forest', 'forest_depth3'])
+def test_parity_float32_inputs(model):
+    rows = np.random.default_rng(1).normal(scale=3.0, size=(400, len(FEATURE_COLUMNS))).astype(np.float32)
+    compiled = compile_model(model)
+    expected = model.predict(pd.DataFrame(rows, columns=FEATURE_COLUMNS))
+    np.testing.assert_array_equal([compiled.predict(row) for row in rows], expected)
+    # float32输入和转换为float64之后的输入结果相同
+    np.testing.assert_array_equal([compiled.predict(row.astype(np.float64)) for row in rows], expected)
+
+
+@pytest.mark.parametrize('model', _models(), ids=['tree', 'tree_depth4', 'forest', 'forest_depth3'])
+def test_predict_one_with_nan_falls_back_to_sklearn(model):
+    X, _ = _training_set()
+    predictor = build_predictor(1, model, X)
+    assert predictor.compiled is not None
+    rng = np.random.default_rng(2)
+    for _ in range(50):
+        x = rng.normal(size=len(FEATURE_COLUMNS))
+        x[rng.integers(len(FEATURE_COLUMNS))] = np.nan
+        z = (x - predictor.mean) / predictor.std
+        expected = model.predict(pd.DataFrame([z], columns=FEATURE_COLUMNS))[0] == 1
+        assert predict_one(predictor, x) == expected
+
+
+def test_predict_one_matches_sklearn():
+    X, _ = _training_set()
+    for model in _models():
+        predictor = build_predictor(1, model, X)
+        rows = np.random.default_rng(3).normal(size=(200, len(FEATURE_COLUMNS)))
+        Z = (rows - predictor.mean) / predictor.std
+        expected = model.predict(pd.DataFrame(Z, columns=FEATURE_COLUMNS)) == 1
+        assert [predict_one(predictor, row) for row in rows] == expected.tolist()
+
+
+def test_unsupported_model_is_not_compiled():
+    from sklearn.neighbors import KNeighborsClassifier
+    X, y = _training_set()
+    assert compile_model(KNeighborsClassifier().fit(X, y)) is None
+
+
+def test_parity_failure_is_reported(monkeypatch):
+    import global_vars
+    import predictor as predictor_module
+
+    X, y = _training_set()
+    model = DecisionTreeClassifier(random_state=0).fit(X, y)
+    monkeypatch.setattr(predictor_module, 'check_parity', lambda compiled, model, sample: False)
+    before = len(global_vars.lq.logs)
+    bundle = build_predictor(7, model, X)
+    assert bundle.compiled is None
+    assert any(log[0] == '预测器-编译模型' for log in list(global_vars.lq.logs)[before:])
+    counter = global_vars.metrics.counter('compiled_model_fallbacks_total', '', ('model',))
+    assert counter.value('DecisionTreeClassifier') >= 1
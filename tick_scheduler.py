@@ -0,0 +1,170 @@
+"""
+该模块定义了策略线程的周期调度器（TickScheduler），代替原来每个周期结束后随机休眠的做法。具体包括：
+
+- 按照绝对的截止时间调度：下一个周期的截止时间 = 上一个周期的截止时间 + 周期间隔，周期内处理所花的时间会从等待时间中扣除，
+  周期不会因为处理耗时而越来越晚。如果处理时间超过了截止时间（错过截止时间），立即开始下一个周期，并从当前时间重新计算截止时间，
+  不会为了追赶而连续执行多个周期。
+- 根据价格波动自适应调整周期间隔（代替function.modulate_randomtime的分档表）：用指数加权移动平均估计每个周期价格变化的幅度，
+  波动越大间隔越短，波动越小间隔越长，间隔限制在[min_interval, max_interval]之间。
+- 可以被市场事件或者程序停止事件提前唤醒（wake），立即开始下一个周期。设置了行情函数（watch）时，等待较长的周期间隔期间
+  每poll_interval秒查询一次价格，相对本周期价格的变化达到wake_move时提前唤醒，避免在长间隔中错过剧烈的行情。
+- 记录每个周期的处理耗时、相对截止时间的延迟、错过截止时间的次数、被提前唤醒的次数。
+"""
+
+" 内置模块 "
+import threading
+from datetime import datetime, timedelta
+
+" 自定义模块 "
+from histogram import LatencyHistogram
+from sim_clock import RealClock
+
+
+class TickScheduler:
+    """
+    基于截止时间的周期调度器。
+    """
+
+    def __init__(self, clock=None, base_interval: float = 15.0, min_interval: float = 2.0,
+                 max_interval: float = 100.0, reference_move: float = 0.0006, alpha: float = 0.3,
+                 poll_interval: float = 5.0, wake_move: float = 0.004):
+        """
+        :param clock: 时钟，默认为真实时钟，重放时使用sim_clock.VirtualClock
+        :param base_interval: 价格变化幅度等于reference_move时的周期间隔（秒）
+        :param min_interval: 最短周期间隔（秒）
+        :param max_interval: 最长周期间隔（秒）
+        :param reference_move: 参考的每周期价格变化幅度，默认0.06%
+        :param alpha: 价格变化幅度指数加权移动平均的权重，越大越重视最近的周期
+        :param poll_interval: 等待期间查询价格的间隔（秒），剩余的等待时间不超过这个间隔时不再查询
+        :param wake_move: 等待期间价格相对本周期价格的变化幅度达到这个值时提前唤醒，为0时不查询价格
+        """
+        self.clock = clock or RealClock()
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.reference_move = reference_move
+        self.alpha = alpha
+        self.poll_interval = poll_interval
+        self.wake_move = wake_move
+
+        self.interval = base_interval  # 当前的周期间隔
+        self.move = None  # 每周期价格变化幅度的指数加权移动平均
+        self.deadline: datetime | None = None  # 下一个周期的截止时间
+        self.tick_start: datetime | None = None  # 当前周期开始的时间
+        self.price: float | None = None  # 本周期的价格，等待期间的价格变化相对它计算
+        self._price_fn = None
+        self._event = threading.Event()
+
+        self.busy = LatencyHistogram()  # 每个周期的处理耗时
+        self.lateness = LatencyHistogram()  # 每个周期实际开始时间相对截止时间的延迟
+        self.ticks = 0
+        self.missed = 0
+        self.woken = 0
+        self.market_woken = 0
+
+    def start_tick(self) -> None:
+        """
+        在每个周期开始时调用，记录周期的开始时间和相对截止时间的延迟。
+        """
+        now = self.clock.now()
+        if self.deadline is not None:
+            self.lateness.record(max(0.0, (now - self.deadline).total_seconds()))
+        if self.deadline is None:
+            self.deadline = now
+        self.tick_start = now
+        self.ticks += 1
+
+    def update(self, before_price: float, current_price: float) -> float:
+        """
+        根据这个周期的价格变化更新周期间隔。
+        :param before_price: 上一个周期的价格，为0时（程序刚启动）不更新
+        :param current_price: 当前价格
+        :return: 新的周期间隔（秒）
+        """
+        self.price = current_price
+        if before_price:
+            move = abs(current_price - before_price) / before_price
+            self.move = move if self.move is None else self.alpha * move + (1 - self.alpha) * self.move
+            ratio = self.reference_move / max(self.move, 1e-9)
+            self.interval = min(self.max_interval, max(self.min_interval, self.base_interval * ratio))
+        return self.interval
+
+    def wait(self) -> bool:
+        """
+        在每个周期结束时调用，等待到下一个周期的截止时间。
+        :return: True表示被wake提前唤醒
+        """
+        now = self.clock.now()
+        if self.tick_start is not None:
+            self.busy.record((now - self.tick_start).total_seconds())
+
+        base = self.deadline or now
+        self.deadline = base + timedelta(seconds=self.interval)
+        remaining = (self.deadline - now).total_seconds()
+        if remaining <= 0:
+            # 错过了截止时间，立即开始下一个周期，并从现在开始重新计算截止时间
+            self.missed += 1
+            self.deadline = now
+            return False
+
+        woken = self._wait()
+        if woken:
+            self._event.clear()
+            self.woken += 1
+            self.deadline = self.clock.now()
+        return woken
+
+    def _wait(self) -> bool:
+        """
+        等待到截止时间，设置了行情函数时每poll_interval秒检查一次价格变化。
+        :return: True表示被wake或者价格变化提前唤醒
+        """
+        remaining = (self.deadline - self.clock.now()).total_seconds()
+        if self._price_fn is None or not self.wake_move or not self.price:
+            return self.clock.wait(self._event, remaining)
+        while remaining > self.poll_interval:
+            if self.clock.wait(self._event, self.poll_interval):
+                return True
+            if self._moved():
+                self.market_woken += 1
+                return True
+            remaining = (self.deadline - self.clock.now()).total_seconds()
+        return self.clock.wait(self._event, remaining)
+
+    def _moved(self) -> bool:
+        """
+        :return: 当前价格相对本周期价格的变化幅度是否达到wake_move，查询失败时返回False
+        """
+        try:
+            price = self._price_fn()
+        except Exception:
+            return False
+        return bool(price) and abs(price - self.price) / self.price >= self.wake_move
+
+    def watch(self, price_fn) -> None:
+        """
+        设置等待期间查询价格的函数。
+        :param price_fn: 没有参数的函数，返回当前价格，为None时不查询价格
+        """
+        self._price_fn = price_fn
+
+    def wake(self) -> None:
+        """
+        提前唤醒正在等待的策略线程，例如价格剧烈变化或者程序需要停止时，线程安全。
+        """
+        self._event.set()
+
+    def snapshot(self) -> dict:
+        """
+        :return: 调度器的统计信息
+        """
+        return {
+            'ticks': self.ticks,
+            'interval': self.interval,
+            'move': self.move,
+            'missed': self.missed,
+            'woken': self.woken,
+            'market_woken': self.market_woken,
+            'busy': self.busy.snapshot(),
+            'lateness': self.lateness.snapshot(),
+        }
@@ -0,0 +1,183 @@
+"""
+该模块定义了策略线程每个周期的分阶段计时器（TickTimer），用来查看一个周期的时间花在了哪里。具体包括：
+
+- span(stage)：上下文管理器，统计with语句块的耗时；timed(stage)：装饰器，统计函数每次调用的耗时。
+  同一个阶段在一个周期内可以出现多次（例如开多和开空都会调用predict），耗时累加。
+- 每个周期结束时（end_tick）把各个阶段的耗时记录到各自的耗时直方图（histogram.LatencyHistogram，p50/p95/p99/最大值），
+  并返回一行周期耗时数据，由实时数据管理线程写入与实时数据表同一天的周期耗时表。
+- 只统计调用begin_tick的线程（策略线程）中的耗时，其他线程（例如模型训练线程、回测）调用被装饰的函数时不计时。
+- 没有启用时span()直接返回一个什么都不做的上下文管理器，被装饰的函数只多一次判断，几乎没有额外开销。
+- 无论是否启用计时，策略线程进入每个阶段时都会记录心跳（最近进入的阶段和进入的时间），每个周期结束时记录完成时间，
+  看门狗（tick_watchdog）据此判断策略线程是否停顿以及停在哪个阶段。
+"""
+
+" 内置模块 "
+import threading
+import time
+from functools import wraps
+
+" 自定义模块 "
+from histogram import LatencyHistogram
+
+# 策略线程一个周期的各个阶段，顺序与周期耗时表的列顺序相同
+STAGES = ('ticker', 'majors', 'positions', 'signal', 'predict', 'order', 'take_profit', 'stop_loss', 'statistics',
+          'checkpoint')
+
+
+class _NullSpan:
+    """
+    没有启用计时时使用的上下文管理器，什么都不做。
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """
+    一次计时。
+    """
+    __slots__ = ('timer', 'stage', 'start')
+
+    def __init__(self, timer: 'TickTimer', stage: str):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class TickTimer:
+    """
+    策略线程每个周期的分阶段计时器。global_vars.tick_timer是全局唯一的实例，被装饰的函数绑定在这个实例上，
+    只能修改它的enabled，不能整体替换。
+    """
+
+    def __init__(self, enabled: bool = False, stages: tuple = STAGES):
+        """
+        :param enabled: 是否启用计时
+        :param stages: 阶段名称，不在其中的阶段也会统计直方图，但是不会出现在周期耗时数据行中
+        """
+        self.enabled = enabled
+        self.stages = stages
+        self.histograms = {stage: LatencyHistogram() for stage in stages + ('other', 'tick')}
+        self._lock = threading.Lock()
+        self._thread = None  # 策略线程（调用begin_tick的线程），只统计这个线程的耗时和心跳
+        self._tick_start = None
+        self._current = {}  # 当前周期各个阶段累计的耗时（秒）
+        self.ticks = 0
+
+        # 心跳，时间都是time.monotonic()
+        self.stage: str | None = None  # 策略线程最近进入的阶段，周期开始时为'begin'，周期结束后等待下一个周期时为'wait'
+        self.stage_since: float | None = None  # 进入这个阶段的时间
+        self.tick_started: float | None = None  # 最近一个周期开始的时间
+        self.tick_completed: float | None = None  # 最近一个周期完成的时间
+        self.completed = 0  # 完成的周期数
+
+    def span(self, stage: str):
+        """
+        :param stage: 阶段名称
+        :return: 统计with语句块耗时的上下文管理器
+        """
+        if self._thread != threading.get_ident():
+            return _NULL_SPAN
+        self.stage, self.stage_since = stage, time.monotonic()
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def timed(self, stage: str):
+        """
+        装饰器，统计函数每次调用的耗时。
+        :param stage: 阶段名称
+        """
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if self._thread != threading.get_ident():
+                    return func(*args, **kwargs)
+                self.stage, self.stage_since = stage, time.monotonic()
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def add(self, stage: str, seconds: float) -> None:
+        """
+        把一段耗时累加到当前周期的某个阶段。
+        """
+        self._current[stage] = self._current.get(stage, 0.0) + seconds
+
+    def heartbeat(self, stage: str) -> None:
+        """
+        记录策略线程进入了某个阶段，用于没有计时的阶段（例如新的一天保存前一天的数据）。
+        :param stage: 阶段名称
+        """
+        if self._thread == threading.get_ident():
+            self.stage, self.stage_since = stage, time.monotonic()
+
+    def begin_tick(self) -> None:
+        """
+        在策略线程每个周期开始时调用。
+        """
+        self._thread = threading.get_ident()
+        self.tick_started = self.stage_since = time.monotonic()
+        self.stage = 'begin'
+        if not self.enabled:
+            return
+        self._current = {}
+        self._tick_start = time.perf_counter()
+
+    def end_tick(self, formatted_now: str) -> list | None:
+        """
+        在策略线程每个周期结束时调用，把各个阶段的耗时记录到直方图中。
+        :param formatted_now: 本周期的时间，与实时数据行的第一列相同
+        :return: 周期耗时数据行：[当前时间, 周期总耗时, 各个阶段的耗时..., 其他耗时]，单位为毫秒；没有启用计时时返回None
+        """
+        if self._thread != threading.get_ident():
+            return None
+        self.tick_completed = self.stage_since = time.monotonic()
+        self.stage = 'wait'
+        self.completed += 1
+        if not self.enabled or self._tick_start is None:
+            return None
+        total = time.perf_counter() - self._tick_start
+        current, self._current, self._tick_start = self._current, {}, None
+        other = max(0.0, total - sum(current.values()))
+        with self._lock:
+            for stage, seconds in current.items():
+                if stage not in self.histograms:
+                    self.histograms[stage] = LatencyHistogram()
+                self.histograms[stage].record(seconds)
+            self.histograms['other'].record(other)
+            self.histograms['tick'].record(total)
+            self.ticks += 1
+        return [formatted_now, total * 1000] + [current.get(stage, 0.0) * 1000 for stage in self.stages] + \
+            [other * 1000]
+
+    def snapshot(self) -> dict:
+        """
+        :return: 每个阶段的耗时分布（秒），只包括出现过的阶段
+        """
+        with self._lock:
+            return {stage: histogram.snapshot() for stage, histogram in self.histograms.items() if histogram.count}
@@ -0,0 +1,214 @@
+"""
+该模块定义了策略线程的看门狗（Watchdog）和看门狗线程。Okx的请求没有超时而一直挂起、或者get_positions_history一直循环时，
+策略线程会悄无声息地停住，其他线程却照常运行，只能等发现实时数据表里没有新数据时才知道。具体包括：
+
+- 读取分阶段计时器（global_vars.tick_timer）记录的心跳：最近一个周期完成的时间、策略线程最近进入的阶段和进入的时间。
+- 距离上一个周期完成的时间超过周期间隔（global_vars.tick_scheduler.interval）的multiple倍（且不少于min_stall秒）时，认为策略线程停顿：
+  用faulthandler把所有线程的调用栈写入dump_dir中的文件，通过日志队列记录停顿的阶段和时长，停在等待阶段时提前唤醒调度器。
+  已知很慢的阶段（止损和统计收益时get_positions_history会先等待15秒）每进入一次，本周期的阈值就加上这个阶段的额外时间（stage_allowance），
+  例行的止损不会被当作停顿。
+- 逐级上报：停顿超过阈值的email_after倍时发送邮件；设置了shutdown_after时，停顿超过阈值的shutdown_after倍后
+  设置global_vars.s_finished_event停止程序，由计划任务重新启动。
+- 策略线程恢复（完成了新的周期）后记录停顿的总时长。停顿次数和当前停顿时长注册到global_vars.metrics。
+"""
+
+" 内置模块 "
+import faulthandler
+import os
+import threading
+import time
+from datetime import datetime
+
+" 自定义模块 "
+from mymail import send_email
+import global_vars
+
+# 已知很慢的阶段每进入一次额外允许的时间（秒）：止损可能要获取两次历史仓位，统计收益获取一次，每次先等待15秒
+STAGE_ALLOWANCE = {'stop_loss': 45.0, 'statistics': 20.0}
+
+
+class Watchdog:
+    """
+    策略线程的看门狗，check()在看门狗线程中定时调用。
+    """
+
+    def __init__(self, timer=None, multiple: float = 4.0, min_stall: float = 10.0, default_interval: float = 15.0,
+                 dump_dir: str = 'stall_dumps', max_dumps: int = 50, email_after: float = 2.0,
+                 shutdown_after: float = None, notify=None, stage_allowance: dict = None):
+        """
+        :param timer: 提供心跳的分阶段计时器，默认为global_vars.tick_timer
+        :param multiple: 距离上一个周期完成的时间超过周期间隔的多少倍算作停顿
+        :param min_stall: 停顿阈值的下限（秒）
+        :param default_interval: 还没有周期调度器时使用的周期间隔（秒）
+        :param dump_dir: 调用栈文件的目录
+        :param max_dumps: 最多保留的调用栈文件数量
+        :param email_after: 停顿超过阈值的多少倍时发送邮件，为None时不发送
+        :param shutdown_after: 停顿超过阈值的多少倍时停止程序，为None时不停止
+        :param notify: 发送邮件的函数，参数为(subject, content)
+        :param stage_allowance: 阶段名称到这个阶段每进入一次额外允许的时间（秒），默认为STAGE_ALLOWANCE
+        """
+        self.timer = timer or global_vars.tick_timer
+        self.multiple = multiple
+        self.min_stall = min_stall
+        self.default_interval = default_interval
+        self.dump_dir = dump_dir
+        self.max_dumps = max_dumps
+        self.email_after = email_after
+        self.shutdown_after = shutdown_after
+        self.notify = notify
+        self.stage_allowance = STAGE_ALLOWANCE if stage_allowance is None else stage_allowance
+
+        self.level = 0  # 当前停顿的上报级别：0正常，1已记录，2已发送邮件，3已停止程序
+        self.stalled_since: float | None = None  # 当前停顿被发现时，上一个周期完成（或者开始）的时间
+        self.stalled_stage: str | None = None
+        self.stalls = 0
+        self.last_dump: str | None = None
+        self.allowance = 0.0  # 当前周期已经进入的慢阶段额外允许的时间（秒）
+        self._allowance_tick: float | None = None  # 额外时间所属的周期（周期开始的时间）
+        self._allowed: set = set()  # 当前周期已经计入额外时间的慢阶段（进入阶段的时间）
+
+    def threshold(self) -> float:
+        """
+        :return: 停顿阈值（秒）
+        """
+        scheduler = global_vars.tick_scheduler
+        interval = scheduler.interval if scheduler is not None else self.default_interval
+        return max(self.min_stall, self.multiple * interval) + self.allowance
+
+    def update_allowance(self) -> float:
+        """
+        策略线程在已知很慢的阶段中时，把这次进入阶段的额外时间计入当前周期，新的周期开始时清零。
+        :return: 当前周期的额外时间（秒）
+        """
+        if self.timer.tick_started != self._allowance_tick:
+            self._allowance_tick, self._allowed, self.allowance = self.timer.tick_started, set(), 0.0
+        stage, since = self.timer.stage, self.timer.stage_since
+        if stage in self.stage_allowance and since not in self._allowed:
+            self._allowed.add(since)
+            self.allowance += self.stage_allowance[stage]
+        return self.allowance
+
+    def elapsed(self, now: float = None) -> float | None:
+        """
+        :return: 距离上一个周期完成的时间（秒），还没有完成过周期时从第一个周期开始的时间算起，策略线程还没有启动时返回None
+        """
+        reference = self.timer.tick_completed or self.timer.tick_started
+        if reference is None:
+            return None
+        return (time.monotonic() if now is None else now) - reference
+
+    def check(self, now: float = None) -> int:
+        """
+        检查一次策略线程是否停顿，需要时逐级上报。
+        :param now: 当前时间（time.monotonic()），默认为现在
+        :return: 当前的上报级别
+        """
+        now = time.monotonic() if now is None else now
+        elapsed = self.elapsed(now)
+        if elapsed is None:
+            return self.level
+        self.update_allowance()
+        threshold = self.threshold()
+
+        if elapsed <= threshold:
+            if self.level:
+                duration = now - self.stalled_since if self.stalled_since is not None else elapsed
+                global_vars.lq.push(('看门狗-策略线程恢复', 'Info',
+                                     f'策略线程在阶段{self.stalled_stage}停顿约{duration:.0f}秒后恢复'))
+                self.level = 0
+                self.stalled_since = self.stalled_stage = None
+            return self.level
+
+        stage = self.timer.stage
+        stage_elapsed = now - self.timer.stage_since if self.timer.stage_since is not None else elapsed
+        if self.level == 0:
+            self.level = 1
+            self.stalls += 1
+            self.stalled_since = now - elapsed
+            self.stalled_stage = stage
+            path = self.dump_stacks(stage, elapsed, stage_elapsed)
+            global_vars.metrics.counter('watchdog_stalls_total', '看门狗发现策略线程停顿的次数', ('stage',)).inc(str(stage))
+            global_vars.lq.push(('看门狗-策略线程停顿', 'Error',
+                                 f'策略线程已经{elapsed:.0f}秒没有完成周期（阈值{threshold:.0f}秒），'
+                                 f'停在阶段{stage}已经{stage_elapsed:.0f}秒，调用栈：{path}'))
+            if stage == 'wait' and global_vars.tick_scheduler is not None:
+                global_vars.tick_scheduler.wake()  # 停在等待下一个周期时，提前唤醒调度器
+
+        if self.level == 1 and self.email_after is not None and elapsed > threshold * self.email_after:
+            self.level = 2
+            if self.notify is not None:
+                try:
+                    self.notify('来自okx自动化策略程序的运行错误的提醒:',
+                                f'线程：strategy_manager_thread\n策略线程已经{elapsed:.0f}秒没有完成周期，'
+                                f'停在阶段{stage}\n调用栈：{self.last_dump}')
+                except Exception as e:
+                    global_vars.lq.push(('看门狗-发送邮件', 'Error', f'发送邮件失败:{e}'))
+
+        if self.level in (1, 2) and self.shutdown_after is not None and elapsed > threshold * self.shutdown_after:
+            self.level = 3
+            global_vars.lq.push(('看门狗-停止程序', 'Error', f'策略线程停顿{elapsed:.0f}秒，停止程序'))
+            global_vars.s_finished_event = True
+        return self.level
+
+    def dump_stacks(self, stage: str, elapsed: float, stage_elapsed: float) -> str | None:
+        """
+        用faulthandler把所有线程的调用栈写入文件，文件开头记录线程id和线程名的对应关系。
+        :return: 文件路径，写入失败时返回None
+        """
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            path = os.path.join(self.dump_dir, f'stall-{datetime.now().strftime("%Y%m%d-%H%M%S")}.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f'策略线程已经{elapsed:.1f}秒没有完成周期，停在阶段{stage}已经{stage_elapsed:.1f}秒\n')
+                for thread in threading.enumerate():
+                    f.write(f'Thread 0x{thread.ident:016x}: {thread.name}\n')
+                f.write('\n')
+                f.flush()
+                faulthandler.dump_traceback(file=f, all_threads=True)
+        except OSError as e:
+            global_vars.lq.push(('看门狗-调用栈', 'Error', f'写入调用栈失败:{e}'))
+            return None
+        self.last_dump = path
+        dumps = sorted(name for name in os.listdir(self.dump_dir) if name.startswith('stall-'))
+        for name in dumps[:max(0, len(dumps) - self.max_dumps)]:
+            os.remove(os.path.join(self.dump_dir, name))
+        return path
+
+    def snapshot(self) -> dict:
+        """
+        :return: 看门狗的状态
+        """
+        return {'level': self.level, 'stalls': self.stalls, 'stage': self.timer.stage, 'elapsed': self.elapsed(),
+                'threshold': self.threshold(), 'last_dump': self.last_dump}
+
+
+def watchdog_thread(sender: str, receiver: str, sender_password: str, check_interval: float = 1.0,
+                    multiple: float = 4.0, min_stall: float = 10.0, shutdown_after: float = None,
+                    dump_dir: str = 'stall_dumps', stage_allowance: dict = None) -> None:
+    """
+    看门狗线程，每check_interval秒检查一次策略线程是否停顿。程序结束时停止。
+
+    参数：
+    - sender: QQ邮件发送者邮箱地址，用于发送停顿通知。
+    - receiver: QQ邮件接收者邮箱地址。
+    - sender_password: 发送者QQ邮箱的授权码。
+    - check_interval: 检查间隔（秒），默认为1秒。
+    - multiple: 距离上一个周期完成的时间超过周期间隔的多少倍算作停顿，默认为4倍。
+    - min_stall: 停顿阈值的下限（秒），默认为10秒。
+    - shutdown_after: 停顿超过阈值的多少倍时停止程序，默认为None（不停止）。
+    - dump_dir: 调用栈文件的目录。
+    - stage_allowance: 已知很慢的阶段每进入一次额外允许的时间（秒），默认为STAGE_ALLOWANCE。
+    """
+    watchdog = Watchdog(multiple=multiple, min_stall=min_stall, shutdown_after=shutdown_after, dump_dir=dump_dir,
+                        stage_allowance=stage_allowance,
+                        notify=lambda subject, content: send_email(sender, receiver, sender_password, subject, content))
+    global_vars.metrics.gauge('watchdog_stall_seconds', '策略线程当前停顿的时长（秒），没有停顿时为0',
+                              callback=lambda: watchdog.elapsed() if watchdog.level else 0)
+    global_vars.lq.push(('看门狗线程-状态信息', 'info', '看门狗线程启动'))
+    while not global_vars.s_finished_event:
+        try:
+            watchdog.check()
+        except Exception as e:
+            global_vars.lq.push(('看门狗线程-错误信息', 'error', f'看门狗出错：{e}'))
+        time.sleep(check_interval)
+    global_vars.lq.push(('看门狗线程-状态信息', 'info', '看门狗线程停止'))
@@ -0,0 +1,122 @@
+"""
+该模块定义了训练数据集的窗口（TrainingWindow），用来限制模型训练线程使用的训练数据量。
+程序长时间运行后，从start_date_str开始的全部数据会越来越多，内存占用和训练时间也会一直增长，
+使用窗口后训练数据量有上限，内存占用和训练时间保持不变。支持以下几种策略：
+
+- all: 不做限制，使用从start_date_str开始的全部数据。
+- days: 只使用最近size天的数据，从数据库加载时就跳过更早的数据表。
+- trades: 只使用最近size条开仓记录。
+- reservoir: 按照时间衰减的权重（半衰期half_life_days天）对开仓记录进行加权蓄水池抽样，最多保留size条，
+  越新的记录被抽中的概率越大。抽样是流式进行的，每加载一天的数据就裁剪一次，内存占用不会超过窗口大小。
+"""
+
+" 内置模块 "
+from datetime import datetime, timedelta
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+
+POLICIES = ('all', 'days', 'trades', 'reservoir')
+
+
+class TrainingWindow:
+    """
+    训练数据集窗口。
+    """
+
+    def __init__(self, policy: str = 'all', size: int = 0, half_life_days: float = 7.0, seed: int = 0):
+        """
+        :param policy: 窗口策略，取值为：all、days、trades、reservoir
+        :param size: 窗口大小，days策略表示天数，trades和reservoir策略表示开仓记录的条数
+        :param half_life_days: reservoir策略中权重衰减的半衰期（天）
+        :param seed: reservoir策略的随机数种子
+        """
+        if policy not in POLICIES:
+            raise ValueError(f'不支持的训练数据集窗口策略：{policy}，可选值为：{POLICIES}')
+        if policy != 'all' and size <= 0:
+            raise ValueError(f'训练数据集窗口策略{policy}的窗口大小必须大于0')
+        self.policy = policy
+        self.size = size
+        self.half_life_days = half_life_days
+        self.seed = seed
+
+    def describe(self) -> dict:
+        """
+        :return: 窗口策略的描述，保存到模型仓库的元数据中
+        """
+        description = {'policy': self.policy, 'size': self.size}
+        if self.policy == 'reservoir':
+            description['half_life_days'] = self.half_life_days
+            description['seed'] = self.seed
+        return description
+
+    def start_date(self, start_date_str: str, today: datetime = None) -> str:
+        """
+        计算从数据库加载数据的开始日期，days策略下不会早于size天之前。
+        :param start_date_str: 用户配置的开始日期，格式为 '%Y-%m-%d'
+        :param today: 今天的日期，默认为当前日期
+        :return: 实际的开始日期，格式为 '%Y-%m-%d'
+        """
+        if self.policy != 'days':
+            return start_date_str
+        today = today or datetime.now()
+        window_start = (today - timedelta(days=self.size - 1)).strftime('%Y-%m-%d')
+        return max(start_date_str, window_start)
+
+    def trim(self, data: pd.DataFrame, target: pd.DataFrame) -> tuple:
+        """
+        裁剪已经加载的开仓记录和平仓记录，每加载一天的数据调用一次。
+        :param data: 开仓记录，必须包含当前时间列
+        :param target: 平仓记录，必须包含当前时间列
+        :return: 裁剪后的开仓记录和平仓记录
+        """
+        if self.policy in ('all', 'days') or data is None or len(data) <= self.size:
+            return data, target
+
+        times = pd.to_datetime(data['当前时间'])
+        if self.policy == 'trades':
+            keep = np.sort(np.argsort(times.to_numpy(), kind='stable')[-self.size:])
+        else:
+            scores = self._reservoir_scores(times)
+            keep = np.sort(np.argpartition(scores, self.size - 1)[:self.size])
+
+        data = data.iloc[keep].reset_index(drop=True)
+
+        # 只保留作为某条开仓记录结果的平仓记录（它之后最近的一条），其余的平仓记录已经用不到了
+        if target is not None:
+            if 'instId' in data.columns:  # 多交易对的数据，每个交易对的开仓记录只匹配同一个交易对的平仓记录
+                data_ids = data['instId'].astype(str)
+                target_ids = target['instId'].astype(str)
+                target = pd.concat([self._matched(data[data_ids == instId], target[target_ids == instId])
+                                    for instId in data_ids.unique()], ignore_index=True)
+            else:
+                target = self._matched(data, target)
+        return data, target
+
+    @staticmethod
+    def _matched(data: pd.DataFrame, target: pd.DataFrame) -> pd.DataFrame:
+        """
+        :return: target中作为data里某条开仓记录结果的平仓记录（开仓之后最近的一条），按当前时间排序
+        """
+        target = target.sort_values('当前时间', kind='stable').reset_index(drop=True)
+        target_times = pd.to_datetime(target['当前时间']).to_numpy()
+        matched = np.searchsorted(target_times, pd.to_datetime(data['当前时间']).to_numpy(), side='left')
+        matched = np.unique(matched[matched < len(target)])
+        return target.iloc[matched].reset_index(drop=True)
+
+    def _reservoir_scores(self, times: pd.Series) -> np.ndarray:
+        """
+        计算加权蓄水池抽样（A-ES算法）的排序分数，分数越小越优先保留。
+        权重为 w = exp(-(now - t) / h)（h = 半衰期 / ln2），抽样键为 log(u) / w，取抽样键最大的size条记录。
+        因为 log(-log(u)) - t / h 的排序与抽样键的排序相反，而且与now无关，所以可以一边加载一边抽样，
+        每条记录的u由它的时间哈希得到，同一条记录每次训练都得到相同的分数。
+        """
+        hashed = pd.util.hash_pandas_object(times, index=False, hash_key=f'{self.seed:016d}'[:16]).to_numpy()
+        u = (hashed >> np.uint64(11)).astype(np.float64) / float(2 ** 53)
+        u = np.clip(u, 1e-300, 1 - 1e-16)
+
+        half_life_seconds = self.half_life_days * 24 * 3600
+        seconds = times.to_numpy().astype('datetime64[s]').astype(np.float64)
+        decay = np.log(2) / half_life_seconds
+        return np.log(-np.log(u)) - decay * seconds
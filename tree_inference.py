@@ -0,0 +1,142 @@
+"""
+该模块把训练好的决策树模型（DecisionTreeClassifier、RandomForestClassifier）编译成NumPy的节点数组，
+用来对单条特征向量进行预测。具体功能包括：
+
+- 把树模型展开成特征编号、阈值、左右子节点、叶子节点类别概率这几个数组。
+- 直接对一条float向量进行预测，不经过pandas和sklearn的输入校验，单次预测只需要几到几十微秒。
+- 校验编译后的模型与model.predict的预测结果是否完全一致。
+
+不支持的模型（例如KNeighborsClassifier）compile_model会返回None，调用方应该继续使用sklearn进行预测。
+"""
+
+" 第三方模块 "
+import numpy as np
+import pandas as pd
+
+# sklearn中叶子节点的子节点编号
+TREE_LEAF = -1
+
+
+class CompiledTreeModel:
+    """
+    编译后的树模型。森林中所有树的节点拼接在同一组数组里，roots记录每一棵树根节点的位置。
+    叶子节点的特征编号为0、阈值为正无穷、左右子节点都指向自己，所以遍历时可以对所有树同时走固定的步数。
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 leaf_proba: np.ndarray, roots: np.ndarray, max_depth: int, classes: np.ndarray):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes = classes
+        self.n_trees = len(roots)
+
+        # 单棵树时用python列表逐个节点往下走，比numpy的向量化操作更快
+        self._feature_list = feature.tolist()
+        self._threshold_list = threshold.tolist()
+        self._left_list = left.tolist()
+        self._right_list = right.tolist()
+
+    def predict(self, x: np.ndarray) -> object:
+        """
+        对一条已经标准化的特征向量进行预测。
+        :param x: 一维特征向量
+        :return: 预测的类别，与model.predict(X)[0]相同
+        """
+        # sklearn的树模型在预测前会把输入转换为float32，这里保持一致才能得到相同的分裂结果
+        x = np.asarray(x, dtype=np.float32)
+
+        if self.n_trees == 1:
+            values = x.tolist()
+            feature, threshold, left, right = (self._feature_list, self._threshold_list,
+                                               self._left_list, self._right_list)
+            node = int(self.roots[0])
+            while left[node] != node:
+                node = left[node] if values[feature[node]] <= threshold[node] else right[node]
+            return self.classes[int(np.argmax(self.leaf_proba[node]))]
+
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            nodes = np.where(x[self.feature[nodes]] <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+
+        # 与RandomForestClassifier.predict_proba一样，逐棵树累加概率后再除以树的数量
+        proba = np.add.reduce(self.leaf_proba[nodes], axis=0)
+        proba /= self.n_trees
+        return self.classes[int(np.argmax(proba))]
+
+
+def _flatten_tree(tree, offset: int, normalize: bool) -> tuple:
+    """
+    把一棵sklearn树的tree_对象展开成节点数组，节点编号加上offset后拼接到森林的数组中。
+    """
+    is_leaf = tree.children_left == TREE_LEAF
+    index = np.arange(tree.node_count, dtype=np.int64) + offset
+
+    feature = np.where(is_leaf, 0, tree.feature).astype(np.int64)
+    threshold = np.where(is_leaf, np.inf, tree.threshold).astype(np.float64)
+    left = np.where(is_leaf, index, tree.children_left + offset).astype(np.int64)
+    right = np.where(is_leaf, index, tree.children_right + offset).astype(np.int64)
+
+    leaf_proba = np.array(tree.value[:, 0, :], dtype=np.float64)
+    if normalize:
+        normalizer = leaf_proba.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        leaf_proba /= normalizer
+    return feature, threshold, left, right, leaf_proba
+
+
+def compile_model(model: object) -> CompiledTreeModel | None:
+    """
+    把训练好的模型编译成CompiledTreeModel。
+    :param model: 训练好的模型对象
+    :return: 编译后的模型，不支持的模型返回None
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(model, DecisionTreeClassifier):
+        estimators = [model]
+        normalize = False
+    elif isinstance(model, RandomForestClassifier):
+        estimators = list(model.estimators_)
+        normalize = True
+    else:
+        return None
+
+    if getattr(model, 'n_outputs_', 1) != 1:
+        return None
+
+    parts = []
+    roots = []
+    offset = 0
+    max_depth = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        parts.append(_flatten_tree(tree, offset, normalize))
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    feature, threshold, left, right, leaf_proba = (np.concatenate(arrays) for arrays in zip(*parts))
+    return CompiledTreeModel(feature, threshold, left, right, leaf_proba,
+                             np.array(roots, dtype=np.int64), max_depth, np.asarray(model.classes_))
+
+
+def check_parity(compiled: CompiledTreeModel, model: object, X: pd.DataFrame) -> bool:
+    """
+    校验编译后的模型与sklearn模型对X中每一条记录的预测结果是否完全一致。
+    :param compiled: 编译后的模型
+    :param model: 原始的sklearn模型
+    :param X: 用来校验的特征集（已经标准化）
+    :return: True表示全部一致
+    """
+    expected = model.predict(X)
+    values = np.asarray(X, dtype=np.float64)
+    for row, label in zip(values, expected):
+        if compiled.predict(row) != label:
+            return False
+    return True